@@ -127,7 +127,7 @@ class AuthPlugin(PluginObject):
         Pre-command hook to remove passwords from the log output.
         """
 
-        self.logger.trace(_("Command: %s") % event.command)
+        self.logger.trace(_("Command: %s"), event.command)
         if event.command.lower() in ["login", "register"]:
             if len(event.args) >= 2:
                 split_ = event.printable.split("%s " % event.command)
@@ -167,16 +167,35 @@ class AuthPlugin(PluginObject):
             username = args[0]
             password = args[1]
 
-            result = self.auth_h.login(caller, protocol, username, password)
-            if not result:
-                self.logger.warn(_("%s failed to login as %s")
-                                 % (caller.nickname, username))
-                caller.respond(__("Invalid username or password!"))
-            else:
-                self.logger.info(_("%s logged in as %s")
-                                 % (caller.nickname, username))
-                caller.respond(__("You are now logged in as %s.")
-                               % username)
+            d = self.auth_h.login(caller, protocol, username, password)
+            d.addCallbacks(self._login_done, self._hashing_failed,
+                           callbackArgs=(caller, username),
+                           errbackArgs=(caller,))
+
+    def _login_done(self, result, caller, username):
+        if not result:
+            self.logger.warn(_("%s failed to login as %s"),
+                             caller.nickname, username)
+            caller.respond(__("Invalid username or password!"))
+        else:
+            self.logger.info(_("%s logged in as %s"),
+                             caller.nickname, username)
+            caller.respond(__("You are now logged in as %s.")
+                           % username)
+
+    def _hashing_failed(self, failure, caller):
+        if failure.check(auth_handler.LoginThrottledError):
+            self.logger.warn(_("%s was throttled: %s"),
+                             caller, failure.getErrorMessage())
+            caller.respond(__("Too many login attempts - please wait a few "
+                              "minutes and try again."))
+            return
+
+        self.logger.error(_("Error hashing password for %s: %s"),
+                          caller, failure.getErrorMessage())
+        caller.respond(__("Something went wrong while checking your "
+                          "password! You should ask the bot operators about "
+                          "this."))
 
     def logout_command(self, protocol, caller, source, command, raw_args,
                        parsed_args):
@@ -222,16 +241,28 @@ class AuthPlugin(PluginObject):
                               "Try another!"))
             return
 
-        if self.auth_h.create_user(username, password):
-            caller.respond(__("Your account has been created and you will now "
-                              "be logged in. Thanks for registering!"))
-            self.perms_h.create_user(username)
-            self.login_command(caller, source, [username, password], protocol,
-                               raw_args, parsed_args)
-        else:
+        d = self.auth_h.create_user(username, password)
+        d.addCallbacks(self._registered, self._hashing_failed,
+                       callbackArgs=(protocol, caller, username, password),
+                       errbackArgs=(caller,))
+
+    def _registered(self, result, protocol, caller, username, password):
+        if not result:
             caller.respond(__("Something went wrong when creating your "
                               "account! You should ask the bot operators "
                               "about this."))
+            return
+
+        caller.respond(__("Your account has been created and you will now "
+                          "be logged in. Thanks for registering!"))
+
+        if self.perms_h:
+            self.perms_h.create_user(username)
+
+        d = self.auth_h.login(caller, protocol, username, password)
+        d.addCallbacks(self._login_done, self._hashing_failed,
+                       callbackArgs=(caller, username),
+                       errbackArgs=(caller,))
 
     def passwd_command(self, protocol, caller, source, command, raw_args,
                        parsed_args):
@@ -259,12 +290,18 @@ class AuthPlugin(PluginObject):
                               "another!"))
             return
 
-        if self.auth_h.change_password(username, old, new):
+        d = self.auth_h.change_password(username, old, new)
+        d.addCallbacks(self._password_changed, self._hashing_failed,
+                       callbackArgs=(caller, username),
+                       errbackArgs=(caller,))
+
+    def _password_changed(self, result, caller, username):
+        if result:
             caller.respond(__("Your password has been changed successfully."))
         else:
             caller.respond(__("Old password incorrect - please try again!"))
-            self.logger.warn(_("User %s failed to change the password for %s")
-                             % (caller, username))
+            self.logger.warn(_("User %s failed to change the password for %s"),
+                             caller, username)
 
     def get_auth_handler(self):
         """
@@ -289,8 +326,12 @@ class AuthPlugin(PluginObject):
 
     def deactivate(self):
         """
-        Called when the plugin is deactivated. Does nothing right now.
+        Called when the plugin is deactivated. Stops the password hashing
+        processes, and removes our handlers from the command manager.
         """
+        if self.auth_h is not None:
+            self.auth_h.stop()
+
         if self.config["use-auth"]:
             if isinstance(
                     self.commands.auth_handler, auth_handler.authHandler
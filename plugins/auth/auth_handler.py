@@ -1,8 +1,12 @@
 # coding=utf-8
 
+from twisted.internet.defer import fail, succeed
+
 from plugins.auth.crypto import get_algo
+from plugins.auth.crypto.pool import HashPool, HashingError
 from system.translations import Translations
 from utils.password import mkpasswd
+from utils.ratelimit import KeyedTokenBuckets
 
 from weakreflist.weakreflist import WeakList
 
@@ -16,6 +20,11 @@ get an instance of the Auth plugin and get the instance from there.
 This class is in charge of managing user accounts - logins and passwords. It
 also includes a rudimentary password blacklist system.
 
+Passwords are hashed in a pool of processes, so anything that needs to hash
+a password - logging in, creating accounts and changing passwords - returns
+a Deferred. Login attempts are throttled per account and per host before
+any hashing happens, so spamming the login command can't eat up the CPU.
+
 If you want to write your own auth handler, be sure to implement all the
 documented methods.
 """
@@ -24,6 +33,15 @@ __author__ = 'Gareth Coles'
 _ = Translations().get()
 
 
+class LoginThrottledError(Exception):
+    """
+    Passed to errbacks when there have been too many login attempts for an
+    account, or from a host, recently.
+    """
+
+    pass
+
+
 class authHandler(object):
     """
     Authorization handler class
@@ -31,18 +49,51 @@ class authHandler(object):
 
     users = {}
 
-    def __init__(self, plugin, data, blacklist):
+    #: Default (attempts, seconds) allowed for each account and each host
+    LOGIN_LIMITS = {
+        "username": (5, 300),
+        "hostmask": (10, 300)
+    }
+
+    #: Default number of accounts and hosts to remember attempts for
+    LOGIN_LIMITS_TRACKED = 10000
+
+    def __init__(self, plugin, data, blacklist, hasher=None):
         """
         Initialise the auth handler.
 
         This will also create a default account and default password
         blacklist if one doesn't already exist.
+
+        :param hasher: The HashPool to hash passwords with; by default, one
+            is created and started using the "hash-processes",
+            "hash-concurrency" and "hash-timeout" settings
         """
 
         self.data = data
         self.blacklist = blacklist
         self.plugin = plugin
 
+        if hasher is None:
+            hasher = HashPool(
+                self.plugin.config.get("hash-processes"),
+                concurrency=self.plugin.config.get("hash-concurrency"),
+                timeout=self.plugin.config.get("hash-timeout", 30)
+            )
+
+            # Now, rather than forking on the first login, when there are
+            # more threads about
+            try:
+                hasher.start()
+            except HashingError as e:
+                # It'll be tried again, and fail logins, when it's used
+                self.plugin.logger.error(e)
+
+        self.hasher = hasher
+
+        self.login_limits = {}
+        self.setup_login_limits()
+
         get_algo(self.algo)  # To be sure that it works
 
         self.create_superadmin_account()
@@ -159,11 +210,15 @@ class authHandler(object):
 
         password = mkpasswd(32)
 
-        self.create_user(_("superadmin"), password)
+        d = self.create_user(_("superadmin"), password)
+        d.addErrback(lambda failure: self.plugin.logger.error(
+            _("Unable to create the superadmin account: %s"),
+            failure.getErrorMessage()
+        ))
 
         self.plugin.logger.info("============================================")
         self.plugin.logger.info(_("Super admin username: superadmin"))
-        self.plugin.logger.info(_("Super admin password: %s") % password)
+        self.plugin.logger.info(_("Super admin password: %s"), password)
         self.plugin.logger.info("============================================")
 
         p_handler = self.plugin.get_permissions_handler()
@@ -184,21 +239,96 @@ class authHandler(object):
                                       "permissions system isn't being used."))
             self.plugin.logger.warn(_("Please do this manually!"))
 
-    def hash(self, salt, password):
+    def hash(self, salt, password, algo=None):
         """
-        Returns the hash for a given password and salt.
+        Hashes a given password and salt.
 
         :param salt: The salt to use in the hash
         :param password: The password itself
+        :param algo: The algorithm to use, if not the configured one
 
         :type salt: str
         :type password: str
+        :type algo: str, None
+
+        :return: A Deferred that fires with the hashed salt and password
+        :rtype: Deferred
+        """
+
+        return self.hasher.hash(algo or self.algo, password, salt)
 
-        :return: The hashed salt and password
-        :rtype: str
+    def setup_login_limits(self):
+        """
+        Set up the login attempt limits from the "login-limits" setting.
+        This forgets about any previous attempts.
         """
 
-        return get_algo(self.algo).hash(password, salt)
+        config = self.plugin.config.get("login-limits") or {}
+        tracked = config.get("tracked", self.LOGIN_LIMITS_TRACKED)
+
+        self.login_limits = {}
+
+        for key, default in self.LOGIN_LIMITS.iteritems():
+            limit = config.get(key, default)
+
+            if not limit:
+                continue
+
+            uses, seconds = limit
+            self.login_limits[key] = KeyedTokenBuckets(
+                uses, float(uses) / seconds, max_keys=tracked
+            )
+
+    def throttle_login(self, user, protocol, username):
+        """
+        Count a login attempt against the attempt limits.
+
+        Nothing is counted if the attempt isn't allowed, so that an account
+        that's being hammered doesn't also use up the limit for everyone
+        else on the same host.
+
+        :param user: The User object of the person trying to log in
+        :param protocol: The Protocol object relating to the User
+        :param username: The username of the account that's being tried
+
+        :type user: User
+        :type protocol: Protocol
+        :type username: str
+
+        :return: Whether the attempt is allowed
+        :rtype: bool
+        """
+
+        keys = {
+            "username": username.lower(),
+            "hostmask": self._hostmask_key(user, protocol)
+        }
+
+        limits = [(buckets, keys[name])
+                  for name, buckets in self.login_limits.iteritems()]
+
+        for buckets, key in limits:
+            if not buckets.available(key):
+                return False
+
+        for buckets, key in limits:
+            buckets.consume(key)
+
+        return True
+
+    def _hostmask_key(self, user, protocol):
+        # Not every protocol knows where users connect from, so fall back
+        # to their nickname
+        host = getattr(user, "host", None) or user.nickname
+        return getattr(protocol, "name", None), host.lower()
+
+    def stop(self):
+        """
+        Stop the hashing processes. Call this when you're done with the
+        handler.
+        """
+
+        self.hasher.stop()
 
     def reload(self):
         """
@@ -211,40 +341,60 @@ class authHandler(object):
         """
         Check whether a password is the valid login for a user.
 
+        If the user's password was hashed with a different algorithm to the
+        configured one, and replace-hashes is enabled, it'll be rehashed in
+        the background after a successful check.
+
         :param username: The username to check against
         :param password: The attempted password
 
         :type username: str
         :type password: str
 
-        :return: Whether the password was correct
-        :rtype: bool
+        :return: A Deferred that fires with whether the password was correct
+        :rtype: Deferred
         """
 
         username = username.lower()
-        with self.data:
+        with self.data.reading():
             if username not in self.data:
-                return False
+                return succeed(False)
             user_data = self.data[username]
 
         algo = user_data.get("algo", "sha512")
-        algo_obj = get_algo(algo)
 
-        result = algo_obj.check(
-            user_data["password"], password, user_data["salt"]
+        d = self.hasher.check(
+            algo, user_data["password"], password, user_data["salt"]
         )
 
-        if self.replace_hashes and algo != self.algo and result:
-            new_algo = get_algo(self.algo)
-            salt = new_algo.gen_salt()
-            hash = new_algo.hash(password, salt)
+        if self.replace_hashes and algo != self.algo:
+            d.addCallback(self._replace_hash, username, password, user_data)
+
+        return d
 
+    def _replace_hash(self, result, username, password, old_data):
+        if not result:
+            return result
+
+        salt = get_algo(self.algo).gen_salt()
+
+        def _save(hashed):
             with self.data:
-                self.data[username] = {
-                    "algo": self.algo,
-                    "salt": salt,
-                    "password": hash
-                }
+                # Don't clobber anything that's changed since the check
+                if self.data.get(username) is old_data:
+                    self.data[username] = {
+                        "algo": self.algo,
+                        "salt": salt,
+                        "password": hashed
+                    }
+
+        def _error(failure):
+            self.plugin.logger.error(_("Unable to replace the password hash "
+                                       "for %s: %s"),
+                                     username, failure.getErrorMessage())
+
+        # This isn't returned, so that the login doesn't wait for it
+        self.hash(salt, password).addCallbacks(_save, _error)
 
         return result
 
@@ -261,27 +411,34 @@ class authHandler(object):
         :type username: str
         :type password: str
 
-        :return: Whether the account was created successfully
-        :rtype: bool
+        :return: A Deferred that fires with whether the account was created
+            successfully
+        :rtype: Deferred
         """
 
         username = username.lower()
 
-        with self.data:
-            if username in self.data:
-                return False
+        if username in self.data:
+            return succeed(False)
 
-            algo = get_algo(self.algo)
-            salt = algo.gen_salt()
-            hashed = algo.hash(password, salt)
+        algo = self.algo
+        salt = get_algo(algo).gen_salt()
 
-            self.data[username] = {
-                "password": hashed,
-                "salt": salt,
-                "algo": self.algo
-            }
+        def _save(hashed):
+            with self.data:
+                # Someone else may have got there while we were hashing
+                if username in self.data:
+                    return False
 
-        return True
+                self.data[username] = {
+                    "password": hashed,
+                    "salt": salt,
+                    "algo": algo
+                }
+
+            return True
+
+        return self.hash(salt, password, algo).addCallback(_save)
 
     def change_password(self, username, old, new):
         """
@@ -300,29 +457,43 @@ class authHandler(object):
         :type old: str
         :type new: str
 
-        :return: Whether the password was changed
-        :rtype: bool
+        :return: A Deferred that fires with whether the password was changed
+        :rtype: Deferred
         """
 
         username = username.lower()
 
-        with self.data:
-            if username not in self.data:
-                return False
+        if username not in self.data:
+            return succeed(False)
+
+        algo = self.data[username]["algo"]
+        salt = get_algo(algo).gen_salt()
 
-            if not self.check_login(username, old):
+        def _checked(result):
+            if not result:
                 return False
 
-            algo = get_algo(self.data[username]["algo"])
-            salt = algo.gen_salt()
-            hashed = algo.hash(new, salt)
+            return self.hash(salt, new, algo).addCallback(_save)
 
-            self.data[username] = {
-                "password": hashed,
-                "salt": salt,
-                "algo": self.data[username]["algo"]
-            }
-        return True
+        def _save(hashed):
+            with self.data:
+                if username not in self.data:
+                    return False
+
+                self.data[username] = {
+                    "password": hashed,
+                    "salt": salt,
+                    "algo": algo
+                }
+            return True
+
+        # Check directly, to skip rehashing - we're replacing it anyway
+        user_data = self.data[username]
+
+        d = self.hasher.check(
+            algo, user_data["password"], old, user_data["salt"]
+        )
+        return d.addCallback(_checked)
 
     def delete_user(self, username):
         """
@@ -351,6 +522,10 @@ class authHandler(object):
         This requires a user and protocol object, as well as their username
         and password. The user and username are not the same thing!
 
+        If there have been too many attempts recently - see
+        `throttle_login` - the Deferred fails with a LoginThrottledError,
+        without checking the password.
+
         :param user: The User object of the person trying to log in
         :param protocol: The Protocol object relating to the User
         :param username: The username of the account that's being tried
@@ -361,17 +536,25 @@ class authHandler(object):
         :type username: str
         :type password: str
 
-        :return: Whether the user was logged in successfully.
-        :rtype: bool
+        :return: A Deferred that fires with whether the user was logged in
+            successfully
+        :rtype: Deferred
         """
 
-        if self.check_login(username, password):
-            user.authorized = True
-            user.auth_name = username
+        def _checked(result):
+            if result:
+                user.authorized = True
+                user.auth_name = username
 
-            self.add_logged_in_user(username, user)
-            return True
-        return False
+                self.add_logged_in_user(username, user)
+            return result
+
+        if not self.throttle_login(user, protocol, username):
+            return fail(LoginThrottledError(
+                _("Too many login attempts for %s") % username
+            ))
+
+        return self.check_login(username, password).addCallback(_checked)
 
     def logout(self, user, protocol):
         """
@@ -392,7 +575,7 @@ class authHandler(object):
         if user.authorized:
             user.authorized = False
             self.delete_logged_in_user(user.auth_name, user)
-            del user.auth_name
+            user.auth_name = ""
             return True
         return False
 
@@ -0,0 +1,235 @@
+# coding=utf-8
+
+"""
+A pool of processes for hashing passwords in.
+
+Good password hashes are slow on purpose, and they hold the GIL while they
+work - so hashing in the reactor thread (or even another thread) holds up
+every protocol. The pool hashes in separate processes instead, which also
+lets several logins use several cores at once. ::
+
+    pool = HashPool(2)
+
+    d = pool.check("bcrypt", hashed, password, salt)
+    d.addCallback(lambda correct: ...)
+
+Only algorithm names, passwords and salts are sent to the processes, and
+only results come back.
+
+You can also cap how many passwords are hashed at once, across the whole
+pool - anything over the cap waits its turn in the reactor, instead of
+piling up in the processes' queue.
+
+Hashes that take longer than the pool's timeout fail with a HashingError,
+so that a process dying mid-hash can't leave a login waiting forever.
+"""
+
+import multiprocessing
+
+from twisted.internet import reactor as _reactor
+from twisted.internet.defer import Deferred, DeferredSemaphore, fail
+
+from plugins.auth.crypto import get_algo
+from system.translations import Translations
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+
+class HashingError(Exception):
+    """
+    Passed to errbacks when hashing fails in the pool. Exceptions from the
+    hashing process can't always be sent back, so you only get the message.
+    """
+
+    pass
+
+
+def _run(func, args):
+    # Runs in the pool; exceptions are turned into messages so that they
+    # can always be sent back
+    try:
+        return True, func(*args)
+    except Exception as e:
+        return False, "%s: %s" % (e.__class__.__name__, e)
+
+
+def _hash(algo, value, salt):
+    return get_algo(algo).hash(value, salt)
+
+
+def _check(algo, hashed, value, salt):
+    return get_algo(algo).check(hashed, value, salt)
+
+
+class HashPool(object):
+    """
+    A pool of processes for hashing and checking passwords.
+
+    The processes are started the first time they're needed, unless you
+    call `start` first - which you should, before the process has started
+    any threads. Remember to call `stop` when you're done with the pool.
+    """
+
+    def __init__(self, processes=None, reactor=None, concurrency=None,
+                 timeout=30):
+        """
+        :param processes: How many processes to run, or None to run one per
+            CPU core
+        :param reactor: The reactor to fire Deferreds with, mostly for tests
+        :param concurrency: How many hashes may be in progress at once, or
+            None for no limit
+        :param timeout: How many seconds to wait for a hash before giving
+            up, or None to wait for as long as it takes
+
+        :type processes: int, None
+        :type concurrency: int, None
+        :type timeout: float, None
+        """
+
+        self.processes = processes
+        self.reactor = reactor or _reactor
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        if concurrency is None:
+            self._semaphore = None
+        else:
+            self._semaphore = DeferredSemaphore(concurrency)
+
+        self._pool = None
+
+    def __repr__(self):
+        return "<%s: %s processes, %s>" % (
+            self.__class__.__name__, self.processes or "auto",
+            "running" if self._pool else "stopped"
+        )
+
+    @property
+    def waiting(self):
+        """
+        How many hashes are waiting for a free slot, because of the
+        concurrency limit.
+
+        :rtype: int
+        """
+
+        if self._semaphore is None:
+            return 0
+        return len(self._semaphore.waiting)
+
+    def hash(self, algo, value, salt):
+        """
+        Hash a password.
+
+        :param algo: The name of the algorithm to use - see `get_algo`
+        :param value: The password to hash
+        :param salt: The salt to hash it with
+
+        :type algo: str
+        :type value: str
+        :type salt: str, None
+
+        :return: A Deferred that fires with the hash
+        :rtype: Deferred
+        """
+
+        return self._submit(_hash, algo, value, salt)
+
+    def check(self, algo, hashed, value, salt):
+        """
+        Check a password against a hash.
+
+        :param algo: The name of the algorithm the hash was made with
+        :param hashed: The hash to check against
+        :param value: The password to check
+        :param salt: The salt the hash was made with
+
+        :type algo: str
+        :type hashed: str
+        :type value: str
+        :type salt: str, None
+
+        :return: A Deferred that fires with whether the password matches
+        :rtype: Deferred
+        """
+
+        return self._submit(_check, algo, hashed, value, salt)
+
+    def start(self):
+        """
+        Start the processes, if they aren't already running.
+
+        The processes are forked from this one, so it's best to do this
+        before any other threads are started.
+
+        :raises HashingError: If the processes couldn't be started
+        """
+
+        if self._pool is not None:
+            return
+
+        try:
+            self._pool = multiprocessing.Pool(self.processes)
+        except Exception as e:
+            raise HashingError(
+                _("Unable to start hashing processes: %s") % e
+            )
+
+    def stop(self):
+        """
+        Stop the processes, after they've finished any hashing that's
+        already been submitted.
+        """
+
+        if self._pool is None:
+            return
+
+        pool, self._pool = self._pool, None
+
+        pool.close()
+        pool.join()
+
+    def _submit(self, func, *args):
+        if self._semaphore is None:
+            return self._apply(func, *args)
+        return self._semaphore.run(self._apply, func, *args)
+
+    def _apply(self, func, *args):
+        try:
+            self.start()
+        except HashingError as e:
+            return fail(e)
+
+        d = Deferred()
+
+        if self.timeout is not None:
+            # If a process dies, or the result can't be sent back, we'd
+            # never hear about it otherwise
+            d.addTimeout(self.timeout, self.reactor,
+                         onTimeoutCancel=self._timed_out)
+
+        self._pool.apply_async(
+            _run, (func, args),
+            callback=lambda result: self.reactor.callFromThread(
+                self._done, d, result
+            )
+        )
+
+        return d
+
+    def _timed_out(self, result, timeout):
+        raise HashingError(
+            _("Hashing took more than %s seconds") % timeout
+        )
+
+    def _done(self, d, result):
+        if d.called:  # Timed out
+            return
+
+        success, value = result
+
+        if success:
+            d.callback(value)
+        else:
+            d.errback(HashingError(value))
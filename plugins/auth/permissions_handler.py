@@ -17,6 +17,9 @@ __author__ = 'Gareth Coles'
 import fnmatch
 import re
 
+from collections import OrderedDict
+from functools import wraps
+
 from system.protocols.generic.user import User
 from system.translations import Translations
 
@@ -25,13 +28,154 @@ from utils.misc import str_to_regex_flags as s2rf
 _ = Translations().get()
 __ = Translations().get_m()
 
+#: Matches regex permission nodes, which look like /pattern/flags
+REGEX_NODE = re.compile(r"/(.*)/(.*)")
+
+#: Characters that make a permission node a wildcard node
+WILDCARD_CHARS = set("*?[")
+
+
+class NodeSet(object):
+    """
+    A compiled set of permission nodes, for quickly checking whether any of
+    them match a permission.
+
+    Exact nodes go in a set, wildcard nodes are combined into one regex,
+    and regex nodes are compiled ahead of time.
+    """
+
+    __slots__ = ["exact", "wildcard", "regexes"]
+
+    def __init__(self, nodes):
+        """
+        :param nodes: The permission nodes, without any leading ^
+        :type nodes: list
+        """
+
+        self.exact = set()
+        self.regexes = []
+
+        wildcards = []
+
+        for node in nodes:
+            result = REGEX_NODE.match(node)
+
+            if result:
+                pattern, flags = result.groups()
+                self.regexes.append(re.compile(pattern, s2rf(flags)))
+                continue
+
+            node = node.lower()
+
+            if WILDCARD_CHARS.intersection(node):
+                pattern = fnmatch.translate(node)
+
+                if pattern.endswith("(?ms)"):
+                    pattern = pattern[:-5]
+
+                wildcards.append("(?:%s)" % pattern)
+            else:
+                self.exact.add(node)
+
+        if wildcards:
+            self.wildcard = re.compile("|".join(wildcards), re.M | re.S)
+        else:
+            self.wildcard = None
+
+    def __nonzero__(self):
+        return bool(self.exact or self.wildcard or self.regexes)
+
+    def matches(self, permission):
+        """
+        Check whether any of the nodes match a permission.
+
+        :param permission: The permission, in lowercase
+        :type permission: str
+
+        :rtype: bool
+        """
+
+        if permission in self.exact:
+            return True
+
+        if self.wildcard is not None and self.wildcard.match(permission):
+            return True
+
+        for regex in self.regexes:
+            if regex.match(permission):
+                return True
+
+        return False
+
+
+class PermissionMatcher(object):
+    """
+    A compiled list of permission nodes, including denial nodes. This gives
+    the same results as `permissionsHandler.compare_permissions` with its
+    default options, but does all the parsing up-front.
+    """
+
+    __slots__ = ["grant", "deny"]
+
+    def __init__(self, permissions):
+        """
+        :param permissions: The permission nodes to compile
+        :type permissions: list
+        """
+
+        grant = []
+        deny = []
+
+        for element in permissions:
+            if element.startswith("^"):
+                deny.append(element[1:])
+            else:
+                grant.append(element)
+
+        self.grant = NodeSet(grant)
+        self.deny = NodeSet(deny)
+
+    def matches(self, permission):
+        """
+        Check whether a permission is granted, and not denied.
+
+        :param permission: The permission, in lowercase
+        :type permission: str
+
+        :rtype: bool
+        """
+
+        if self.deny and self.deny.matches(permission):
+            return False
+        return self.grant.matches(permission)
+
+
+def _invalidates(func):
+    # For methods that change the permissions data
+    @wraps(func)
+    def inner(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.invalidate()
+
+    return inner
+
 
 class permissionsHandler(object):
     """
     Permissions handler class
     """
 
-    pattern = re.compile(r"/(.*)/(.*)")
+    pattern = REGEX_NODE
+
+    #: How many compiled matchers to keep in **compiled** before starting
+    #: over, to keep memory bounded
+    compiled_size = 1024
+
+    #: How many `check` results to keep in **decisions**, dropping the least
+    #: recently used ones first
+    decisions_size = 4096
 
     def __init__(self, plugin, data):
         """
@@ -43,6 +187,27 @@ class permissionsHandler(object):
         self.data = data
         self.plugin = plugin
 
+        #: Compiled permissions, with inheritance already flattened. These
+        #: are thrown away whenever the permissions data changes. ::
+        #:
+        #:     compiled = {
+        #:         ("user" or "group", name, protocol, source):
+        #:             PermissionMatcher
+        #:     }
+        self.compiled = {}
+
+        #: Recent `check` results, keyed on (username or None, permission,
+        #: protocol, source, extra groups, use-superuser), least recently
+        #: used first. These are thrown away along with **compiled**.
+        self.decisions = OrderedDict()
+
+        #: How many `check` results came from **decisions**, and how many
+        #: had to be worked out
+        self.hits = 0
+        self.misses = 0
+
+        self.data.add_callback(self.invalidate)
+
         with self.data:
             if "users" not in self.data:
                 self.data["users"] = {}
@@ -102,6 +267,32 @@ class permissionsHandler(object):
 
         return self.data.reload()
 
+    def invalidate(self):
+        """
+        Throw away all of the compiled permissions and cached `check`
+        results, so that they're rebuilt from the data the next time they're
+        needed.
+
+        This is done for you when the data file is reloaded, or changed
+        using the methods on this class. If you change **data** directly,
+        you'll have to call this yourself.
+        """
+
+        self.compiled.clear()
+        self.decisions.clear()
+
+    def _get_compiled(self, key, build):
+        matcher = self.compiled.get(key)
+
+        if matcher is None:
+            if len(self.compiled) >= self.compiled_size:
+                self.compiled.clear()
+
+            matcher = PermissionMatcher(build(*key[1:]))
+            self.compiled[key] = matcher
+
+        return matcher
+
     def check(self, permission, caller, source, protocol):
         """
         Check whether someone has a specified permission.
@@ -138,11 +329,6 @@ class permissionsHandler(object):
         else:
             protocol = protocol.name.lower()
 
-        self.plugin.logger.debug(_("CHECK | Permis: %s") % permission)
-        self.plugin.logger.debug(_("CHECK | Caller: %s") % caller)
-        self.plugin.logger.debug(_("CHECK | Source: %s") % source)
-        self.plugin.logger.debug(_("CHECK | Protoc: %s") % protocol)
-
         superuser = self.plugin.config["use-superuser"]
         username = None
 
@@ -151,40 +337,85 @@ class permissionsHandler(object):
         elif isinstance(caller, str) or isinstance(caller, unicode):
             username = caller.lower()
         elif caller.authorized:
-            self.plugin.logger.debug(_("CHECK | Authorized: %s") %
-                                     caller.authorized)
             username = caller.auth_name
 
-        if username is not None:
-            return self.user_has_permission(username, permission,
-                                            protocol, source,
-                                            check_superadmin=superuser)
-        else:
-            self.plugin.logger.debug(_("CHECK | Not logged in."))
-            r = self.group_has_permission(
-                "default", permission, protocol, source
-            )
-
-            if not r:
-                if isinstance(protocol, basestring):
-                    _protocol = self.plugin.factory_manager.get_protocol(
-                        protocol
-                    )
-                else:
-                    _protocol = protocol
-
-                if not _protocol:
-                    return False
-
-                for group in _protocol.get_extra_groups(caller, source):
+        if self._decide(username, permission, protocol, source, (),
+                        superuser):
+            return True
+
+        # Extra groups depend on things like channel ranks, which can change
+        # at any time, so they're looked up every time instead of cached
+        _protocol = self.plugin.factory_manager.get_protocol(protocol)
+
+        if not _protocol:
+            return False
+
+        extra_groups = tuple(_protocol.get_extra_groups(
+            caller if username is None else username, source
+        ))
+
+        if not extra_groups:
+            return False
+
+        return self._decide(username, permission, protocol, source,
+                            extra_groups, superuser)
+
+    def _decide(self, username, permission, protocol, source, extra_groups,
+                superuser):
+        key = (username, permission, protocol, source, extra_groups,
+               superuser)
+
+        try:
+            result = self.decisions.pop(key)
+        except KeyError:
+            self.misses += 1
+
+            if extra_groups:
+                result = False
+
+                for group in extra_groups:
                     if self.group_has_permission(group, permission,
                                                  protocol, source):
-                        return True
-            return r
+                        result = True
+                        break
+            elif username is None:
+                result = self.group_has_permission(
+                    "default", permission, protocol, source
+                )
+            else:
+                result = self.user_has_permission(
+                    username, permission, protocol, source,
+                    check_superadmin=superuser, check_extra_groups=False
+                )
+
+            if len(self.decisions) >= self.decisions_size:
+                self.decisions.popitem(last=False)
+        else:
+            self.hits += 1
+
+        # (Re)inserting it makes it the most recently used
+        self.decisions[key] = result
+        return result
+
+    def get_cache_stats(self):
+        """
+        Get stats for the cache of `check` results - how many checks were
+        answered from it, how many weren't, and how many results it has.
+
+        :return: A dict containing **hits**, **misses** and **size**
+        :rtype: dict
+        """
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.decisions)
+        }
 
     # User operations
     #  Modification
 
+    @_invalidates
     def create_user(self, user):
         """
         Create an entry for a username in the permissions file.
@@ -214,11 +445,12 @@ class permissionsHandler(object):
 
                 self.data["users"][user] = newuser
 
-                self.plugin.logger.debug(_("User created: %s") % user)
+                self.plugin.logger.debug(_("User created: %s"), user)
 
                 return True
         return False
 
+    @_invalidates
     def remove_user(self, user):
         """
         Remove the entry for a username in the permissions file.
@@ -240,6 +472,7 @@ class permissionsHandler(object):
             del self.data["users"][user]
         return True
 
+    @_invalidates
     def set_user_option(self, user, option, value):
         """
         Set an option for a user in the permissions file.
@@ -271,12 +504,13 @@ class permissionsHandler(object):
         with self.data:
             if user in self.data["users"]:
                 self.data["users"][user]["options"][option] = value
-                self.plugin.logger.debug(_("Option %s set to %s for user %s.")
-                                         % (option, value, user))
+                self.plugin.logger.debug(_("Option %s set to %s for user %s."),
+                                         option, value, user)
 
                 return True
         return False
 
+    @_invalidates
     def add_user_permission(self, user, permission, protocol=None,
                             source=None):
         """
@@ -341,6 +575,7 @@ class permissionsHandler(object):
                     return True
         return False
 
+    @_invalidates
     def remove_user_permission(self, user, permission, protocol=None,
                                source=None):
         """
@@ -405,6 +640,7 @@ class permissionsHandler(object):
                     return True
         return False
 
+    @_invalidates
     def set_user_group(self, user, group):
         """
         Set the group for a user.
@@ -463,7 +699,8 @@ class permissionsHandler(object):
 
     def user_has_permission(self, user, permission,
                             protocol=None, source=None,
-                            check_group=True, check_superadmin=True):
+                            check_group=True, check_superadmin=True,
+                            check_extra_groups=True):
         """
         Check whether a user has a permission. Don't use this if you're
         doing real permissions work - use check() instead.
@@ -474,6 +711,8 @@ class permissionsHandler(object):
         :param source: Source to check against
         :param check_group: Whether to check group permissions
         :param check_superadmin: Whether to honor superadmin
+        :param check_extra_groups: Whether to check the extra groups the
+            protocol gives the user, as well as their group
 
         :type user: str, unicode
         :type permission: str, unicode
@@ -481,6 +720,7 @@ class permissionsHandler(object):
         :type source: str, unicode
         :type check_group: bool
         :type check_superadmin: bool
+        :type check_extra_groups: bool
 
         :return: Whether the user has the given permission
         :rtype: bool
@@ -498,20 +738,10 @@ class permissionsHandler(object):
                 if self.get_user_option(user, "superadmin"):
                     return True
 
-            user_perms = self.data["users"][user]["permissions"]
-
-            _protos = self.data["users"][user].get("protocols", {})
+            matcher = self._get_compiled(("user", user, protocol, source),
+                                         self._user_permissions)
 
-            if protocol:
-                _proto = _protos.get(protocol, {})
-                user_perms = user_perms + _proto.get("permissions", [])
-
-                _sources = _protos.get("sources", {})
-
-                if source:
-                    user_perms = user_perms + _sources.get(source, [])
-
-            if self.compare_permissions(permission, user_perms):
+            if matcher.matches(permission):
                 return True
 
         if check_group:
@@ -520,6 +750,9 @@ class permissionsHandler(object):
             if has_perm:
                 return True
 
+            if not check_extra_groups:
+                return False
+
             if isinstance(protocol, basestring):
                 _protocol = self.plugin.factory_manager.get_protocol(protocol)
             else:
@@ -537,6 +770,7 @@ class permissionsHandler(object):
     # Group operations
     #  Modification
 
+    @_invalidates
     def create_group(self, group):
         """
         As with `create_user`, but for groups.
@@ -554,6 +788,7 @@ class permissionsHandler(object):
                 return True
         return False
 
+    @_invalidates
     def remove_group(self, group):
         """
         As with `remove_user`, but for groups.
@@ -567,6 +802,7 @@ class permissionsHandler(object):
                 return True
         return False
 
+    @_invalidates
     def set_group_option(self, group, option, value):
         """
         As with `set_user_option`, but for groups.
@@ -581,6 +817,7 @@ class permissionsHandler(object):
                 return True
         return False
 
+    @_invalidates
     def set_group_inheritance(self, group, inherit):
         """
         Set group inheritance for a certain group.
@@ -614,6 +851,7 @@ class permissionsHandler(object):
                 return True
         return False
 
+    @_invalidates
     def add_group_permission(self, group, permission, protocol=None,
                              source=None):
         """
@@ -647,6 +885,7 @@ class permissionsHandler(object):
         for permission in permissions:
             self.add_group_permission(group, permission)
 
+    @_invalidates
     def remove_group_permission(self, group, permission):
         """
         As with `remove_user_permission`, but for groups.
@@ -709,18 +948,46 @@ class permissionsHandler(object):
         group = group.lower()
         permission = permission.lower()
 
+        if group in self.data["groups"]:
+            matcher = self._get_compiled(("group", group, protocol, source),
+                                         self._group_permissions)
+            return matcher.matches(permission)
+        return False
+
+    # Flattening, for compiling permissions
+
+    def _user_permissions(self, user, protocol, source):
+        """
+        Get all of a user's own permission nodes that apply to a protocol
+        and source - not including their group's.
+        """
+
+        user_perms = self.data["users"][user]["permissions"]
+
+        _protos = self.data["users"][user].get("protocols", {})
+
+        if protocol:
+            _proto = _protos.get(protocol, {})
+            user_perms = user_perms + _proto.get("permissions", [])
+
+            _sources = _proto.get("sources", {})
+
+            if source:
+                user_perms = user_perms + _sources.get(source, [])
+
+        return user_perms
+
+    def _group_permissions(self, group, protocol, source):
+        """
+        Get all of a group's permission nodes that apply to a protocol and
+        source, including the ones it inherits.
+        """
+
         groups = []
         all_perms = set()
 
-        self.plugin.logger.debug(_("Checking group perms..."))
-        self.plugin.logger.debug(_("GROUP | %s") % group)
-        self.plugin.logger.debug(_("PERMI | %s") % permission)
-        self.plugin.logger.debug(_("SOURC | %s") % source)
-        self.plugin.logger.debug(_("PROTO | %s") % protocol)
-
         def _recur(_group):
             if _group is None:
-                self.plugin.logger.debug(_("Group is None."))
                 return
             if _group in self.data["groups"]:
                 if _group not in groups:
@@ -731,7 +998,6 @@ class permissionsHandler(object):
                     _protos = self.data["groups"][_group].get("protocols", {})
 
                     if _protos is None:
-                        self.plugin.logger.debug(_("Protocols are None."))
                         return
 
                     if protocol:
@@ -742,7 +1008,6 @@ class permissionsHandler(object):
                         _sources = _proto.get("sources", {})
 
                         if _sources is None:
-                            self.plugin.logger.debug(_("Sources are None."))
                             return
 
                         if source:
@@ -752,10 +1017,8 @@ class permissionsHandler(object):
                     if inherit:
                         _recur(inherit)
 
-        if group in self.data["groups"]:
-            _recur(group)
-            return self.compare_permissions(permission, list(all_perms))
-        return False
+        _recur(group)
+        return list(all_perms)
 
     # Permissions comparisons
     def compare_permissions(self, perm, permissions, wildcard=True,
@@ -278,7 +278,7 @@ class BridgePlugin(PluginObject):
             t_name = target.nickname
 
         for rule, data in self.rules.items():
-            self.logger.debug(_("Checking rule: %s - %s") % (rule, data))
+            self.logger.debug(_("Checking rule: %s - %s"), rule, data)
             from_ = data["from"]
             to_ = data["to"]
 
@@ -7,17 +7,22 @@ This allows direct access to the interpreter, so it's quite a dangerous
 plugin - don't give command access to someone you don't trust to delete
 all your files!
 
-This also does a few different monitoring tasks.
+This also does a few different monitoring tasks, can tell you which
+event handlers are taking up the most time, and can record a protocol's raw
+input for replaying with profiling/replay.py.
 """
 
 import code
+import threading
 
 from kitchen.text.converters import to_bytes
 
 from plugins.debug.interpreter import Interpreter
 from plugins.debug.monitors import UncollectableMonitor
+from profiling.recording import Recorder
 
 from system.plugins.plugin import PluginObject
+from system.storage.clients import ClientRegistry
 from system.translations import Translations
 
 __author__ = 'Gareth Coles'
@@ -40,17 +45,43 @@ class DebugPlugin(PluginObject):
     source = None
 
     monitors = []
+    recorders = {}
+
+    #: How many handlers to list in the eventstats command
+    EVENTSTATS_LIMIT = 5
 
     def setup(self):
         """
         The list of bridging rules
         """
 
+        self.recorders = {}
+        self.lock = threading.Lock()
         self.reload()
 
         self.commands.register_command(
-            "debug", self.debug_cmd, self, "debug.debug", aliases=["dbg"]
+            "debug", self.debug_cmd, self, "debug.debug", aliases=["dbg"],
+            blocking=True
+        )
+        self.commands.register_command(
+            "eventstats", self.eventstats_cmd, self, "debug.eventstats"
+        )
+        self.commands.register_command(
+            "record", self.record_cmd, self, "debug.record"
         )
+        self.commands.register_command(
+            "clientstats", self.clientstats_cmd, self, "debug.clientstats"
+        )
+
+    def deactivate(self):
+        """
+        Stop any recordings that are still running
+        """
+
+        for recorder in self.recorders.values():
+            recorder.stop()
+
+        self.recorders = {}
 
     def output(self, message):
         """
@@ -93,24 +124,123 @@ class DebugPlugin(PluginObject):
         Command handler for the debug command
         """
 
-        self.source = source
-        self.caller = caller
-        self.protocol = protocol
+        # This is a blocking command, and the interpreter is shared, so
+        # only one run may happen at a time
+        with self.lock:
+            self.source = source
+            self.caller = caller
+            self.protocol = protocol
+
+            try:
+                c_obj = code.compile_command(raw_args)
+            except SyntaxError as e:
+                self.output(__("Syntax error: %s") % e.text)
+                return
+            except (OverflowError, ValueError) as e:
+                self.output(__("Invalid literal: %s") % e.msg)
+                return
+            except Exception as e:
+                self.output("%s" % e)
+                return
+
+            try:
+                self.interpreter.runcode(c_obj)
+            except Exception as e:
+                self.output("%s" % e)
+                return
+
+    def eventstats_cmd(self, protocol, caller, source, command, raw_args,
+                       parsed_args):
+        """
+        Command handler for the eventstats command
+        """
 
-        try:
-            c_obj = code.compile_command(raw_args)
-        except SyntaxError as e:
-            self.output(__("Syntax error: %s") % e.text)
-            return
-        except (OverflowError, ValueError) as e:
-            self.output(__("Invalid literal: %s") % e.msg)
-            return
-        except Exception as e:
-            self.output("%s" % e)
+        args = raw_args.split()
+
+        if args and args[0].lower() == "reset":
+            self.events.reset_stats()
+            source.respond(__("Event handler stats have been reset."))
             return
 
-        try:
-            self.interpreter.runcode(c_obj)
-        except Exception as e:
-            self.output("%s" % e)
+        callback = args[0] if args else None
+        stats = self.events.get_stats(callback)[:self.EVENTSTATS_LIMIT]
+
+        if not stats:
+            source.respond(__("No event handlers have been called yet."))
             return
+
+        for handler in stats:
+            source.respond(__(
+                "%s/%s: %s calls, %s errors, %.2fms mean, %.2fms max, "
+                "~%.2fs total"
+            ) % (handler.callback, handler.plugin, handler.calls,
+                 handler.errors, handler.mean * 1000, handler.max * 1000,
+                 handler.estimated_total))
+
+    def clientstats_cmd(self, protocol, caller, source, command, raw_args,
+                        parsed_args):
+        """
+        Command handler for the clientstats command
+        """
+
+        registry = ClientRegistry()
+        stats = registry.get_stats()
+
+        source.respond(__("%s shared storage clients - %s created, %s "
+                          "reused.")
+                       % (len(stats), registry.created, registry.reused))
+
+        for client in stats:
+            source.respond(__("%s %s: used by %s, %s connections")
+                           % (client["kind"], client["params"],
+                              client["references"],
+                              client["connections"]
+                              if client["connections"] is not None
+                              else "?"))
+
+    def record_cmd(self, protocol, caller, source, command, raw_args,
+                   parsed_args):
+        """
+        Command handler for the record command
+        """
+
+        args = raw_args.split()
+
+        if len(args) == 2 and args[0].lower() == "stop":
+            recorder = self.recorders.pop(args[1], None)
+
+            if recorder is None:
+                source.respond(__("Protocol %s isn't being recorded.")
+                               % args[1])
+                return
+
+            recorder.stop()
+            source.respond(__("Recording stopped: %s records, %s bytes.")
+                           % (recorder.records, recorder.bytes))
+        elif len(args) == 2:
+            name, path = args
+
+            if name in self.recorders:
+                source.respond(__("Protocol %s is already being recorded.")
+                               % name)
+                return
+
+            target = self.factory_manager.get_protocol(name)
+
+            if target is None:
+                source.respond(__("Unknown protocol: %s") % name)
+                return
+
+            recorder = Recorder(target, path)
+
+            try:
+                recorder.start()
+            except Exception as e:
+                source.respond(__("Unable to start recording: %s") % e)
+                return
+
+            self.recorders[name] = recorder
+            source.respond(__("Recording protocol %s to %s.") % (name, path))
+        else:
+            source.respond(__("Usage: %s <protocol> <file> | stop <protocol>")
+                           % command)
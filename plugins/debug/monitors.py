@@ -52,13 +52,13 @@ class UncollectableMonitor(object):
         self._printKids(obj, 2)
 
     def _printParents(self, obj, level, indent=' '):
-        self.logger.warn("%s%s" % (indent, self._shortRepr(obj)))
+        self.logger.warn("%s%s", indent, self._shortRepr(obj))
         if level > 0:
             for p in gc.get_referrers(obj):
                 self._printParents(p, level - 1, indent + " ")
 
     def _printKids(self, obj, level, indent=' '):
-        self.logger.warn("%s%s" % (indent, self._shortRepr(obj)))
+        self.logger.warn("%s%s", indent, self._shortRepr(obj))
         if level > 0:
             for kid in gc.get_referents(obj):
                 self._printKids(kid, level - 1, indent + " ")
@@ -64,14 +64,11 @@ class DialectizerPlugin(PluginObject):
         name = event.caller.name
         target = event.target.name
 
-        with self.data:
-            if name not in self.data:
-                self.data[name] = {}
-
-            if target not in self.data[name]:
-                self.data[name][target] = "off"
+        # This runs for every message, so don't save anything here
+        with self.data.reading():
+            setting = self.data.get(name, {}).get(target, "off")
 
-        subber = self.dialectizers[self.data[name][target]]
+        subber = self.dialectizers[setting]
 
         message = event.message
         message = subber.sub(message)
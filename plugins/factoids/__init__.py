@@ -223,8 +223,8 @@ class FactoidsPlugin(PluginObject):
         Deletes a factoid if it exists, otherwise raises MissingFactoidError
         """
 
-        self.logger.trace("DELETE | Key: %s | Loc: %s | Pro: %s | Cha: %s"
-                          % (factoid_key, location, protocol, channel))
+        self.logger.trace("DELETE | Key: %s | Loc: %s | Pro: %s | Cha: %s",
+                          factoid_key, location, protocol, channel)
 
         if location == self.CHANNEL:
             txn.execute("DELETE FROM factoids WHERE factoid_key = ? AND "
@@ -12,6 +12,7 @@ from txrequests import Session
 from plugins.urls.lazy import LazyRequest
 from plugins.urls.priority import Priority
 from plugins.urls.shorteners.exceptions import ShortenerDown
+from system.events.filters import EventFilter
 from system.protocols.generic.channel import Channel
 from system.storage.formats import Formats
 from system.plugins.plugin import PluginObject
@@ -82,11 +83,8 @@ class URLsPlugin(PluginObject):
         self.config.add_callback(self.reload)
         self.reload()
 
-        def message_event_filter(event):
-            return event.type == "message"
-
         self.events.add_callback("MessageReceived", self, self.message_handler,
-                                 1, message_event_filter)
+                                 1, EventFilter(message_type="message"))
 
         self.add_handler(WebsiteHandler(self), Priority.MONITOR)
         self.add_shortener(TinyURLShortener(self))
@@ -225,7 +223,7 @@ class URLsPlugin(PluginObject):
         matches = extract_urls(message)
 
         for match in matches:
-            self.logger.trace("match: {0}", match)
+            self.logger.trace("match: %s", match)
 
             _url = self.match_to_url(match)
 
@@ -285,6 +283,10 @@ class URLsPlugin(PluginObject):
             })
 
     def ensure_channel(self, protocol_name, source_name):
+        with self.channels.reading():
+            if source_name in self.channels.get(protocol_name, {}):
+                return
+
         with self.channels:
             if protocol_name not in self.channels:
                 self.channels[protocol_name] = {}
@@ -314,7 +316,7 @@ class URLsPlugin(PluginObject):
             if _port:
                 _port = int(_port)
         except ValueError:
-            self.logger.warn("Invalid port: {0}", _port)
+            self.logger.warn("Invalid port: %s", _port)
             return None
 
         _translated = self.translate_prefix(_prefix)
@@ -493,7 +495,7 @@ class URLsPlugin(PluginObject):
                     entry, _url.to_string(), flags=str_to_regex_flags("ui")
             ):
                 self.logger.debug(
-                    "Matched blacklist regex: %s" % entry
+                    "Matched blacklist regex: %s", entry
                 )
                 return True
 
@@ -592,7 +594,7 @@ class URLsPlugin(PluginObject):
 
     def add_handler(self, handler, priority=0):
         if not self.has_handler(handler.name):  # Only add if it's not there
-            self.logger.debug("Adding handler: {}".format(handler.name))
+            self.logger.debug("Adding handler: %s", handler.name)
             handler.urls_plugin = self
 
             self.handlers[priority].append(handler)
@@ -186,8 +186,8 @@ class WebsiteHandler(URLHandler):
 
         if content_type not in self.urls_plugin.config["content_types"]:
             self.plugin.logger.debug(
-                "Unsupported Content-Type: %s"
-                % response.headers["content-type"]
+                "Unsupported Content-Type: %s",
+                response.headers["content-type"]
             )
             return response, None  # Not a supported content-type
 
@@ -206,12 +206,12 @@ class WebsiteHandler(URLHandler):
                         if charset == "binary":
                             # Not a webpage, so return None content
                             self.urls_plugin.logger.debug(
-                                "Unsupported charset: {0}", charset)
+                                "Unsupported charset: %s", charset)
                             return response, None
                         # Contains charset header - let requests decode
                         decode_unicode = True
                         self.urls_plugin.logger.trace(
-                            "Charset specified in header: {0}", charset)
+                            "Charset specified in header: %s", charset)
                         break
 
         amount_read = 0
@@ -225,11 +225,11 @@ class WebsiteHandler(URLHandler):
                 # See comment beside chunk_size def - it's not a fixed limit
                 chunks.append(chunk)
                 amount_read += len(chunk)
-                self.plugin.logger.trace("Read a chunk of {0} bytes",
+                self.plugin.logger.trace("Read a chunk of %s bytes",
                                          len(chunk))
                 if amount_read >= max_read:
                     self.plugin.logger.debug(
-                        "Stopped reading response after {0} bytes",
+                        "Stopped reading response after %s bytes",
                         amount_read
                     )
                     break
@@ -249,10 +249,10 @@ class WebsiteHandler(URLHandler):
         content = result[1]
 
         self.plugin.logger.trace(
-            "Headers: {0}", list(response.headers)
+            "Headers: %s", list(response.headers)
         )
 
-        self.plugin.logger.trace("HTTP code: {0}", response.status_code)
+        self.plugin.logger.trace("HTTP code: %s", response.status_code)
 
         new_url = urlparse.urlparse(response.url)
 
@@ -9,13 +9,22 @@ print os.getcwd()
 sys.path.append(os.getcwd())  # Because herp derp
 
 import cProfile
+import time
 
 from profiling.fakes import FakePlugin, FakePluginEvent
 
 from system.events.manager import EventManager
+from system.translations import Translations
+_ = Translations().get()
 
 events = EventManager()
 
+#: How many events to fire for each benchmark run
+EVENT_COUNT = 20000
+
+#: How many extra plugins to register handlers for in the benchmark
+PLUGIN_COUNT = 20
+
 
 class EventPlugin(FakePlugin):
     def __init__(self, info):
@@ -27,6 +36,53 @@ class EventPlugin(FakePlugin):
         pass
 
 
+class FilteredEventPlugin(FakePlugin):
+    def __init__(self, info, priority):
+        super(FilteredEventPlugin, self).__init__(info)
+
+        events.add_callback("Test", self, self.event_callback, priority,
+                            self.event_filter)
+
+    def event_filter(self, event):
+        return not event.cancelled
+
+    def event_callback(self, event):
+        pass
+
+
+def legacy_run_callback(callback, event):
+    """
+    The dispatch loop from before handler chains were compiled, kept here so
+    that we can compare against it.
+    """
+
+    if events.has_callback(callback):
+        event.threaded = False
+
+        for cb in events.get_callbacks(callback):
+            def go():
+                cb["function"](event, *cb["extra_args"],
+                               **cb["extra_kwargs"])
+            try:
+                events.logger.debug(_("Running callback: %s") % cb)
+                if cb["filter"]:
+                    if callable(cb["filter"]):
+                        if not cb["filter"](event):
+                            continue
+                    else:
+                        continue
+                if event.cancelled:
+                    if cb["cancelled"]:
+                        go()
+                else:
+                    go()
+            except Exception as e:
+                events.logger.exception(_(
+                    "Error running callback '%s': %s"
+                ) % (callback, e))
+    return event
+
+
 def do_profile():
     plugin = EventPlugin({"name": "FAAAAAAAAKE!"})
     cProfile.run("run()")
@@ -38,5 +94,41 @@ def run():
         events.run_callback("Test", e)
 
 
+def time_dispatch(func):
+    """
+    Fire EVENT_COUNT events through a dispatch function, returning the
+    number of events handled per second.
+    """
+
+    fired = [FakePluginEvent() for i in xrange(EVENT_COUNT)]
+
+    start = time.time()
+
+    for e in fired:
+        func("Test", e)
+
+    return EVENT_COUNT / (time.time() - start)
+
+
+def do_benchmark():
+    plugins = [EventPlugin({"name": "FAAAAAAAAKE!"})]
+
+    for i in xrange(PLUGIN_COUNT):
+        plugins.append(
+            FilteredEventPlugin({"name": "Filtered %s" % i}, i)
+        )
+
+    before = time_dispatch(legacy_run_callback)
+    after = time_dispatch(events.run_callback)
+
+    print "Handlers per event: %s" % len(events.get_callbacks("Test"))
+    print "Before: %.0f events/sec" % before
+    print "After:  %.0f events/sec" % after
+    print "Speedup: %.2fx" % (after / before)
+
+
 if __name__ == "__main__":
-    do_profile()
+    if "--benchmark" in sys.argv:
+        do_benchmark()
+    else:
+        do_profile()
@@ -2,10 +2,15 @@
 
 __author__ = 'Gareth Coles'
 
+from system.commands.manager import CommandManager
 from system.events.base import BaseEvent, PluginEvent
+from system.events.manager import EventManager
+from system.plugins.manager import PluginManager
 from system.plugins.plugin import PluginObject
+from system.protocols.generic.factory import BaseFactory
 from system.protocols.generic.user import User
 from system.protocols.generic.protocol import Protocol
+from system.storage.manager import StorageManager
 
 from utils.misc import AttrDict
 
@@ -42,3 +47,129 @@ class FakeUser(User):
 
     def respond(self, message):
         print "Fake message to %s: %s" % (self.name, message)
+
+
+class FakeTransport(object):
+    """
+    A transport that throws away everything written to it, counting it
+    instead - so it can be left running for as long as you like.
+    """
+
+    disconnecting = False
+
+    def __init__(self):
+        self.writes = 0
+        self.written = 0
+        self.connected = True
+
+    def write(self, data):
+        self.writes += 1
+        self.written += len(data)
+
+    def writeSequence(self, data):
+        for chunk in data:
+            self.write(chunk)
+
+    def loseConnection(self):
+        self.connected = False
+
+    abortConnection = loseConnection
+
+    def getPeer(self):
+        return None
+
+    def getHost(self):
+        return None
+
+
+class FakeFactory(BaseFactory):
+    """
+    A protocol factory that never connects anywhere. Build a protocol from
+    it with `buildProtocol`, then connect it to a `FakeTransport`.
+    """
+
+    @property
+    def reconnection_config(self):
+        return {"reset-on-success": True}
+
+    def connect(self):
+        return True
+
+    def clientConnectionFailed(self, connector, reason):
+        pass
+
+    def clientConnectionLost(self, connector, reason):
+        pass
+
+
+class FakeFactoryManager(object):
+    """
+    Just enough of a factory manager for protocols and plugins to run
+    against, without connecting to anything.
+    """
+
+    def __init__(self, main_config=None):
+        if main_config is None:
+            main_config = {}
+
+        self.main_config = main_config
+        self.factories = {}
+        self.configs = {}
+        self.running = True
+        self.metrics = None
+
+        self.commands = CommandManager()
+        self.event_manager = EventManager()
+        self.storage = StorageManager()
+        self.plugman = PluginManager(self)
+
+        self.commands.set_factory_manager(self)
+
+    @property
+    def all_plugins(self):
+        return self.plugman.info_objects
+
+    @property
+    def loaded_plugins(self):
+        return self.plugman.plugin_objects
+
+    def add_protocol(self, name, config):
+        """
+        Build a protocol, connected to a `FakeTransport`.
+
+        :param name: The name of the protocol
+        :param config: The protocol's configuration
+
+        :return: The protocol
+        """
+
+        factory = FakeFactory(name, config, self)
+        self.factories[name] = factory
+        self.configs[name] = config
+
+        protocol = factory.buildProtocol(None)
+        protocol.makeConnection(FakeTransport())
+
+        return protocol
+
+    def remove_protocol(self, name):
+        factory = self.factories.pop(name, None)
+        self.configs.pop(name, None)
+
+        if factory is not None:
+            factory.shutting_down = True
+            factory.protocol = None
+
+    def get_protocol(self, name):
+        if name in self.factories:
+            return self.factories[name].protocol
+        return None
+
+    def get_factory(self, name):
+        return self.factories.get(name)
+
+    def unload(self):
+        self.plugman.unload_plugins()
+
+        for name in self.factories.keys():
+            self.remove_protocol(name)
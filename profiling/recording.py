@@ -0,0 +1,213 @@
+# coding=utf-8
+
+"""
+Recordings of raw protocol input, for replaying through the bot later.
+
+A `Recorder` hooks into a connected protocol and writes everything it
+receives to a file, exactly as it came off the wire - IRC lines, Mumble
+protobuf frames, whatever the protocol speaks. The file can then be read
+back with `Recording`, which is what `profiling/replay.py` does.
+
+Recordings are gzipped, and look like this inside::
+
+    MAGIC
+    !I header length, followed by a JSON header
+    !dI (seconds since the start, data length), followed by the data
+    ...repeated for each chunk of data received
+
+The header contains the protocol's name and type, and when the recording
+was started. Configuration is deliberately not recorded, as it's full of
+passwords.
+
+Recordings contain everything the protocol received, so they will contain
+private messages and anything else sent to the bot. Treat them with the
+same care as your logs.
+"""
+
+import gzip
+import json
+import struct
+import time
+
+from system.logging.logger import getLogger
+from system.translations import Translations
+from utils.clock import monotonic
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+#: Identifies recording files, and the version of the format
+MAGIC = "ULTROSREC\x01"
+
+HEADER_FORMAT = "!I"
+HEADER_LENGTH = struct.calcsize(HEADER_FORMAT)
+
+RECORD_FORMAT = "!dI"
+RECORD_LENGTH = struct.calcsize(RECORD_FORMAT)
+
+
+class RecordingError(Exception):
+    """
+    Raised when a recording file can't be read.
+    """
+
+    pass
+
+
+class Recorder(object):
+    """
+    Records the raw input received by a protocol.
+
+    >>> recorder = Recorder(protocol, "irc-esper.rec")
+    >>> recorder.start()
+    >>> # Some time later..
+    >>> recorder.stop()
+    """
+
+    def __init__(self, protocol, path):
+        """
+        :param protocol: The connected protocol to record
+        :param path: The file to write the recording to
+
+        :type protocol: system.protocols.generic.protocol.Protocol
+        :type path: str
+        """
+
+        self.protocol = protocol
+        self.path = path
+
+        self.logger = getLogger("Recorder")
+
+        self.records = 0
+        self.bytes = 0
+        self.recording = False
+
+        self._file = None
+        self._start = None
+
+    def __repr__(self):
+        return "<%s %s -> %s: %s records, %s bytes>" % (
+            self.__class__.__name__, self.protocol.name, self.path,
+            self.records, self.bytes
+        )
+
+    def start(self):
+        """
+        Start recording. This replaces the protocol's **dataReceived**
+        method until `stop` is called.
+        """
+
+        if self.recording:
+            return
+
+        header = json.dumps({
+            "protocol": self.protocol.name,
+            "protocol-type": self.protocol.TYPE,
+            "started": time.time()
+        })
+
+        self._file = gzip.open(self.path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(struct.pack(HEADER_FORMAT, len(header)))
+        self._file.write(header)
+
+        self._start = monotonic()
+        self._original = self.protocol.dataReceived
+        self.protocol.dataReceived = self._data_received
+
+        self.recording = True
+        self.logger.info(_("Recording protocol %s to %s")
+                         % (self.protocol.name, self.path))
+
+    def stop(self):
+        """
+        Stop recording, and close the file.
+        """
+
+        if not self.recording:
+            return
+
+        self.recording = False
+        self.protocol.dataReceived = self._original
+        del self._original
+
+        self._file.close()
+        self._file = None
+
+        self.logger.info(_("Stopped recording protocol %s: %s records, %s "
+                           "bytes") % (self.protocol.name, self.records,
+                                       self.bytes))
+
+    def _data_received(self, data):
+        try:
+            self._file.write(struct.pack(
+                RECORD_FORMAT, monotonic() - self._start, len(data)
+            ))
+            self._file.write(data)
+
+            self.records += 1
+            self.bytes += len(data)
+        except Exception:
+            self.logger.exception(_("Error writing recording, stopping"))
+            original = self._original
+            self.stop()
+
+            return original(data)
+
+        return self._original(data)
+
+
+class Recording(object):
+    """
+    A recording, as written by a `Recorder`.
+
+    Iterate over this to get (seconds since the start, data) tuples.
+
+    :ivar header: The recording's header - a dict containing **protocol**,
+        **protocol-type** and **started**
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The file to read the recording from
+        :type path: str
+
+        :raises RecordingError: If the file isn't a valid recording
+        """
+
+        self.path = path
+
+        with gzip.open(path, "rb") as fh:
+            self.header = self._read_header(fh)
+
+    def _read_header(self, fh):
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise RecordingError(_("Not a recording: %s") % self.path)
+
+        length, = struct.unpack(HEADER_FORMAT, fh.read(HEADER_LENGTH))
+        return json.loads(fh.read(length))
+
+    def __iter__(self):
+        with gzip.open(self.path, "rb") as fh:
+            self._read_header(fh)
+
+            while True:
+                prefix = fh.read(RECORD_LENGTH)
+
+                if not prefix:
+                    return
+
+                if len(prefix) < RECORD_LENGTH:
+                    raise RecordingError(
+                        _("Recording is truncated: %s") % self.path
+                    )
+
+                timestamp, length = struct.unpack(RECORD_FORMAT, prefix)
+                data = fh.read(length)
+
+                if len(data) < length:
+                    raise RecordingError(
+                        _("Recording is truncated: %s") % self.path
+                    )
+
+                yield timestamp, data
@@ -0,0 +1,310 @@
+# coding=utf-8
+
+"""
+Replay a recording of raw protocol input through the bot, as fast as
+possible, and report on how long it all took.
+
+Recordings are made with `profiling.recording.Recorder` - see the "record"
+command in the Debug plugin. Input is fed through the real protocol class,
+the command manager and any plugins you ask for, with a fake transport and
+factory standing in for the network - so nothing ever connects anywhere.
+
+    python profiling/replay.py irc-esper.rec --plugins Auth,URLs --repeat 5
+
+The protocol is configured from its example configuration file, unless you
+give it a real one with --config. Rate limiting is always turned off.
+
+Plugins are loaded with your real plugin configuration and data files, so
+don't point this at a bot that's running from the same directory.
+
+Note that the reactor isn't running during the replay, so anything a
+protocol or plugin schedules for later won't be run.
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())  # Because herp derp
+
+import argparse
+import gc
+import resource
+import cProfile
+
+from collections import defaultdict
+from functools import wraps
+
+import logbook
+import yaml
+
+from profiling.fakes import FakeFactoryManager
+from profiling.recording import Recording
+
+from system.commands.manager import CommandManager
+from system.events.manager import EventManager
+from system.logging.logger import get_level_from_name
+from utils.clock import monotonic
+
+__author__ = 'Gareth Coles'
+
+#: Example configurations for each protocol type, used when --config isn't
+#: given
+EXAMPLE_CONFIGS = {
+    "irc": "config/protocols/irc-esper.yml.example",
+    "mumble": "config/protocols/mumble.yml.example"
+}
+
+
+class StageTimer(object):
+    """
+    Times calls to functions, grouped into named stages.
+
+    Times are exclusive - when a timed function calls another, the inner
+    call's time only counts towards its own stage - so the stage totals add
+    up to the total time taken.
+    """
+
+    def __init__(self):
+        self.times = defaultdict(list)
+        self._stack = []
+
+    def wrap(self, func, stage):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            self._stack.append(0.0)
+            start = monotonic()
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = monotonic() - start
+                children = self._stack.pop()
+
+                self.times[stage].append(elapsed - children)
+
+                if self._stack:
+                    self._stack[-1] += elapsed
+
+        return inner
+
+
+def percentile(values, pc):
+    """
+    Get a percentile from a sorted list of values.
+    """
+
+    if not values:
+        return 0.0
+
+    index = int(round(pc / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+def load_config(path, protocol_type):
+    if path is None:
+        path = EXAMPLE_CONFIGS.get(protocol_type)
+
+        if path is None:
+            raise ValueError(
+                "No example configuration for protocol type %s - use "
+                "--config" % protocol_type
+            )
+
+    with open(path, "r") as fh:
+        config = yaml.load(fh)
+
+    if "rate_limiting" in config:
+        config["rate_limiting"]["enabled"] = False
+
+    return config
+
+
+def object_counts():
+    gc.collect()
+    counts = defaultdict(int)
+
+    for obj in gc.get_objects():
+        counts[type(obj).__name__] += 1
+
+    return counts
+
+
+def replay(recording, config, manager, repeat=1):
+    """
+    Replay a recording through a fresh protocol, *repeat* times.
+
+    :return: (StageTimer, number of chunks replayed, bytes replayed,
+        bytes written to the transport)
+    """
+
+    records = list(recording)  # So that file IO isn't timed
+    name = recording.header["protocol"]
+
+    timer = StageTimer()
+
+    events = EventManager()
+    commands = CommandManager()
+
+    # These are singletons, so these wrappers apply to protocols and plugins
+    # alike; they're removed again afterwards
+    events.run_callback = timer.wrap(events.run_callback, "events")
+    commands.process_input = timer.wrap(commands.process_input, "commands")
+
+    chunks = 0
+    received = 0
+    written = 0
+
+    try:
+        for i in xrange(repeat):
+            protocol = manager.add_protocol(name, config)
+            data_received = timer.wrap(protocol.dataReceived, "protocol")
+
+            for timestamp, data in records:
+                data_received(data)
+
+            chunks += len(records)
+            received += sum(len(data) for timestamp, data in records)
+            written += protocol.transport.written
+
+            manager.remove_protocol(name)
+    finally:
+        del events.run_callback
+        del commands.process_input
+
+    return timer, chunks, received, written
+
+
+def report(recording, timer, chunks, received, written, elapsed, repeat):
+    print "Recording: %s (%s, %s)" % (
+        recording.path, recording.header["protocol"],
+        recording.header["protocol-type"]
+    )
+
+    records = list(recording)
+
+    if records:
+        duration = records[-1][0] * repeat
+
+        print "Recorded duration: %.2fs, replayed in %.2fs (%.0fx)" % (
+            duration, elapsed, duration / elapsed if elapsed else 0
+        )
+
+    print "Throughput: %.0f chunks/sec, %.2f KiB/sec in, %.2f KiB written" % (
+        chunks / elapsed, received / 1024.0 / elapsed, written / 1024.0
+    )
+
+    print
+    print "%-10s %8s %10s %9s %9s %9s %9s" % (
+        "Stage", "Calls", "Total (s)", "Mean (ms)", "p50 (ms)", "p99 (ms)",
+        "Max (ms)"
+    )
+
+    for stage in ["protocol", "events", "commands"]:
+        times = sorted(timer.times.get(stage, []))
+
+        if not times:
+            continue
+
+        total = sum(times)
+
+        print "%-10s %8s %10.3f %9.3f %9.3f %9.3f %9.3f" % (
+            stage, len(times), total, total / len(times) * 1000,
+            percentile(times, 50) * 1000, percentile(times, 99) * 1000,
+            times[-1] * 1000
+        )
+
+    stats = EventManager().get_stats()[:10]
+
+    if stats:
+        print
+        print "Most expensive event handlers:"
+
+        for handler in stats:
+            print "    %s/%s: %s calls, %s errors, %.3fms mean, %.3fs " \
+                  "total" % (handler.callback, handler.plugin, handler.calls,
+                             handler.errors, handler.mean * 1000,
+                             handler.total)
+
+
+def report_memory(before, after):
+    grown = sorted(
+        ((after[key] - before.get(key, 0), key) for key in after),
+        reverse=True
+    )
+
+    print
+    print "Peak RSS: %.2f MiB" % (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    )
+    print "Objects retained after the replay: %s" % (
+        sum(after.values()) - sum(before.values())
+    )
+
+    for count, key in grown[:5]:
+        if count > 0:
+            print "    %s: +%s" % (key, count)
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Replay a protocol recording through the bot"
+    )
+    p.add_argument("recording", help="The recording to replay")
+    p.add_argument("--config", help="Protocol configuration file to use, "
+                                    "instead of the example configuration")
+    p.add_argument("--plugins", default="",
+                   help="Comma-separated list of plugins to load")
+    p.add_argument("--repeat", type=int, default=1,
+                   help="How many times to replay the recording")
+    p.add_argument("--log-level", default="warning",
+                   help="Only show log messages at this level or above")
+    p.add_argument("--profile", action="store_true",
+                   help="Run the replay under cProfile as well")
+
+    args = p.parse_args()
+
+    # Keep log output from skewing the results
+    logbook.NullHandler().push_application()
+    logbook.StderrHandler(
+        level=get_level_from_name(args.log_level), bubble=False
+    ).push_application()
+
+    recording = Recording(args.recording)
+    config = load_config(args.config, recording.header["protocol-type"])
+
+    manager = FakeFactoryManager()
+    plugins = [x.strip() for x in args.plugins.split(",") if x.strip()]
+
+    if plugins:
+        manager.plugman.scan(output=False)
+        manager.plugman.load_plugins(plugins)
+
+    events = EventManager()
+    events.stats_sample_rate = 1  # Time every handler call
+    events.reset_stats()
+
+    before = object_counts()
+    start = monotonic()
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(replay, recording, config, manager,
+                                  args.repeat)
+    else:
+        result = replay(recording, config, manager, args.repeat)
+
+    elapsed = monotonic() - start
+    after = object_counts()
+
+    report(recording, *result, elapsed=elapsed, repeat=args.repeat)
+    report_memory(before, after)
+
+    if args.profile:
+        print
+        profiler.print_stats("cumulative")
+
+    manager.unload()
+
+
+if __name__ == "__main__":
+    main()
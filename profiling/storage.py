@@ -0,0 +1,136 @@
+# coding=utf-8
+
+"""
+Stress benchmark for the locking in the dict-like data objects.
+
+Data objects used to share one lock per class, so every thread touching any
+YAML file waited on every other one - even for unrelated files. Now each
+object has its own reader/writer lock. This runs a bunch of threads against
+the same file and against separate files, with both kinds of locking, and
+reports the throughput of each.
+
+    python profiling/storage.py --threads 1,2,4,8 --writes 10
+
+Each operation holds the lock for a short time, standing in for a plugin
+doing something slow - like looking something up - while it's reading.
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())  # Because herp derp
+
+import argparse
+import threading
+import time
+
+from contextlib import contextmanager
+
+from system.storage.data import MemoryData
+
+__author__ = 'Gareth Coles'
+
+#: How many operations each thread runs
+OPERATIONS = 200
+
+#: How long each operation holds the lock for, in seconds
+HOLD_TIME = 0.0005
+
+
+class LegacyMemoryData(MemoryData):
+    """
+    MemoryData with one lock shared between every instance, as it used to
+    be - kept here so that we can compare against it.
+    """
+
+    mutex = threading.Lock()
+
+    @contextmanager
+    def reading(self):
+        with self.mutex:
+            yield self
+
+    def __enter__(self):
+        self.mutex.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.mutex.release()
+        return exc_type is None
+
+
+def work(data, writes):
+    """
+    Run OPERATIONS reads and writes against a data object. Every hundred
+    operations, `writes` of them are writes.
+    """
+
+    for i in xrange(OPERATIONS):
+        if i % 100 < writes:
+            with data:
+                data["count"] += 1
+                time.sleep(HOLD_TIME)
+        else:
+            with data.reading():
+                data.get("count")
+                time.sleep(HOLD_TIME)
+
+
+def run(cls, threads, files, writes):
+    """
+    Run some threads against some data objects, spread evenly between them,
+    and return the number of operations per second.
+    """
+
+    objects = [cls({"count": 0}) for i in xrange(files)]
+    workers = [
+        threading.Thread(target=work, args=(objects[i % files], writes))
+        for i in xrange(threads)
+    ]
+
+    start = time.time()
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    return threads * OPERATIONS / (time.time() - start)
+
+
+def do_benchmark(thread_counts, writes):
+    print "%s operations per thread, %.1fms each, %s%% writes" % (
+        OPERATIONS, HOLD_TIME * 1000, writes
+    )
+    print
+
+    for name, same_file in (("Same file", True), ("Separate files", False)):
+        print name
+        print "Threads  Before (ops/sec)  After (ops/sec)  Speedup"
+
+        for threads in thread_counts:
+            files = 1 if same_file else threads
+
+            before = run(LegacyMemoryData, threads, files, writes)
+            after = run(MemoryData, threads, files, writes)
+
+            print "%7s  %16.0f  %15.0f  %6.2fx" % (
+                threads, before, after, after / before
+            )
+
+        print
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(
+        description="Benchmark data object locking with many threads"
+    )
+    p.add_argument("--threads", default="1,2,4,8",
+                   help="Comma-separated thread counts to try")
+    p.add_argument("--writes", type=int, default=10,
+                   help="Percentage of operations that are writes")
+
+    args = p.parse_args()
+
+    do_benchmark([int(x) for x in args.threads.split(",")],
+                 max(0, min(args.writes, 100)))
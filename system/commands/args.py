@@ -0,0 +1,138 @@
+# coding=utf-8
+
+"""
+Command argument parsing.
+
+Commands are given their arguments twice - once as the raw string, and once
+split up shell-style, with double-quotes grouping words together. Most
+commands only ever look at one of these, so the split-up version is a
+`LazyArgs` list, which doesn't do any parsing until it's actually used.
+
+Arguments that can't be split up shell-style - for example, with an
+unbalanced quote, as in "it's" - are split on whitespace instead.
+"""
+
+import shlex
+
+from system.translations import Translations
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+
+def parse_args(raw_args):
+    """
+    Split up a string of arguments, shell-style.
+
+    >>> parse_args('one "two three" four')
+    ['one', 'two three', 'four']
+
+    :param raw_args: The arguments to split up
+    :type raw_args: str
+
+    :raises ValueError: If the arguments can't be parsed - for example,
+        if there's a missing quote
+
+    :rtype: list
+    """
+
+    lex = shlex.shlex(raw_args, posix=True)
+    lex.whitespace_split = True
+    lex.quotes = '"'
+    lex.commenters = ""
+
+    return list(lex)
+
+
+def _parsing(name):
+    method = getattr(list, name)
+
+    def inner(self, *args):
+        if not self.parsed:
+            self.parse()
+        return method(self, *args)
+
+    inner.__name__ = name
+    inner.__doc__ = method.__doc__
+
+    return inner
+
+
+class LazyArgs(list):
+    """
+    A list of arguments, parsed with `parse_args` the first time the list is
+    used. This is what command handlers get as their **parsed_args**.
+
+    If the arguments can't be parsed, they're split on whitespace instead,
+    and **failed** is set.
+    """
+
+    __slots__ = ["raw", "parsed", "failed"]
+
+    def __init__(self, raw_args):
+        super(LazyArgs, self).__init__()
+
+        self.raw = raw_args
+        self.parsed = False
+        self.failed = False
+
+    def parse(self):
+        """
+        Parse the arguments now, if they haven't been already.
+        """
+
+        if self.parsed:
+            return
+
+        self.parsed = True
+
+        try:
+            list.extend(self, parse_args(self.raw))
+        except ValueError:
+            # Usually an unbalanced quote - do what we can
+            self.failed = True
+            list.extend(self, self.raw.split())
+
+    # Everything that looks at or changes the list parses it first
+
+    __len__ = _parsing("__len__")
+    __iter__ = _parsing("__iter__")
+    __reversed__ = _parsing("__reversed__")
+    __contains__ = _parsing("__contains__")
+    __getitem__ = _parsing("__getitem__")
+    __getslice__ = _parsing("__getslice__")
+    __setitem__ = _parsing("__setitem__")
+    __setslice__ = _parsing("__setslice__")
+    __delitem__ = _parsing("__delitem__")
+    __delslice__ = _parsing("__delslice__")
+
+    __eq__ = _parsing("__eq__")
+    __ne__ = _parsing("__ne__")
+    __lt__ = _parsing("__lt__")
+    __le__ = _parsing("__le__")
+    __gt__ = _parsing("__gt__")
+    __ge__ = _parsing("__ge__")
+
+    __add__ = _parsing("__add__")
+    __iadd__ = _parsing("__iadd__")
+    __mul__ = _parsing("__mul__")
+    __rmul__ = _parsing("__rmul__")
+    __imul__ = _parsing("__imul__")
+
+    __repr__ = _parsing("__repr__")
+    __str__ = _parsing("__repr__")
+
+    append = _parsing("append")
+    extend = _parsing("extend")
+    insert = _parsing("insert")
+    pop = _parsing("pop")
+    remove = _parsing("remove")
+    reverse = _parsing("reverse")
+    sort = _parsing("sort")
+    index = _parsing("index")
+    count = _parsing("count")
+
+    def __reduce__(self):
+        if not self.parsed:
+            self.parse()
+        return list, (list(self),)
@@ -1,18 +1,50 @@
 # coding=utf-8
 __author__ = "Gareth Coles"
 
-import shlex
+from collections import namedtuple
 
+from twisted.internet import reactor
+
+from system.commands.args import LazyArgs
 from system.decorators.log import deprecated
 from system.decorators.ratelimit import RateLimitExceededError
-from system.enums import CommandState
+from system.enums import CommandState, OverflowPolicy
 from system.events import general as events
 from system.events.manager import EventManager
 from system.logging.logger import getLogger
 from system.singleton import Singleton
 from system.translations import Translations
+from system.workers import WorkerPool
+from utils.clock import monotonic
+from utils.ratelimit import KeyedTokenBuckets
 _ = Translations().get()
 
+#: A compiled command prefix, for one protocol. See
+#: `CommandManager.prefixes`.
+Prefix = namedtuple("Prefix", ["control_char", "our_name", "prefix",
+                               "length", "first"])
+
+
+def _user_key(caller, source, protocol):
+    return protocol.name, caller.name
+
+
+def _channel_key(caller, source, protocol):
+    return protocol.name, source.name
+
+
+def _protocol_key(caller, source, protocol):
+    return protocol.name
+
+
+#: Functions for getting the key to rate-limit on, for each type of command
+#: rate limit. See `CommandManager.register_command`.
+RATE_LIMIT_KEYS = {
+    "user": _user_key,
+    "channel": _channel_key,
+    "protocol": _protocol_key
+}
+
 
 class CommandManager(object):
     """This is the command manager. It's in charge of tracking commands that
@@ -28,7 +60,11 @@ class CommandManager(object):
     #:         "command": {
     #:             "f": func(),
     #:             "permission": "plugin.command",
-    #:             "owner": object
+    #:             "owner": object,
+    #:             "default": bool,
+    #:             "rate_limits": [(key_function, KeyedTokenBuckets)],
+    #:             "blocking": bool,
+    #:             "timeout": float() or None  # For blocking commands
     #:         }
     #:     }
     commands = {}
@@ -65,10 +101,66 @@ class CommandManager(object):
     #: Storage for the factory manager, to avoid function call overhead.
     factory_manager = None
 
+    #: Compiled command prefixes, one per protocol. These are rebuilt
+    #: whenever a protocol's control characters or nickname change. ::
+    #:
+    #:     prefixes = {
+    #:         "protocol_name": Prefix(...)
+    #:     }
+    prefixes = {}
+
+    #: Worker pool for running blocking commands. This is created with
+    #: default settings when it's first needed, unless you've already set it
+    #: up with `setup_pool`.
+    #: :type: system.workers.WorkerPool
+    pool = None
+
+    #: How long a blocking command may take before it's considered to have
+    #: failed, in seconds, unless it specified its own timeout.
+    blocking_timeout = 30
+
+    #: Used to schedule blocking command timeouts; replace this in tests.
+    clock = reactor
+
+    #: Used by command rate limits; replace this in tests.
+    timer = staticmethod(monotonic)
+
     def __init__(self):
         self.logger = getLogger("Commands")
         self.event_manager = EventManager()
 
+    def setup_pool(self, size=5, queue_size=50,
+                   overflow=OverflowPolicy.Block):
+        """
+        (Re)create the worker pool used for blocking commands, stopping the
+        old one if there was one.
+
+        :param size: How many worker threads to run
+        :param queue_size: How many commands may be waiting at once
+        :param overflow: What to do when the queue is full - an
+            OverflowPolicy, or its name (eg "drop-oldest") from a config file
+
+        :type size: int
+        :type queue_size: int
+        :type overflow: OverflowPolicy, str
+        """
+
+        old_pool = self.pool
+        self.pool = WorkerPool("Commands", size, queue_size, overflow)
+
+        if old_pool is not None:
+            old_pool.stop()
+
+    def stop_pool(self):
+        """
+        Stop the worker pool used for blocking commands, if it's running.
+
+        Commands that are already queued will still be run.
+        """
+
+        if self.pool is not None:
+            self.pool.stop()
+
     def set_factory_manager(self, factory_manager):
         """Set the factory manager.
 
@@ -80,7 +172,8 @@ class CommandManager(object):
         self.factory_manager = factory_manager
 
     def register_command(self, command, handler, owner, permission=None,
-                         aliases=None, default=False):
+                         aliases=None, default=False, rate_limit=None,
+                         blocking=False, timeout=None):
         """Register a command, provided it hasn't been registered already.
 
         The params should go like this.
@@ -92,6 +185,21 @@ class CommandManager(object):
         :param aliases: A list of aliases for the command being registered.
         :param default: Whether the command should be run when there is no
             permissions manager installed.
+        :param rate_limit: How often the command may be run, as a dict
+            mapping "user", "channel" or "protocol" to a tuple of (uses,
+            seconds). For example, {"user": (3, 60), "channel": (10, 60)}
+            allows each user three uses a minute, and each channel ten.
+            Commands over the limit aren't run, and give you
+            CommandState.RateLimited instead.
+        :param blocking: Whether the handler blocks - for example, by doing
+            network or disk IO, or some heavy computation. Blocking commands
+            are run in a worker pool (see `setup_pool`), so they don't hold
+            up everything else; sending messages from them is fine, as the
+            protocols pass that back to the reactor thread for you.
+        :param timeout: How long a blocking command may take before it's
+            considered to have failed, in seconds. This defaults to
+            **blocking_timeout**. Note that the handler can't actually be
+            stopped, so it'll keep running in the background.
 
         :type command: str
         :type handler: function
@@ -99,6 +207,9 @@ class CommandManager(object):
         :type permission: str, None
         :type aliases: list, None
         :type default: bool
+        :type rate_limit: dict, None
+        :type blocking: bool
+        :type timeout: float, None
 
         :returns: Whether the command was registered or not
         :rtype: Boolean
@@ -107,22 +218,36 @@ class CommandManager(object):
         if aliases is None:
             aliases = []
 
+        rate_limits = []
+
+        if rate_limit:
+            for key, (uses, seconds) in rate_limit.iteritems():
+                if key not in RATE_LIMIT_KEYS:
+                    raise ValueError(_("Unknown rate limit type: %s") % key)
+
+                rate_limits.append((
+                    RATE_LIMIT_KEYS[key],
+                    KeyedTokenBuckets(uses, float(uses) / seconds,
+                                      clock=self.timer)
+                ))
+
         if command in self.commands:
             self.logger.warn(_("Object '%s' tried to register command '%s' but"
-                               " it's already been registered by object '%s'.")
-                             % (owner,
-                                command,
-                                self.commands[command]["owner"])
-                             )
+                               " it's already been registered by object "
+                               "'%s'."),
+                             owner, command, self.commands[command]["owner"])
             return False
 
-        self.logger.debug(_("Registering command: %s (%s)")
-                          % (command, owner))
+        self.logger.debug(_("Registering command: %s (%s)"),
+                          command, owner)
         commandobj = {
             "f": handler,
             "permission": permission,
             "owner": owner,
-            "default": default
+            "default": default,
+            "rate_limits": rate_limits,
+            "blocking": blocking,
+            "timeout": timeout
         }
 
         self.commands[command] = commandobj
@@ -130,12 +255,12 @@ class CommandManager(object):
         for alias in aliases:
             if alias in self.aliases:
                 self.logger.warn(_("Failed to register command alias '%s' as "
-                                   "it already belongs to another command.")
-                                 % alias)
+                                   "it already belongs to another command."),
+                                 alias)
                 continue
 
-            self.logger.debug(_("Registering alias: %s -> %s (%s)")
-                              % (alias, command, owner))
+            self.logger.debug(_("Registering alias: %s -> %s (%s)"),
+                              alias, command, owner)
             self.aliases[alias] = command
 
         return True
@@ -153,13 +278,13 @@ class CommandManager(object):
         for key, value in current:
             if owner is value["owner"]:
                 del self.commands[key]
-                self.logger.debug(_("Unregistered command: %s") % key)
+                self.logger.debug(_("Unregistered command: %s"), key)
 
                 aliases = self.aliases.items()
                 for k, v in aliases:
                     if v == key:
                         del self.aliases[k]
-                        self.logger.debug(_("Unregistered alias: %s") % k)
+                        self.logger.debug(_("Unregistered alias: %s"), k)
 
     def process_input(self, in_str, caller, source, protocol,
                       control_char=None, our_name=None):
@@ -192,7 +317,7 @@ class CommandManager(object):
                 control_char = protocol.control_chars
             else:
                 self.logger.debug("Protocol %s doesn't have a control "
-                                  "character sequence!" % protocol.name)
+                                  "character sequence!", protocol.name)
                 return CommandState.Error, NoControlCharacterException(
                     "Protocol %s doesn't have a control character sequence." %
                     protocol.name
@@ -202,45 +327,75 @@ class CommandManager(object):
             if hasattr(protocol, "nickname"):
                 our_name = protocol.nickname
 
-        if our_name is not None:
-            control_char = control_char.replace("{NAME}", our_name)
-            control_char = control_char.replace("{NICK}", our_name)
+        prefix = self.prefixes.get(protocol.name)
 
-        if len(in_str) < len(control_char):
-            self.logger.trace("Control character sequence is longer than the "
-                              "input string, so this cannot be a command.")
-            return CommandState.NotACommand, None
+        if prefix is None or prefix.control_char != control_char or \
+                prefix.our_name != our_name:
+            prefix = self.compile_prefix(control_char, our_name)
+            self.prefixes[protocol.name] = prefix
 
-        if in_str.lower().startswith(control_char.lower()):  # It's a command!
-            # Remove the command char(s) from the start
-            replaced = in_str[len(control_char):]
+        length = prefix.length
 
-            split = replaced.split(None, 1)
-            if not split:
-                return False
-            command = split[0]
-            args = ""
-            if len(split) > 1:
-                args = split[1]
+        if length:
+            if in_str[:1] not in prefix.first or \
+                    in_str[:length].lower() != prefix.prefix:
+                return CommandState.NotACommand, None
+
+        # It's a command! Remove the command char(s) from the start
+        replaced = in_str[length:]
+
+        split = replaced.split(None, 1)
+        if not split:
+            return False
+        command = split[0]
+        args = ""
+        if len(split) > 1:
+            args = split[1]
+
+        printable = "<%s:%s> %s" % (caller, source, in_str)
+
+        event = events.PreCommand(protocol, command, args, caller,
+                                  source, printable, in_str)
+        self.event_manager.run_callback("PreCommand", event)
+
+        if event.printable:
+            self.logger.info("%s | %s", protocol.name, event.printable)
+
+        result = self.run_command(event.command, event.source,
+                                  event.target, protocol, event.args)
+
+        return result
+
+    def compile_prefix(self, control_char, our_name=None):
+        """Compile a protocol's control characters into a Prefix, which
+        `process_input` uses to quickly check whether a message is a command.
+
+        You shouldn't need to call this yourself.
+
+        :param control_char: The control characters, which may contain
+            {NAME} or {NICK}
+        :param our_name: The name of the bot on the protocol
 
-            printable = "<%s:%s> %s" % (caller, source, in_str)
+        :type control_char: str
+        :type our_name: str, None
 
-            event = events.PreCommand(protocol, command, args, caller,
-                                      source, printable, in_str)
-            self.event_manager.run_callback("PreCommand", event)
+        :rtype: Prefix
+        """
 
-            if event.printable:
-                self.logger.info("%s | %s" % (protocol.name,
-                                              event.printable)
-                                 )
+        prefix = control_char
 
-            result = self.run_command(event.command, event.source,
-                                      event.target, protocol, event.args)
+        if our_name is not None:
+            prefix = prefix.replace("{NAME}", our_name)
+            prefix = prefix.replace("{NICK}", our_name)
 
-            return result
+        prefix = prefix.lower()
+
+        if prefix:
+            first = frozenset([prefix[0], prefix[0].upper()])
+        else:
+            first = frozenset()
 
-        self.logger.debug("Command not found.")
-        return CommandState.NotACommand, None
+        return Prefix(control_char, our_name, prefix, len(prefix), first)
 
     def run_command(self, command, caller, source, protocol, args):
         """Run a command, provided it's been registered.
@@ -258,8 +413,10 @@ class CommandManager(object):
         :type args: list
 
         :return: Tuple containing CommandState representing the state of
-            the command, and either None or an Exception.
-        :rtype: tuple(CommandState, None or Exception)
+            the command, and either None or an Exception - or, for blocking
+            commands, CommandState.Deferred and a Deferred that will fire
+            with another of these tuples once the command has finished.
+        :rtype: tuple(CommandState, None or Exception or Deferred)
         """
 
         if command not in self.commands:
@@ -274,53 +431,34 @@ class CommandManager(object):
 
                 return CommandState.Unknown, None
             command = self.aliases[command]
-        # Parse args
+        # Args are only parsed if the command handler actually uses them
         raw_args = args
+        parsed_args = LazyArgs(args)
+
+        cmd = self.commands[command]
+
         try:
-            lex = shlex.shlex(args, posix=True)
-            lex.whitespace_split = True
-            lex.quotes = '"'
-            lex.commenters = ""
-            parsed_args = list(lex)
-        except ValueError:
-            parsed_args = None
-        try:
-            if self.commands[command]["permission"]:
+            if cmd["permission"]:
                 if not self.perm_handler:
-                    if not self.commands[command]["default"]:
+                    if not cmd["default"]:
                         return CommandState.NoPermission, None
+                elif not self.perm_handler.check(cmd["permission"], caller,
+                                                 source, protocol):
+                    return CommandState.NoPermission, None
+
+            if cmd.get("rate_limits") and \
+                    not self._consume_rate_limits(cmd, caller, source,
+                                                  protocol):
+                self.logger.debug(_("Command rate-limited: %s"), command)
+                return CommandState.RateLimited, None
+
+            if cmd.get("blocking"):
+                return CommandState.Deferred, self._run_blocking(
+                    cmd, command, caller, source, protocol, raw_args,
+                    parsed_args
+                )
 
-                    try:
-                        self.commands[command]["f"](protocol, caller,
-                                                    source, command,
-                                                    raw_args,
-                                                    parsed_args)
-                    except RateLimitExceededError:
-                        # TODO: Proper decorator
-                        return CommandState.RateLimited, None
-                    except Exception as e:
-                        self.logger.exception("Error running command")
-                        return CommandState.Error, e
-                else:
-                    if self.perm_handler.check(self.commands
-                                               [command]["permission"],
-                                               caller, source, protocol):
-                        try:
-                            self.commands[command]["f"](protocol, caller,
-                                                        source, command,
-                                                        raw_args,
-                                                        parsed_args)
-                        except RateLimitExceededError:
-                            # TODO: Proper decorator
-                            return CommandState.RateLimited, None
-                        except Exception as e:
-                            self.logger.exception("Error running command")
-                            return CommandState.Error, e
-                    else:
-                        return CommandState.NoPermission, None
-            else:
-                self.commands[command]["f"](protocol, caller, source, command,
-                                            raw_args, parsed_args)
+            cmd["f"](protocol, caller, source, command, raw_args, parsed_args)
         except RateLimitExceededError:
             # TODO: Proper decorator
             return CommandState.RateLimited, None
@@ -330,6 +468,48 @@ class CommandManager(object):
         else:
             return CommandState.Success, None
 
+    def _run_blocking(self, cmd, command, caller, source, protocol, raw_args,
+                      parsed_args):
+        if self.pool is None:
+            self.setup_pool()
+
+        d = self.pool.submit(cmd["f"], protocol, caller, source, command,
+                             raw_args, parsed_args)
+        d.addTimeout(cmd.get("timeout") or self.blocking_timeout, self.clock)
+        d.addCallbacks(self._blocking_done, self._blocking_failed,
+                       errbackArgs=(command,))
+
+        return d
+
+    def _blocking_done(self, _result):
+        return CommandState.Success, None
+
+    def _blocking_failed(self, failure, command):
+        if failure.check(RateLimitExceededError):
+            return CommandState.RateLimited, None
+
+        self.logger.error(_("Error running blocking command '%s': %s"),
+                          command, failure.getErrorMessage())
+        self.logger.debug(failure.getTraceback())
+
+        return CommandState.Error, failure.value
+
+    def _consume_rate_limits(self, cmd, caller, source, protocol):
+        # Only take a token from each limit if they all have one to spare
+        keys = [
+            (buckets, key_func(caller, source, protocol))
+            for key_func, buckets in cmd["rate_limits"]
+        ]
+
+        for buckets, key in keys:
+            if not buckets.available(key):
+                return False
+
+        for buckets, key in keys:
+            buckets.consume(key)
+
+        return True
+
     @deprecated("Use set_auth_handler instead")
     def add_auth_handler(self, handler):
         return self.set_auth_handler(handler)
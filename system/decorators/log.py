@@ -123,7 +123,7 @@ def deprecated(hint_message=None, logger=None):
                 )
             except Exception as e:
                 # In case the traceback is derp and the index assumptions break
-                logger.trace("Exception: {}".format(e))
+                logger.trace("Exception: %s", e)
                 logger.warning(msg)
             return func(*args, **kwargs)
         return wrapper
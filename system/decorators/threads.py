@@ -6,6 +6,8 @@ Various threading-related decorators. These allow you to use the threadpool.
 from functools import wraps
 from threading import Thread
 
+from twisted.internet import reactor
+from twisted.python import threadable
 from twisted.python.threadpool import ThreadPool
 
 from system.decorators.log import deprecated
@@ -148,3 +150,35 @@ def run_async_threadpool_callback(cb):
         return async_func
 
     return inner
+
+
+def reactor_thread(func):
+    """
+    Function decorator to make sure the function is always run in the main
+    reactor thread.
+
+    When the decorated function is called from any other thread - for
+    example, from a blocking command handler running in a worker pool - the
+    call is scheduled with **reactor.callFromThread** and None is returned
+    straight away, instead of whatever the function would have returned.
+
+    Until the reactor is running, the function is always called directly.
+
+    This is used for the protocol methods that send things, so that
+    plugins can use them from any thread. For example::
+
+        @reactor_thread
+        def send_msg(self, target, message, target_type=None,
+                     use_event=True):
+            # This is never run outside of the reactor thread
+            pass
+    """
+
+    @wraps(func)
+    def reactor_func(*args, **kwargs):
+        if threadable.ioThread is None or threadable.isInIOThread():
+            return func(*args, **kwargs)
+
+        reactor.callFromThread(func, *args, **kwargs)
+
+    return reactor_func
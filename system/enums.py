@@ -35,6 +35,9 @@ class CommandState(Enum):
     * Success - The command was run without problems.
     * NoPermission - The command wasn't run due to a lack of permissions.
     * Error - There was an error while running the command.
+    * Deferred - The command is being run in a worker thread. Instead of an
+        Exception, you get a Deferred that fires with the final state of the
+        command, as another (CommandState, None or Exception) tuple.
 
     Remember, this is an enum - don't try to use the values directly or
     instantiate the class!
@@ -47,6 +50,7 @@ class CommandState(Enum):
     Success = 0
     NoPermission = 1
     Error = 2
+    Deferred = 3
 
 
 class PluginState(Enum):
@@ -66,3 +70,18 @@ class ProtocolState(Enum):
     Loaded = 1
     AlreadyLoaded = 2
     Unloaded = 3
+
+
+class OverflowPolicy(Enum):
+    """What a worker pool should do with new work when its queue is full.
+
+    * Block - Wait for space in the queue before queueing the work.
+    * DropOldest - Drop the oldest queued work to make room for the new work.
+    * RunInline - Run the new work right away, in the calling thread.
+    * Reject - Drop the new work.
+    """
+
+    Block = 0
+    DropOldest = 1
+    RunInline = 2
+    Reject = 3
@@ -19,11 +19,17 @@ class BaseEvent(object):
     For completeness, every event *must* be a subclass of this class. This is
     a necessary, but very simple and easy limitation. If you don't like it,
     well.. Are you really a programmer?
+
+    Events are created for every single message, so the events that come with
+    Ultros store their attributes in **__slots__** instead of a per-instance
+    dict. You don't have to do this in your own events, but if you do, only
+    list the attributes your class adds. Setting any attributes that aren't
+    in a slot still works, as every event has a **__dict__** to fall back on -
+    it just isn't created until it's needed.
     """
 
-    #: What threw the event (the protocol)
-    caller = None
-    cancelled = False
+    __slots__ = ["caller", "cancelled", "threaded", "__dict__",
+                 "__weakref__"]
 
     def __init__(self, caller):
         """
@@ -40,7 +46,9 @@ class BaseEvent(object):
             the other classes we use, such as the FactoryManager.
         """
 
-        self.caller = caller
+        self.caller = caller  # What threw the event (the protocol)
+        self.cancelled = False
+        self.threaded = False
 
     def __str__(self):
         return "<%s at %s>" % (self.__class__.__name__, hex(id(self)))
@@ -0,0 +1,193 @@
+# coding=utf-8
+
+"""
+Declarative event filters.
+
+Most event filters only care about where an event came from - which protocol,
+which channel, what kind of message. Instead of writing a function for that,
+you can describe it with an `EventFilter`, and the event manager will work out
+which handlers are interested in an event without calling into any of them. ::
+
+    self.events.add_callback(
+        "MessageReceived", self, self.message_handler, 0,
+        EventFilter(protocol_type="irc", target_type="channel",
+                    message_type="message")
+    )
+
+Every criterion is optional, and may be a single value or a list of values,
+any of which may match. A handler will only be run if all of the given
+criteria match.
+"""
+
+from system.protocols.generic.channel import Channel
+from system.protocols.generic.user import User
+
+__author__ = 'Gareth Coles'
+
+#: The target types that may be filtered on
+TARGET_TYPES = ("channel", "user")
+
+
+def _lower_set(value):
+    if value is None:
+        return None
+
+    if isinstance(value, basestring):
+        value = [value]
+
+    return frozenset(x.lower() for x in value)
+
+
+def event_signature(event):
+    """
+    Get the signature of an event, describing everything an `EventFilter`
+    can filter on. Signatures are tuples, for use as dict keys.
+
+    The target is taken from the event's **target** attribute, or its
+    **channel** attribute if there's no target.
+
+    :param event: The event to get the signature of
+    :type event: BaseEvent
+
+    :return: (event class, protocol name, protocol type, target type,
+        channel name, message type) - any of which may be None
+    :rtype: tuple
+    """
+
+    caller = event.caller
+    protocol_type = getattr(caller, "TYPE", None)
+
+    if protocol_type is None:
+        protocol = None
+    else:
+        protocol = caller.name.lower()
+        protocol_type = protocol_type.lower()
+
+    target = getattr(event, "target", None)
+
+    if target is None:
+        target = getattr(event, "channel", None)
+
+    if isinstance(target, Channel):
+        target_type = "channel"
+        channel = target.name.lower()
+    elif isinstance(target, User):
+        target_type = "user"
+        channel = None
+    else:
+        target_type = None
+        channel = None
+
+    message_type = getattr(event, "type", None)
+
+    if isinstance(message_type, basestring):
+        message_type = message_type.lower()
+    else:
+        message_type = None
+
+    return (event.__class__, protocol, protocol_type, target_type, channel,
+            message_type)
+
+
+class EventFilter(object):
+    """
+    A declarative event filter, for use with `EventManager.add_callback`.
+    """
+
+    def __init__(self, protocol=None, protocol_type=None, channel=None,
+                 target_type=None, message_type=None, event_type=None):
+        """
+        :param protocol: Names of the protocols to accept events from
+        :param protocol_type: Types of protocol to accept events from, eg
+            "irc" or "mumble"
+        :param channel: Names of the channels the event must target
+        :param target_type: "channel" or "user", for events that must target
+            a channel or a user
+        :param message_type: Message types to accept, for message events - eg
+            "message" or "notice"
+        :param event_type: Event classes to accept; subclasses of these
+            classes are accepted too
+
+        :type protocol: str, list, None
+        :type protocol_type: str, list, None
+        :type channel: str, list, None
+        :type target_type: str, list, None
+        :type message_type: str, list, None
+        :type event_type: type, tuple, None
+        """
+
+        self.protocol = _lower_set(protocol)
+        self.protocol_type = _lower_set(protocol_type)
+        self.channel = _lower_set(channel)
+        self.target_type = _lower_set(target_type)
+        self.message_type = _lower_set(message_type)
+
+        if isinstance(event_type, list):
+            event_type = tuple(event_type)
+
+        self.event_type = event_type
+
+        if self.target_type is not None:
+            for x in self.target_type:
+                if x not in TARGET_TYPES:
+                    raise ValueError("Unknown target type: %s" % x)
+
+    def __repr__(self):
+        criteria = []
+
+        for key in ["protocol", "protocol_type", "channel", "target_type",
+                    "message_type", "event_type"]:
+            value = getattr(self, key)
+
+            if value is not None:
+                if isinstance(value, frozenset):
+                    value = sorted(value)
+                criteria.append("%s=%r" % (key, value))
+
+        return "%s(%s)" % (self.__class__.__name__, ", ".join(criteria))
+
+    def matches(self, signature):
+        """
+        Check whether an event signature (see `event_signature`) matches
+        this filter.
+
+        :param signature: The signature to check
+        :type signature: tuple
+
+        :rtype: bool
+        """
+
+        (event_class, protocol, protocol_type, target_type, channel,
+         message_type) = signature
+
+        if self.event_type is not None and \
+                not issubclass(event_class, self.event_type):
+            return False
+
+        if self.protocol is not None and protocol not in self.protocol:
+            return False
+
+        if self.protocol_type is not None and \
+                protocol_type not in self.protocol_type:
+            return False
+
+        if self.target_type is not None and \
+                target_type not in self.target_type:
+            return False
+
+        if self.channel is not None and channel not in self.channel:
+            return False
+
+        if self.message_type is not None and \
+                message_type not in self.message_type:
+            return False
+
+        return True
+
+    def __call__(self, event):
+        """
+        Filters may also be called directly with an event, like a filter
+        function - this is slower than letting the event manager index them.
+        """
+
+        return self.matches(event_signature(event))
@@ -31,7 +31,7 @@ class PluginsLoadedEvent(GeneralEvent):
     This also includes a dictionary of all loaded plugins.
     """
 
-    loaded_plugins = {}
+    __slots__ = ["loaded_plugins"]
 
     def __init__(self, caller, plugins):
         """
@@ -57,7 +57,7 @@ class PluginLoadedEvent(GeneralEvent):
     This event is not cancellable.
     """
 
-    plugin = None
+    __slots__ = ["plugin"]
 
     def __init__(self, caller, plugin):
         self.plugin = plugin
@@ -102,7 +102,7 @@ class PreConnectEvent(GeneralEvent):
     protocol that threw the event.
     """
 
-    config = None
+    __slots__ = ["config"]
 
     def __init__(self, caller, config):
         """
@@ -121,7 +121,7 @@ class PostConnectEvent(GeneralEvent):
     Includes the configuration of the protocol that threw the event.
     """
 
-    config = None
+    __slots__ = ["config"]
 
     def __init__(self, caller, config):
         """
@@ -140,7 +140,7 @@ class PreSetupEvent(GeneralEvent):
     Includes the configuration of the protocol that threw the event.
     """
 
-    config = None
+    __slots__ = ["config"]
 
     def __init__(self, caller, config):
         """
@@ -159,7 +159,7 @@ class PostSetupEvent(GeneralEvent):
     Includes the configuration of the protocol that threw the event.
     """
 
-    config = None
+    __slots__ = ["config"]
 
     def __init__(self, caller, config):
         """Initialise the event object."""
@@ -190,11 +190,7 @@ class PreMessageReceived(GeneralEvent):
         like password inputs. Defaults to True.
     """
 
-    source = None
-    target = None
-    message = ""
-    type = ""
-    printable = True
+    __slots__ = ["source", "target", "message", "type", "printable"]
 
     def __init__(self, caller, source, target, message, typ, printable=True):
         """
@@ -227,10 +223,7 @@ class MessageReceived(GeneralEvent):
     been printed to the log. See the `PreMessageReceived` event for param info.
     """
 
-    source = None
-    target = None
-    message = ""
-    type = ""
+    __slots__ = ["source", "target", "message", "type"]
 
     def __init__(self, caller, source, target, message, typ):
         """
@@ -266,10 +259,7 @@ class MessageSent(GeneralEvent):
         or not
     """
 
-    type = ""
-    target = ""
-    message = ""
-    printable = True
+    __slots__ = ["type", "target", "message", "printable"]
 
     def __init__(self, caller, typ, target, message, printable=True):
         """
@@ -295,7 +285,7 @@ class NameChangedSelf(GeneralEvent):
     Thrown whenever our name is changed.
     """
 
-    name = ""
+    __slots__ = ["name"]
 
     def __init__(self, caller, name):
         """
@@ -312,8 +302,7 @@ class NameChanged(GeneralEvent):
     Thrown whenever someone else's name is changed.
     """
 
-    old_name = ""
-    user = None
+    __slots__ = ["old_name", "user"]
 
     def __init__(self, caller, user, old_name):
         """
@@ -331,7 +320,7 @@ class UserConnected(GeneralEvent):
     Thrown when a user connects. Not all protocols support this.
     """
 
-    user = None
+    __slots__ = ["user"]
 
     def __init__(self, caller, user):
         """
@@ -348,7 +337,7 @@ class UserDisconnected(GeneralEvent):
     Thrown when a user disconnects.
     """
 
-    user = None
+    __slots__ = ["user"]
 
     def __init__(self, caller, user):
         """
@@ -368,12 +357,7 @@ class PreCommand(GeneralEvent):
     and output modification, as well as perhaps a little duck-punching.
     """
 
-    command = ""
-    args = []
-    source = None
-    target = None
-    printable = ""
-    message = ""
+    __slots__ = ["command", "args", "source", "target", "printable", "message"]
 
     def __init__(self, caller, command, args, source, target, printable,
                  message):
@@ -405,11 +389,7 @@ class UnknownCommand(GeneralEvent):
     the developers, to decide upon.
     """
 
-    protocol = None
-    command = ""
-    args = ""
-    source = None
-    target = None
+    __slots__ = ["protocol", "command", "args", "source", "target"]
 
     def __init__(self, caller, protocol, command, args, source, target):
         """
@@ -446,9 +426,7 @@ class ActionSent(GeneralEvent):
         or not?
     """
 
-    target = ""
-    message = ""
-    printable = True
+    __slots__ = ["target", "message", "printable"]
 
     def __init__(self, caller, target, message, printable=True):
         """
@@ -476,10 +454,7 @@ class ActionReceived(GeneralEvent):
     See the `PreMessageReceived` event for param info.
     """
 
-    source = None
-    target = None
-    message = ""
-    printable = True
+    __slots__ = ["source", "target", "message", "printable"]
 
     def __init__(self, caller, source, target, message, printable=True):
         """
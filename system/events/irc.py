@@ -24,7 +24,7 @@ class MOTDReceivedEvent(IRCEvent):
     Thrown when the MOTD is received
     """
 
-    motd = ""
+    __slots__ = ["motd"]
 
     def __init__(self, caller, motd):
         """
@@ -40,7 +40,7 @@ class ChannelJoinedEvent(IRCEvent):
     Thrown when we join a channel
     """
 
-    channel = None
+    __slots__ = ["channel"]
 
     def __init__(self, caller, channel):
         """
@@ -56,7 +56,7 @@ class ChannelPartedEvent(IRCEvent):
     Thrown when we part a channel
     """
 
-    channel = None
+    __slots__ = ["channel"]
 
     def __init__(self, caller, channel):
         """
@@ -72,9 +72,7 @@ class KickedEvent(IRCEvent):
     Thrown when we get kicked from a channel
     """
 
-    channel = None
-    kicker = None
-    message = ""
+    __slots__ = ["channel", "kicker", "message"]
 
     def __init__(self, caller, channel, kicker, message):
         """
@@ -92,8 +90,7 @@ class UserJoinedEvent(IRCEvent):
     Thrown when someone joins a channel we're in
     """
 
-    channel = None
-    user = None
+    __slots__ = ["channel", "user"]
 
     def __init__(self, caller, channel, user):
         """
@@ -110,8 +107,7 @@ class UserPartedEvent(IRCEvent):
     Thrown when someone parts a channel we're in
     """
 
-    channel = None
-    user = None
+    __slots__ = ["channel", "user"]
 
     def __init__(self, caller, channel, user):
         """
@@ -128,10 +124,7 @@ class UserKickedEvent(IRCEvent):
     Thrown when someone is kicked from a channel we're in
     """
 
-    channel = None
-    user = None
-    kicker = None
-    reason = ""
+    __slots__ = ["channel", "user", "kicker", "reason"]
 
     def __init__(self, caller, channel, user, kicker, reason):
         """
@@ -150,10 +143,7 @@ class CTCPQueryEvent(IRCEvent):
     Thrown when we receive a CTCP query
     """
 
-    user = None
-    channel = None
-    action = ""
-    data = ""
+    __slots__ = ["user", "channel", "action", "data"]
 
     def __init__(self, caller, user, channel, action, data):
         """
@@ -173,8 +163,7 @@ class UserQuitEvent(IRCEvent):
     we clean up the user object
     """
 
-    user = None
-    message = ""
+    __slots__ = ["user", "message"]
 
     def __init__(self, caller, user, message):
         """
@@ -191,9 +180,7 @@ class TopicUpdatedEvent(IRCEvent):
     Thrown when the topic is updated - this includes on channel join!
     """
 
-    channel = None
-    user = None
-    topic = ""
+    __slots__ = ["channel", "user", "topic"]
 
     def __init__(self, caller, channel, user, topic):
         """Initialise the event object."""
@@ -210,9 +197,7 @@ class WHOReplyEvent(IRCEvent):
     just populating a user object, but the raw data is also available
     """
 
-    channel = None
-    user = None
-    data = {}
+    __slots__ = ["channel", "user", "data"]
 
     def __init__(self, caller, channel, user, data):
         """
@@ -230,7 +215,7 @@ class WHOReplyEndEvent(IRCEvent):
     Thrown when the server is done sending WHO replies for a channel
     """
 
-    channel = None
+    __slots__ = ["channel"]
 
     def __init__(self, caller, channel):
         """
@@ -253,10 +238,7 @@ class BanListEvent(IRCEvent):
     threaded.
     """
 
-    channel = None
-    mask = ""
-    owner = ""
-    when = ""
+    __slots__ = ["channel", "mask", "owner", "when"]
 
     def __init__(self, caller, channel, mask, owner, when):
         """
@@ -275,7 +257,7 @@ class BanListEndEvent(IRCEvent):
     Thrown when the server is done sending ban list replies for a channel
     """
 
-    channel = None
+    __slots__ = ["channel"]
 
     def __init__(self, caller, channel):
         """
@@ -291,9 +273,7 @@ class NAMESReplyEvent(IRCEvent):
     Thrown when the server sends us a NAMES reply chunk
     """
 
-    channel = None
-    status = ""  # Channel status - @ for secret, * for private
-    names = []
+    __slots__ = ["channel", "status", "names"]
 
     def __init__(self, caller, channel, status, names):
         """
@@ -311,8 +291,7 @@ class NAMESReplyEndEvent(IRCEvent):
     Thrown when the server is done sending NAMES replies for a channel
     """
 
-    channel = None
-    message = ""
+    __slots__ = ["channel", "message"]
 
     def __init__(self, caller, channel, message):
         """
@@ -332,7 +311,7 @@ class InviteOnlyChannelErrorEvent(IRCEvent):
     channels we weren't able to join.
     """
 
-    channel = ""
+    __slots__ = ["channel"]
 
     def __init__(self, caller, channel):
         """
@@ -348,8 +327,7 @@ class CannotDoCommandErrorEvent(IRCEvent):
     Thrown when the server is unable to process a command we sent
     """
 
-    command = ""
-    message = ""
+    __slots__ = ["command", "message"]
 
     def __init__(self, caller, command, message):
         """
@@ -366,9 +344,7 @@ class ChannelCreationDetailsEvent(IRCEvent):
     Thrown when we receive the creation details for a channel
     """
 
-    channel = None
-    user = None
-    when = ""
+    __slots__ = ["channel", "user", "when"]
 
     def __init__(self, caller, channel, user, when):
         """
@@ -387,7 +363,7 @@ class LOCALUSERSReplyEvent(IRCEvent):
     connect
     """
 
-    message = ""
+    __slots__ = ["message"]
 
     def __init__(self, caller, message):
         """
@@ -404,7 +380,7 @@ class GLOBALUSERSReplyEvent(IRCEvent):
     connect
     """
 
-    message = ""
+    __slots__ = ["message"]
 
     def __init__(self, caller, message):
         """
@@ -420,8 +396,7 @@ class VHOSTSetEvent(IRCEvent):
     Thrown when we've been assigned a VHOST
     """
 
-    vhost = ""
-    setter = None
+    __slots__ = ["vhost", "setter"]
 
     def __init__(self, caller, vhost, setter):
         """
@@ -439,9 +414,7 @@ class UnhandledMessageEvent(IRCEvent):
     protocol object yet
     """
 
-    prefix = ""
-    command = ""
-    params = []
+    __slots__ = ["prefix", "command", "params"]
 
     def __init__(self, caller, prefix, command, params):
         """
@@ -473,9 +446,7 @@ class InvitedEvent(IRCEvent):
     Thrown when we get invited to a channel
     """
 
-    user = None
-    channel = ""
-    auto_join = False
+    __slots__ = ["user", "channel", "auto_join"]
 
     def __init__(self, caller, user, channel, auto_join):
         """
@@ -493,11 +464,7 @@ class ModeChangedEvent(IRCEvent):
     Thrown when a mode is changed
     """
 
-    user = None
-    channel = None
-    action = False
-    modes = ""
-    args = ""
+    __slots__ = ["user", "channel", "action", "modes", "args"]
 
     def __init__(self, caller, user, channel, action, modes, args):
         """
@@ -517,8 +484,7 @@ class ISUPPORTReplyEvent(IRCEvent):
     Thrown when we get an ISUPPORT from the server
     """
 
-    prefix = ""
-    params = []
+    __slots__ = ["prefix", "params"]
 
     def __init__(self, caller, prefix, params):
         """
@@ -1,17 +1,30 @@
 # coding=utf-8
 __author__ = "Gareth Coles"
 
+from collections import namedtuple
 from operator import itemgetter
 
 from twisted.internet import reactor
+from twisted.internet.defer import DeferredList, DeferredSemaphore, fail, \
+    inlineCallbacks, maybeDeferred, returnValue, succeed
 
+from system.enums import OverflowPolicy
+from system.events.filters import EventFilter, event_signature
+from system.events.stats import HandlerStats
 from system.singleton import Singleton
-from system.decorators import run_async
 from system.logging.logger import getLogger
+from system.workers import PoolOverflowError, WorkerPool
+from utils.clock import monotonic
 
 from system.translations import Translations
 _ = Translations().get()
 
+#: Compiled, immutable form of a handler dict, used for dispatch. See
+#: `EventManager.chains`.
+Handler = namedtuple("Handler", ["name", "function", "priority", "cancelled",
+                                 "filter", "spec", "extra_args",
+                                 "extra_kwargs", "timeout", "stats"])
+
 
 class EventManager(object):
     """
@@ -56,22 +69,225 @@ class EventManager(object):
     #:                 "priority": int(),
     #:                 "function": func(),
     #:                 "cancelled:" bool(),
-    #:                 "filter": func() or None,  # For event filtering
+    #:                 "filter": func(), EventFilter or None,
     #:                 "extra_args": [],  # Extra args to pass
-    #:                 "extra_kwargs": {}  # Extra kwargs to pass
+    #:                 "extra_kwargs": {},  # Extra kwargs to pass
+    #:                 "timeout": float() or None  # For async callbacks
     #:             }
     #:         ]
     #:     }
     callbacks = {}
 
+    #: Compiled handler chains, one per callback name. Each chain is a
+    #: pre-sorted tuple of `Handler` records, built from **callbacks** by
+    #: `_compile` whenever handlers are added or removed, so that dispatch
+    #: doesn't have to look anything up or validate anything per event. ::
+    #:
+    #:     chains = {
+    #:         "callback_name": (Handler(...), Handler(...))
+    #:     }
+    chains = {}
+
+    #: For callbacks that have handlers with declarative filters
+    #: (EventFilter objects), this caches the handlers matching each event
+    #: signature, so that filtering an event is a single dict lookup. ::
+    #:
+    #:     indexes = {
+    #:         "callback_name": {
+    #:             signature: (Handler(...), Handler(...))
+    #:         }
+    #:     }
+    indexes = {}
+
+    #: How many event signatures to cache per callback in **indexes** before
+    #: starting over, to keep memory bounded
+    index_size = 1024
+
+    #: Worker pool for running handlers when callbacks are run threaded.
+    #: This is created with default settings when it's first needed, unless
+    #: you've already set it up with `setup_pool`.
+    #: :type: system.workers.WorkerPool
+    pool = None
+
+    #: How many async runs of a single callback may be in progress at once,
+    #: unless overridden with `set_concurrency_limit`.
+    async_concurrency = 10
+
+    #: How many async runs of a single callback may be waiting for one of
+    #: the above slots before new runs are refused.
+    async_backlog = 100
+
+    #: How long a handler may take in an async run before it's cancelled, in
+    #: seconds, unless it specified its own timeout.
+    async_timeout = 30
+
+    #: Per-callback overrides for **async_concurrency**
+    concurrency_limits = {}
+
+    #: A DeferredSemaphore for each callback that's been run asynchronously
+    semaphores = {}
+
+    #: Used to schedule async handler timeouts; replace this in tests.
+    clock = reactor
+
+    #: Call counts and timings for each handler, keyed on
+    #: (callback name, plugin name). See `get_stats`.
+    stats = {}
+
+    #: Time one in this many calls of each handler, for the stats. Every
+    #: call and error is counted regardless. Set this to 0 to turn timing off.
+    stats_sample_rate = 10
+
+    #: Timed handler calls that take at least this long, in seconds, are
+    #: logged as slow. Set this to None to turn that off.
+    slow_threshold = 0.5
+
+    #: Used to time handlers; replace this in tests.
+    timer = staticmethod(monotonic)
+
     def __init__(self):
         self.logger = getLogger("Events")
 
+    def setup_pool(self, size=10, queue_size=100,
+                   overflow=OverflowPolicy.Block):
+        """
+        (Re)create the worker pool used for threaded callbacks, stopping the
+        old one if there was one.
+
+        :param size: How many worker threads to run
+        :param queue_size: How many handler calls may be waiting at once
+        :param overflow: What to do when the queue is full - an
+            OverflowPolicy, or its name (eg "drop-oldest") from a config file
+
+        :type size: int
+        :type queue_size: int
+        :type overflow: OverflowPolicy, str
+        """
+
+        old_pool = self.pool
+        self.pool = WorkerPool("Events", size, queue_size, overflow)
+
+        if old_pool is not None:
+            old_pool.stop()
+
+    def stop_pool(self):
+        """
+        Stop the worker pool used for threaded callbacks, if it's running.
+
+        Handlers that are already queued will still be run.
+        """
+
+        if self.pool is not None:
+            self.pool.stop()
+
+    def _threaded_error(self, failure, callback, handler):
+        handler.stats.errors += 1
+        self.logger.error(_("Error running callback '%s': %s"),
+                          callback, failure.getErrorMessage())
+        self.logger.debug(failure.getTraceback())
+
     def _sort(self, lst):
         return sorted(lst, key=itemgetter("priority", "name"), reverse=True)
 
+    def _compile(self, callback):
+        """
+        Rebuild the handler chain for a callback from its handler dicts.
+
+        This should be called every time the handler list for a callback
+        changes. Handlers with a filter that isn't callable are left out of
+        the chain, as they'd never be run anyway.
+
+        :param callback: The name of the callback
+        :type callback: str
+        """
+
+        self.indexes.pop(callback, None)
+
+        if callback not in self.callbacks:
+            self.chains.pop(callback, None)
+            return
+
+        chain = []
+
+        for cb in self.callbacks[callback]:
+            fltr = cb["filter"]
+            spec = None
+
+            if isinstance(fltr, EventFilter):
+                spec, fltr = fltr, None
+                self.indexes[callback] = {}
+            elif fltr and not callable(fltr):
+                self.logger.warn(_("Not adding handler to the '%s' callback, "
+                                   "filter is not actually a callable. Bug "
+                                   "the developers of the %s plugin about "
+                                   "it!"), callback, cb["name"])
+                self.logger.warn(_("Value: %s"), fltr)
+                continue
+
+            chain.append(Handler(
+                cb["name"], cb["function"], cb["priority"], cb["cancelled"],
+                fltr or None, spec, tuple(cb["extra_args"]),
+                cb["extra_kwargs"], cb.get("timeout"),
+                self._get_handler_stats(callback, cb["name"])
+            ))
+
+        self.chains[callback] = tuple(chain)
+
+    def _get_handler_stats(self, callback, plugin):
+        key = (callback, plugin)
+        stats = self.stats.get(key)
+
+        if stats is None:
+            stats = HandlerStats(callback, plugin)
+            self.stats[key] = stats
+
+        return stats
+
+    def _record_time(self, handler, event, elapsed):
+        handler.stats.record(elapsed)
+
+        if self.slow_threshold is not None and \
+                elapsed >= self.slow_threshold:
+            self.logger.warn(_("Slow handler for the '%s' callback in plugin "
+                               "%s took %.3f seconds, handling: %s"),
+                             handler.stats.callback, handler.name, elapsed,
+                             event)
+
+    def _timed_call(self, handler, event):
+        # Used to time handlers in the worker pool; returns the time taken
+        start = self.timer()
+        handler.function(event, *handler.extra_args, **handler.extra_kwargs)
+        return self.timer() - start
+
+    def _threaded_timed(self, elapsed, handler, event):
+        self._record_time(handler, event, elapsed)
+
+    def _select(self, callback, chain, event):
+        """
+        Get the handlers in a chain whose declarative filters match an event.
+        Only call this for callbacks that are in **indexes**.
+        """
+
+        index = self.indexes[callback]
+        signature = event_signature(event)
+
+        try:
+            return index[signature]
+        except KeyError:
+            if len(index) >= self.index_size:
+                index.clear()
+
+            selected = tuple(
+                handler for handler in chain
+                if handler.spec is None or handler.spec.matches(signature)
+            )
+            index[signature] = selected
+
+            return selected
+
     def add_callback(self, callback, plugin, function, priority, fltr=None,
-                     cancelled=False, extra_args=None, extra_kwargs=None):
+                     cancelled=False, extra_args=None, extra_kwargs=None,
+                     timeout=None):
         """
         Add a callback. Call this from your plugin to handle events.
 
@@ -86,19 +302,26 @@ class EventManager(object):
                          callbacks the function should be called
         :param fltr: A function that takes one argument (an event) and returns
                      either True or False, which represents whether to handle
-                     the event or not. This is optional.
+                     the event or not. This is optional. If your filter only
+                     checks where the event came from, pass an EventFilter
+                     instead - it's much faster.
         :param cancelled: Whether to handle cancelled events or not
         :param extra_args: Extra arguments to pass to the handler.
         :param extra_kwargs: Extra keyword arguments to pass to the handler.
+        :param timeout: When the callback is run with `run_callback_async`,
+                        how many seconds a Deferred returned by the handler
+                        may take to fire before it's cancelled. Defaults to
+                        **async_timeout**.
 
         :type callback: str
         :type plugin: PluginObject
         :type function: function
         :type priority: int
-        :type fltr: function
+        :type fltr: function, EventFilter
         :type cancelled: bool
         :type extra_args: list
         :type extra_kwargs: dict
+        :type timeout: float, None
         """
         if extra_args is None:
             extra_args = []
@@ -119,13 +342,15 @@ class EventManager(object):
                 "cancelled": cancelled,
                 "filter": fltr,
                 "extra_args": extra_args,
-                "extra_kwargs": extra_kwargs}
+                "extra_kwargs": extra_kwargs,
+                "timeout": timeout}
 
-        self.logger.debug(_("Adding callback: %s") % data)
+        self.logger.debug(_("Adding callback: %s"), data)
 
         current.append(data)
 
         self.callbacks[callback] = self._sort(current)
+        self._compile(callback)
 
     def get_callback(self, callback, plugin):
         """
@@ -213,6 +438,8 @@ class EventManager(object):
             else:
                 del self.callbacks[callback]
 
+            self._compile(callback)
+
     def remove_callbacks(self, callback):
         """
         Remove a certain callback.
@@ -222,6 +449,7 @@ class EventManager(object):
         """
         if self.has_callback(callback):
             del self.callbacks[callback]
+            self._compile(callback)
 
     def remove_callbacks_for_plugin(self, plugin):
         """
@@ -241,19 +469,67 @@ class EventManager(object):
             for cb in value:
                 if cb["name"] != plugin:
                     done.append(cb)
-            if len(done) > 0:
+
+            if len(done) == len(value):
+                continue  # Nothing changed, no need to recompile
+            elif len(done) > 0:
                 self.callbacks[key] = self._sort(done)
             else:
                 del self.callbacks[key]
 
+            self._compile(key)
+
+        for key in self.stats.keys():
+            if key[1] == plugin:
+                del self.stats[key]
+
+    def get_stats(self, callback=None, plugin=None):
+        """
+        Get the call counts and timings for event handlers, sorted so that
+        the handlers that have taken up the most time in total come first.
+
+        Only some calls are timed (see **stats_sample_rate**), so the
+        timings are estimates. For async callbacks, the time taken is the
+        time until the handler's Deferred fired.
+
+        :param callback: Only get stats for this callback
+        :param plugin: Only get stats for handlers from this plugin
+
+        :type callback: str, None
+        :type plugin: str, None
+
+        :return: A list of HandlerStats objects
+        :rtype: list
+        """
+
+        result = []
+
+        for (cb, name), stats in self.stats.iteritems():
+            if callback is not None and cb != callback:
+                continue
+            if plugin is not None and name != plugin:
+                continue
+
+            result.append(stats)
+
+        return sorted(result, key=lambda x: x.estimated_total, reverse=True)
+
+    def reset_stats(self):
+        """
+        Reset the call counts and timings for all handlers.
+        """
+
+        for stats in self.stats.itervalues():
+            stats.reset()
+
     def run_callback(self, callback, event, threaded=False, from_thread=False):
         """
         Run all handlers for a certain callback with an event.
 
         :param callback: The callback to run
         :param event: An instance of the event to pass through the handlers
-        :param threaded: default False, Whether to run each callback in its own
-            thread
+        :param threaded: default False, Whether to run each handler in the
+            event worker pool (see `setup_pool`) instead of the current thread
         :param from_thread: default False, If the callback is being run from
             another thread, use this to specify that it should be run in the
             main reactor thread.
@@ -262,61 +538,193 @@ class EventManager(object):
         :type event: BaseEvent
         :type threaded: bool
         :type from_thread: bool
+
+        :return: The event, or if *threaded* is set, a Deferred that fires
+            with the event once all of the handlers have finished running
+        :rtype: BaseEvent, Deferred
         """
-        self.logger.trace(
-            "Running callbacks: {} -> {}".format(callback, event)
-        )
         if from_thread:
             # Mostly useful for DB async callbacks, which are not supposed
             # to do any work.
             return reactor.callFromThread(self.run_callback, callback,
                                           event, threaded)
-        if self.has_callback(callback):
-            event.threaded = threaded  # So devs can detect it easily.
 
-            self.logger.trace("Event: %s" % event)
+        chain = self.chains.get(callback)
+
+        if not chain:
+            return succeed(event) if threaded else event
+
+        event.threaded = threaded  # So devs can detect it easily.
+
+        if callback in self.indexes:
+            chain = self._select(callback, chain, event)
+
+        if threaded:
+            if self.pool is None:
+                self.setup_pool()
+
+            pool = self.pool
+            deferreds = []
+
+        rate = self.stats_sample_rate
+
+        for handler in chain:
+            try:
+                if handler.filter is not None and not handler.filter(event):
+                    continue
+
+                if event.cancelled and not handler.cancelled:
+                    continue
+
+                stats = handler.stats
+                stats.calls += 1
+                timed = rate and not stats.calls % rate
 
-            for cb in self.get_callbacks(callback):
                 if threaded:
-                    @run_async
-                    def go():
-                        """ Run the callback asynchronously """
-                        cb["function"](event, *cb["extra_args"],
-                                       **cb["extra_kwargs"])
-                else:
-                    def go():
-                        """ Run the callback synchronously """
-                        cb["function"](event, *cb["extra_args"],
-                                       **cb["extra_kwargs"])
-                try:
-                    self.logger.debug(_("Running callback: %s") % cb)
-                    if cb["filter"]:
-                        if callable(cb["filter"]):
-                            if not cb["filter"](event):
-                                self.logger.trace(_("Not running, filter "
-                                                    "function returned "
-                                                    "False."))
-                                continue
-                        else:
-                            self.logger.warn(_("Not running event, filter "
-                                               "is not actually a callable. "
-                                               "Bug the developers of the %s "
-                                               "plugin about it!") %
-                                             cb["name"])
-                            self.logger.warn(_("Value: %s") % cb["filter"])
-                            continue
-                    if event.cancelled:
-                        if cb["cancelled"]:
-                            go()
-                        else:
-                            self.logger.trace(_("Not running, event is "
-                                                "cancelled and handler "
-                                                "doesn't accept cancelled "
-                                                "events"))
+                    if timed:
+                        d = pool.submit(self._timed_call, handler, event)
+                        d.addCallback(self._threaded_timed, handler, event)
                     else:
-                        go()
-                except Exception as e:
-                    self.logger.exception(_(
-                        "Error running callback '%s': %s"
-                    ) % (callback, e))
+                        d = pool.submit(
+                            handler.function, event, *handler.extra_args,
+                            **handler.extra_kwargs
+                        )
+                    d.addErrback(self._threaded_error, callback, handler)
+                    deferreds.append(d)
+                elif timed:
+                    start = self.timer()
+                    handler.function(
+                        event, *handler.extra_args, **handler.extra_kwargs
+                    )
+                    self._record_time(handler, event, self.timer() - start)
+                else:
+                    handler.function(
+                        event, *handler.extra_args, **handler.extra_kwargs
+                    )
+            except Exception as e:
+                handler.stats.errors += 1
+                self.logger.exception(_(
+                    "Error running callback '%s': %s"
+                ), callback, e)
+
+        if threaded:
+            return DeferredList(deferreds).addCallback(lambda result: event)
         return event
+
+    def set_concurrency_limit(self, callback, limit):
+        """
+        Set how many async runs of a callback may be in progress at once.
+
+        This only affects runs started after the limit has been changed.
+
+        :param callback: The name of the callback
+        :param limit: The new limit, or None to go back to the default
+
+        :type callback: str
+        :type limit: int, None
+        """
+
+        if limit is None:
+            self.concurrency_limits.pop(callback, None)
+        else:
+            self.concurrency_limits[callback] = limit
+
+        self.semaphores.pop(callback, None)
+
+    def run_callback_async(self, callback, event):
+        """
+        Run all handlers for a certain callback with an event, waiting for
+        any Deferreds returned by the handlers before moving on to the next
+        one.
+
+        Handlers are still run in priority order, and the event's
+        **cancelled** flag is checked before each handler - so a handler may
+        cancel the event after some asynchronous work, and lower-priority
+        handlers will see that.
+
+        A handler that takes longer than its timeout (see `add_callback`)
+        will have its Deferred cancelled, and a handler that fails will be
+        logged; either way, the remaining handlers will still be run.
+
+        Only **async_concurrency** runs of each callback (or the limit set
+        with `set_concurrency_limit`) will be in progress at once, with up to
+        **async_backlog** more waiting for a slot. Any more than that will
+        fail immediately with a PoolOverflowError.
+
+        :param callback: The callback to run
+        :param event: An instance of the event to pass through the handlers
+
+        :type callback: str
+        :type event: BaseEvent
+
+        :return: A Deferred that fires with the event once all of the
+            handlers have finished
+        :rtype: Deferred
+        """
+
+        chain = self.chains.get(callback)
+
+        if not chain:
+            return succeed(event)
+
+        event.threaded = False
+
+        if callback in self.indexes:
+            chain = self._select(callback, chain, event)
+
+        semaphore = self.semaphores.get(callback)
+
+        if semaphore is None:
+            semaphore = DeferredSemaphore(
+                self.concurrency_limits.get(callback, self.async_concurrency)
+            )
+            self.semaphores[callback] = semaphore
+
+        if not semaphore.tokens and \
+                len(semaphore.waiting) >= self.async_backlog:
+            self.logger.warn(_("Too many async runs of the '%s' callback are "
+                               "waiting, dropping event: %s"),
+                             callback, event)
+            return fail(PoolOverflowError(
+                _("Async backlog full for callback: %s") % callback
+            ))
+
+        return semaphore.run(self._run_chain_async, callback, event, chain)
+
+    @inlineCallbacks
+    def _run_chain_async(self, callback, event, chain):
+        rate = self.stats_sample_rate
+
+        for handler in chain:
+            if event.cancelled and not handler.cancelled:
+                continue
+
+            try:
+                if handler.filter is not None and not handler.filter(event):
+                    continue
+
+                stats = handler.stats
+                stats.calls += 1
+                start = self.timer() if rate and not stats.calls % rate \
+                    else None
+
+                d = maybeDeferred(
+                    handler.function, event, *handler.extra_args,
+                    **handler.extra_kwargs
+                )
+
+                if not d.called:
+                    d.addTimeout(handler.timeout or self.async_timeout,
+                                 self.clock)
+
+                yield d
+
+                if start is not None:
+                    self._record_time(handler, event, self.timer() - start)
+            except Exception as e:
+                handler.stats.errors += 1
+                self.logger.exception(_(
+                    "Error running callback '%s' for plugin %s: %s"
+                ), callback, handler.name, e)
+
+        returnValue(event)
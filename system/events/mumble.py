@@ -24,8 +24,7 @@ class Reject(MumbleEvent):
     A reject - Sent when we aren't able to connect to a server
     """
 
-    type = ""
-    reason = ""
+    __slots__ = ["type", "reason"]
 
     def __init__(self, caller, typ, reason):
         """
@@ -44,10 +43,7 @@ class CodecVersion(MumbleEvent):
     """
     # TODO: Update this docstring when we know what this is for
 
-    alpha = ""
-    beta = ""
-    prefer_alpha = False
-    opus = ""
+    __slots__ = ["alpha", "beta", "prefer_alpha", "opus"]
 
     def __init__(self, caller, alpha, beta, prefer_alpha, opus):
         """
@@ -68,9 +64,7 @@ class CryptoSetup(MumbleEvent):
     """
     # TODO: Update this docstring when we know what this is for
 
-    key = ""
-    client_nonce = ""
-    server_nonce = ""
+    __slots__ = ["key", "client_nonce", "server_nonce"]
 
     def __init__(self, caller, key, client_n, server_n):
         """
@@ -90,9 +84,7 @@ class PermissionsQuery(MumbleEvent):
     """
     # TODO: Update this docstring when we know what this is for
 
-    channel = None
-    permissions = ""
-    flush = ""
+    __slots__ = ["channel", "permissions", "flush"]
 
     def __init__(self, caller, channel, permissions, flush):
         """
@@ -111,10 +103,7 @@ class ServerSync(MumbleEvent):
     Server sync message - Sent when we connect to the server
     """
 
-    session = ""
-    max_bandwidth = ""
-    permissions = ""
-    welcome_text = ""
+    __slots__ = ["session", "max_bandwidth", "welcome_text", "permissions"]
 
     def __init__(self, caller, session, max_bandwidth, welcome_text,
                  permissions):
@@ -136,11 +125,10 @@ class ServerConfig(MumbleEvent):
     """
     # TODO: Update this docstring when we know what this is for
 
-    max_bandwidth = ""
-    welcome_text = ""
-    allow_html = True
-    message_length = 0
-    image_message_length = 0
+    __slots__ = [
+        "max_bandwidth", "welcome_text", "allow_html", "message_length",
+        "image_message_length"
+    ]
 
     def __init__(self, caller, max_bandwidth, welcome_text, allow_html,
                  message_length, image_message_length):
@@ -162,17 +150,10 @@ class Ping(MumbleEvent):
     A ping, I guess
     """
 
-    timestamp = ""
-    good = 0
-    late = 0
-    lost = 0
-    resync = 0
-    tcp = 0
-    udp = 0
-    tcp_avg = 0
-    udp_avg = 0
-    tcp_var = 0
-    udp_var = 0
+    __slots__ = [
+        "timestamp", "good", "late", "lost", "resync", "tcp", "udp", "tcp_avg",
+        "udp_avg", "tcp_var", "udp_var"
+    ]
 
     def __init__(self, caller, timestamp, good, late, lost, resync, tcp, udp,
                  tcp_avg, udp_avg, tcp_var, udp_var):
@@ -217,12 +198,7 @@ class UserRemove(MumbleEvent):
     """
     # TODO: Update this docstring when we're more sure of it
 
-    session = ""  # Session ID
-    actor = ""  # Session ID
-    user = None  # User object
-    kicker = None  # User object
-    reason = ""  # Reason
-    ban = False  # True if banned, false if kicked
+    __slots__ = ["session", "actor", "user", "reason", "ban", "kicker"]
 
     def __init__(self, caller, session, actor, user, reason, ban, kicker):
         """
@@ -230,12 +206,12 @@ class UserRemove(MumbleEvent):
         """
 
         self.caller = caller
-        self.session = session
-        self.actor = actor
-        self.user = user
-        self.reason = reason
-        self.ban = ban
-        self.kicker = kicker
+        self.session = session  # Session ID
+        self.actor = actor  # Session ID
+        self.user = user  # User object
+        self.reason = reason  # Reason
+        self.ban = ban  # True if banned, false if kicked
+        self.kicker = kicker  # User object
 
         super(UserRemove, self).__init__(caller)
 
@@ -246,8 +222,7 @@ class Unknown(MumbleEvent):
     handled
     """
 
-    type = ""
-    message = None
+    __slots__ = ["type", "message"]
 
     def __init__(self, caller, typ, message):
         """
@@ -265,7 +240,7 @@ class UserJoined(MumbleEvent):
     User join - Sent when a user joins the server
     """
 
-    user = None
+    __slots__ = ["user"]
 
     def __init__(self, caller, user):
         """
@@ -284,9 +259,7 @@ class UserMoved(MumbleEvent):
     This is also fired when a user connects.
     """
 
-    user = None
-    channel = None
-    old_channel = None
+    __slots__ = ["user", "channel", "old_channel"]
 
     def __init__(self, caller, user, channel, old):
         """
@@ -307,9 +280,7 @@ class UserStateToggleEvent(MumbleEvent):
     Don't use this directly; inherit it!
     """
 
-    user = None
-    state = False
-    actor = None
+    __slots__ = ["user", "state", "actor"]
 
     def __init__(self, caller, user, state, actor=None):
         """
@@ -405,6 +376,8 @@ class UserStats(MumbleEvent):
     user: User whose stats have been updated
     """
 
+    __slots__ = ["user"]
+
     def __init__(self, caller, user):
         """
         Initialise the event object.
@@ -422,6 +395,8 @@ class UserRegisteredEvent(MumbleEvent):
     Don't use this directly; inherit it!
     """
 
+    __slots__ = ["user", "user_id", "actor"]
+
     def __init__(self, caller, user, user_id, actor):
         """
         Initialise the event object.
@@ -443,6 +418,8 @@ class UserRegistered(UserRegisteredEvent):
     actor: User who registered `user`
     """
 
+    __slots__ = []
+
 
 class UserUnregistered(UserRegisteredEvent):
     """
@@ -453,13 +430,15 @@ class UserUnregistered(UserRegisteredEvent):
     actor: User who unregistered `user`
     """
 
+    __slots__ = []
+
 
 class ChannelCreated(MumbleEvent):
     """
     New channel - Sent when a channel is created
     """
 
-    channel = None
+    __slots__ = ["channel"]
 
     def __init__(self, caller, channel):
         """
@@ -476,8 +455,7 @@ class ChannelLinked(MumbleEvent):
     Channel link added - Sent when two channels are linked together
     """
 
-    from_channel = None
-    to_channel = None
+    __slots__ = ["from_channel", "to_channel"]
 
     def __init__(self, caller, from_, to_):
         """
@@ -495,8 +473,7 @@ class ChannelUnlinked(MumbleEvent):
     Channel link removed - Sent when two channels have their link removed
     """
 
-    from_channel = None
-    to_channel = None
+    __slots__ = ["from_channel", "to_channel"]
 
     def __init__(self, caller, from_, to_):
         """
@@ -0,0 +1,110 @@
+# coding=utf-8
+
+"""
+Per-handler statistics for the event manager.
+
+The event manager keeps a `HandlerStats` object for every handler it knows
+about, keyed on (callback name, plugin name). Every call and error is
+counted, but only some calls are timed (see
+`EventManager.stats_sample_rate`), so the timing figures are estimates -
+good enough to find out which plugin is hogging the reactor, and cheap
+enough to leave on all the time.
+"""
+
+from bisect import bisect_left
+
+__author__ = 'Gareth Coles'
+
+#: Upper bounds of the latency histogram buckets, in seconds. There's one
+#: more bucket than this, for anything slower than the last bound.
+BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+class HandlerStats(object):
+    """
+    Call counts and timings for a single event handler.
+    """
+
+    __slots__ = ["callback", "plugin", "calls", "errors", "timed", "total",
+                 "max", "histogram"]
+
+    def __init__(self, callback, plugin):
+        self.callback = callback
+        self.plugin = plugin
+
+        self.calls = 0  # How many times the handler has been called
+        self.errors = 0  # How many of those calls raised an exception
+        self.timed = 0  # How many of those calls were timed
+        self.total = 0.0  # Total time taken by the timed calls
+        self.max = 0.0  # Longest time taken by a timed call
+
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def __repr__(self):
+        return "<%s %s/%s: %s calls, %s errors, %.2fms mean>" % (
+            self.__class__.__name__, self.callback, self.plugin, self.calls,
+            self.errors, self.mean * 1000
+        )
+
+    @property
+    def mean(self):
+        """
+        Mean time taken per call, in seconds.
+        """
+
+        if not self.timed:
+            return 0.0
+        return self.total / self.timed
+
+    @property
+    def estimated_total(self):
+        """
+        Estimated total time taken by all calls, in seconds.
+        """
+
+        return self.mean * self.calls
+
+    def record(self, elapsed):
+        """
+        Record the time taken by a call.
+
+        :param elapsed: The time taken, in seconds
+        :type elapsed: float
+        """
+
+        self.timed += 1
+        self.total += elapsed
+
+        if elapsed > self.max:
+            self.max = elapsed
+
+        self.histogram[bisect_left(BUCKETS, elapsed)] += 1
+
+    def reset(self):
+        """
+        Forget everything that's been recorded so far.
+        """
+
+        self.calls = self.errors = self.timed = 0
+        self.total = self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def as_dict(self):
+        """
+        Get the stats as a dict, for serialization.
+
+        :rtype: dict
+        """
+
+        return {
+            "callback": self.callback,
+            "plugin": self.plugin,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timed": self.timed,
+            "total": self.total,
+            "estimated_total": self.estimated_total,
+            "mean": self.mean,
+            "max": self.max,
+            "histogram": zip(BUCKETS + (None,), self.histogram)
+        }
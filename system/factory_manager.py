@@ -14,6 +14,7 @@ from system.logging.logger import getLogger
 from system.metrics import Metrics
 from system.plugins.manager import PluginManager
 from system.singleton import Singleton
+from system.storage.clients import ClientRegistry
 from system.storage.config import Config
 from system.storage.formats import YAML
 from system.storage.manager import StorageManager
@@ -118,6 +119,69 @@ class FactoryManager(object):
 
         self.load_config()  # Load the configuration
 
+        try:
+            pool_config = self.main_config.get("event-threads", {})
+
+            self.event_manager.setup_pool(
+                pool_config.get("size", 10),
+                pool_config.get("queue-size", 100),
+                pool_config.get("overflow", "block")
+            )
+        except Exception:
+            self.logger.exception(_("Error setting up the event thread pool, "
+                                    "using the defaults."))
+
+        try:
+            pool_config = self.main_config.get("command-threads", {})
+
+            self.commands.setup_pool(
+                pool_config.get("size", 5),
+                pool_config.get("queue-size", 50),
+                pool_config.get("overflow", "block")
+            )
+            self.commands.blocking_timeout = pool_config.get("timeout", 30)
+        except Exception:
+            self.logger.exception(_("Error setting up the command thread "
+                                    "pool, using the defaults."))
+
+        try:
+            writes_config = self.main_config.get("data-writes", {})
+
+            self.storage.setup_pool(
+                writes_config.get("delay", 0.5),
+                writes_config.get("queue-size", 100)
+            )
+        except Exception:
+            self.logger.exception(_("Error setting up background data "
+                                    "writes, writing files right away."))
+
+        clients_config = self.main_config.get("storage-clients", {})
+        registry = ClientRegistry()
+
+        for kind in registry.pool_sizes.keys():
+            registry.pool_sizes[kind] = clients_config.get(
+                "%s-pool-size" % kind, registry.pool_sizes[kind]
+            )
+
+        try:
+            registry.setup_pool(
+                clients_config.get("threads", 5),
+                clients_config.get("queue-size", 100),
+                clients_config.get("overflow", "reject")
+            )
+        except Exception:
+            self.logger.exception(_("Error setting up the storage client "
+                                    "thread pool, using the defaults."))
+
+        stats_config = self.main_config.get("event-stats", {})
+
+        self.event_manager.stats_sample_rate = stats_config.get(
+            "sample-rate", 10
+        )
+        self.event_manager.slow_threshold = stats_config.get(
+            "slow-threshold", 0.5
+        )
+
         try:
             self.metrics = Metrics(self.main_config, self)
         except Exception:
@@ -195,8 +259,8 @@ class FactoryManager(object):
 
         self.logger.info(_("Loading plugins.."))
 
-        self.logger.trace(_("Configured plugins: %s")
-                          % ", ".join(self.main_config["plugins"]))
+        self.logger.trace(_("Configured plugins: %s"),
+                          ", ".join(self.main_config["plugins"]))
 
         self.plugman.load_plugins(self.main_config.get("plugins", []))
 
@@ -247,14 +311,14 @@ class FactoryManager(object):
 
         for protocol in self.main_config["protocols"]:
             if protocol.lower().startswith("plugin-"):
-                self.logger.error("Invalid protocol name: %s" % protocol)
+                self.logger.error("Invalid protocol name: %s", protocol)
                 self.logger.error(
                     "Protocol names beginning with \"plugin-\" are reserved "
                     "for plugin use."
                 )
                 continue
 
-            self.logger.info(_("Setting up protocol: %s") % protocol)
+            self.logger.info(_("Setting up protocol: %s"), protocol)
             conf_location = "protocols/%s.yml" % protocol
             result = self.load_protocol(protocol, conf_location)
 
@@ -311,8 +375,8 @@ class FactoryManager(object):
                     return ProtocolState.ConfigNotExists
             except Exception:
                 self.logger.exception(
-                    _("Unable to load configuration for the '%s' protocol.")
-                    % name)
+                    _("Unable to load configuration for the '%s' protocol."),
+                    name)
                 return ProtocolState.LoadError
         try:
             protocol_type = config["main"]["protocol-type"]
@@ -345,8 +409,8 @@ class FactoryManager(object):
             if name in self.factories:
                 del self.factories[name]
             self.logger.exception(
-                _("Unable to create factory for the '%s' protocol!")
-                % name)
+                _("Unable to create factory for the '%s' protocol!"),
+                name)
             return ProtocolState.SetupError
 
     # Reload stuff
@@ -400,8 +464,8 @@ class FactoryManager(object):
             try:
                 proto.shutdown()
             except Exception:
-                self.logger.exception(_("Error shutting down protocol %s")
-                                      % name)
+                self.logger.exception(_("Error shutting down protocol %s"),
+                                      name)
             finally:
                 try:
                     self.storage.release_file(self, "config",
@@ -410,7 +474,7 @@ class FactoryManager(object):
                     self.storage.release_files(proto.protocol)
                 except Exception:
                     self.logger.exception("Error releasing files for protocol "
-                                          "%s" % name)
+                                          "%s", name)
             del self.factories[name]
             return True
         return False
@@ -422,17 +486,28 @@ class FactoryManager(object):
 
         # Shut down!
         for name in self.factories.keys():
-            self.logger.info(_("Unloading protocol: %s") % name)
+            self.logger.info(_("Unloading protocol: %s"), name)
             self.unload_protocol(name)
 
         self.plugman.unload_plugins()
 
+        self.event_manager.stop_pool()
+        self.commands.stop_pool()
+        self.storage.stop_pool()
+        ClientRegistry().stop_pool()
+
+        if self.metrics is not None:
+            self.metrics.stop_reporter(5)
+
         if reactor.running:
             try:
                 reactor.stop()
             except Exception:
                 self.logger.exception("Error stopping reactor")
 
+        # Write anything that's still queued
+        logger.shutdown()
+
     # Grab stuff
 
     def get_protocol(self, name):
@@ -0,0 +1,365 @@
+# coding=utf-8
+
+"""
+Queued dispatch of log records, so that logging never waits on handlers.
+
+Normally, handlers are called right there in the thread that's logging -
+usually the reactor - which means that it waits on every file write, console
+write and network round trip that the handlers make. When queued dispatch is
+enabled, loggers are given a single `QueuedDispatcher` instead, which puts
+records in a bounded queue and passes them on to the real handlers in a
+background thread.
+
+When the queue is full, TRACE and DEBUG records are dropped first - new ones
+are dropped, and otherwise the oldest one in the queue makes room. If there
+aren't any of those, the overflow policy is used:
+
+* **Block**: Wait for room in the queue, so nothing important is lost
+* **DropOldest**: Drop the oldest record in the queue
+* **RunInline**: Pass the record to the handlers right away, in the
+  logging thread
+* **Reject**: Drop the new record
+
+Records still in the queue are always written when the dispatcher is
+stopped - see `system.logging.logger.shutdown`.
+"""
+
+import sys
+import threading
+import time
+
+from collections import deque
+
+from logbook import Handler, LogRecord, NOTSET
+
+import system.logging.shim as shim
+
+from system.enums import OverflowPolicy
+
+__author__ = 'Gareth Coles'
+
+#: Records at or below this level are dropped first when the queue is full
+LOW_PRIORITY_LEVEL = shim.our_DEBUG
+
+#: Record information that relies on the logging frame, and so has to be
+#: pulled in before the record is queued
+FRAME_INFORMATION = [
+    "filename", "func_name", "greenlet", "lineno", "module", "process_name",
+    "thread", "thread_name"
+]
+
+#: Queued by `QueuedDispatcher.stop` to tell the writer thread to exit
+_STOP = object()
+
+
+class QueuedDispatcher(Handler):
+    """
+    Handler that queues records, and passes them on to a list of handlers in
+    a background writer thread.
+    """
+
+    def __init__(self, handlers=(), size=10000,
+                 overflow=OverflowPolicy.Block):
+        """
+        :param handlers: The handlers to pass records on to, in order
+        :param size: How many records may be queued before they're dropped
+            or the overflow policy is used
+        :param overflow: What to do when the queue is full of records that
+            aren't TRACE or DEBUG
+
+        :type handlers: list, tuple
+        :type size: int
+        :type overflow: OverflowPolicy
+        """
+
+        Handler.__init__(self, level=NOTSET, bubble=False)
+
+        self.size = size
+        self.overflow = overflow
+        self.dropped = 0
+        self.stopped = False
+
+        self.handlers = ()
+        self.set_handlers(handlers)
+
+        # Of (item, is it TRACE/DEBUG, handlers to pass it to) tuples
+        self._queue = deque()
+        self._low = 0  # How many TRACE/DEBUG records are queued
+        self._unfinished = 0  # How many queued items haven't been handled
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __repr__(self):
+        return "<%s: %s handlers, %s/%s queued, %s dropped>" % (
+            self.__class__.__name__, len(self.handlers), self.pending,
+            self.size, self.dropped
+        )
+
+    @property
+    def pending(self):
+        """
+        How many records are waiting in the queue.
+        """
+
+        return len(self._queue)
+
+    def set_handlers(self, handlers):
+        """
+        Replace the handlers that records are passed on to. Records that are
+        already queued still go to the handlers that were there when they
+        were logged.
+
+        :param handlers: The new handlers, in order
+        :type handlers: list, tuple
+        """
+
+        handlers = tuple(handlers)
+        levels = []
+
+        # Records nothing wants before the first black hole aren't queued
+        for handler in handlers:
+            if handler.blackhole:
+                break
+            levels.append(handler.level)
+
+        self.level = min(levels) if levels else sys.maxint
+        self.handlers = handlers
+
+    def call_later(self, func, *args, **kwargs):
+        """
+        Queue a function to be called in the writer thread, once every record
+        queued before it has been handled. Functions are never dropped.
+
+        This is mostly for closing handlers once nothing's using them.
+        """
+
+        if self._in_writer():
+            return func(*args, **kwargs)
+
+        with self._condition:
+            if not self.stopped:
+                self._start()
+                self._append(lambda: func(*args, **kwargs), False)
+                return
+
+        func(*args, **kwargs)
+
+    def emit(self, record):
+        # The logging frame will be gone by the time the writer gets to it
+        for key in FRAME_INFORMATION:
+            getattr(record, key)
+
+        # The logger closes records once they're handled, which would throw
+        # away the exception info - so we keep it open, drop the frames, and
+        # close it ourselves once it's been written
+        record.frame = record.calling_frame = None
+        record.keep_open = True
+
+        if self._in_writer():
+            # Logging from a handler - queueing this would deadlock when full
+            return self._write_record(record, self.handlers)
+
+        low = record.level <= LOW_PRIORITY_LEVEL
+        inline = False
+
+        with self._condition:
+            if self.stopped:
+                inline = True
+            else:
+                self._start()
+
+                if len(self._queue) >= self.size:
+                    if low or self.overflow is OverflowPolicy.Reject:
+                        self.dropped += 1
+                        return
+
+                    if self._low:
+                        self._drop_low()
+                    elif self.overflow is OverflowPolicy.DropOldest:
+                        self._drop_oldest()
+                    elif self.overflow is OverflowPolicy.RunInline:
+                        inline = True
+                    else:  # OverflowPolicy.Block
+                        while len(self._queue) >= self.size \
+                                and not self.stopped:
+                            self._condition.wait()
+
+                        inline = self.stopped
+
+            if not inline:
+                self._append(record, low, self.handlers)
+
+        if inline:
+            self._write_record(record, self.handlers)
+
+    def dispatch(self, record, handlers=None):
+        """
+        Pass a record on to the handlers, in the same way that a logger
+        would.
+
+        :param record: The record to handle
+        :param handlers: The handlers to use, instead of the current ones
+
+        :type record: logbook.LogRecord
+        :type handlers: tuple, None
+        """
+
+        if handlers is None:
+            handlers = self.handlers
+
+        for handler in handlers:
+            if not handler.should_handle(record):
+                continue
+
+            if handler.filter is not None \
+                    and not handler.filter(record, handler):
+                continue
+
+            if handler.blackhole:
+                break
+
+            if handler.handle(record) and not handler.bubble:
+                break
+
+    def flush(self, timeout=None):
+        """
+        Wait for everything that's currently queued to be handled.
+
+        :param timeout: How long to wait for, or None to wait for as long as
+            it takes
+        :type timeout: float, None
+
+        :return: Whether everything was handled in time
+        :rtype: bool
+        """
+
+        if self._in_writer():
+            return False
+
+        with self._condition:
+            if timeout is not None:
+                deadline = time.time() + timeout
+
+            while self._unfinished:
+                if timeout is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.time()
+
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+
+            return True
+
+    def stop(self, timeout=None):
+        """
+        Stop the writer thread, once it's handled everything in the queue.
+        Records logged after this are passed to the handlers right away.
+
+        :param timeout: How long to wait for the queue to drain, or None to
+            wait for as long as it takes
+        :type timeout: float, None
+        """
+
+        with self._condition:
+            if self.stopped:
+                return
+
+            self.stopped = True
+            thread = self._thread
+
+            if thread is not None:
+                self._append(_STOP, False)
+
+            self._condition.notify_all()  # Wake up anything blocked
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def close(self):
+        self.stop()
+
+    def _in_writer(self):
+        return self._thread is threading.current_thread()
+
+    def _start(self):
+        # Must be called with the condition held
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._write,
+                                        name="Logging-Writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _append(self, item, low, handlers=None):
+        # Must be called with the condition held
+        self._queue.append((item, low, handlers))
+        self._unfinished += 1
+
+        if low:
+            self._low += 1
+
+        self._condition.notify_all()
+
+    def _drop_low(self):
+        # Must be called with the condition held
+        for entry in self._queue:
+            if entry[1]:
+                return self._discard(entry)
+
+    def _drop_oldest(self):
+        # Must be called with the condition held
+        for entry in self._queue:
+            if isinstance(entry[0], LogRecord):
+                return self._discard(entry)
+
+    def _discard(self, entry):
+        # Must be called with the condition held
+        self._queue.remove(entry)
+
+        self.dropped += 1
+        self._unfinished -= 1
+
+        if entry[1]:
+            self._low -= 1
+
+    def _write_record(self, record, handlers):
+        record.keep_open = False
+
+        try:
+            self.dispatch(record, handlers)
+        finally:
+            if not record.keep_open:  # Unless a handler wants it open
+                record.close()
+
+    def _write(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+
+                item, low, handlers = self._queue.popleft()
+
+                if low:
+                    self._low -= 1
+
+                self._condition.notify_all()  # There's room now
+
+            try:
+                if item is _STOP:
+                    return
+                elif isinstance(item, LogRecord):
+                    self._write_record(item, handlers)
+                else:
+                    item()
+            except Exception as e:
+                # We can't exactly log this
+                print("Error in logging writer thread: {}".format(e))
+            finally:
+                with self._condition:
+                    self._unfinished -= 1
+                    self._condition.notify_all()
+
+                del item, handlers
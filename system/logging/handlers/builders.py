@@ -24,6 +24,7 @@ from logbook.notifiers import create_notification_handler as \
     notification_handler
 
 from system.logging.handlers.exceptions import MetricsHandler
+from system.logging.handlers.structured import NDJSONHandler, parse_size
 
 
 def create_syshandler(*_, **__):
@@ -157,3 +158,16 @@ def create_mail_handler(from_addr=None, recipients=None,
         credentials, secure, record_limit, record_delta, level, format_string,
         related_format_string, filter, bubble
     )
+
+
+def create_ndjson_handler(filename="logs/output.ndjson", max_size="100 MB",
+                          interval="1 day", budget="1 GB", compress=True,
+                          level=0, format_string=None, filter=None,
+                          bubble=True):
+    if isinstance(interval, basestring):
+        interval = timeparse(interval)
+
+    return NDJSONHandler(
+        filename, parse_size(max_size), interval, parse_size(budget),
+        compress, level, filter, bubble
+    )
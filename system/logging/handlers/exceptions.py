@@ -7,6 +7,7 @@ enabled.
 
 __author__ = 'Gareth Coles'
 
+from logbook.base import ERROR
 from logbook.handlers import Handler
 
 
@@ -28,11 +29,13 @@ class MetricsHandler(Handler):
     """
 
     def __init__(self):
-        super(MetricsHandler, self).__init__(bubble=True)
+        # Only errors are sent, so don't let anything else through
+        super(MetricsHandler, self).__init__(level=ERROR, bubble=True)
 
     def emit(self, record):
         """
-        Send an exception from an error-level record to the metrics system.
+        Queue an exception from an error-level record to be sent to the
+        metrics system. This doesn't wait for it to be sent.
 
         :type record: logbook.LogRecord
         :param record:
@@ -0,0 +1,340 @@
+# coding=utf-8
+
+"""
+Handler for structured logs - one JSON object per line, so that logs can be
+searched with tools like jq instead of regexes.
+
+Each record is written as an object with "time", "channel", "level",
+"message" and "protocol" keys, plus "exception" when there is one. The
+protocol is only set for records logged by protocols.
+
+The log file is rotated once it grows past a certain size, and once per time
+interval - aligned to UTC, so a one-day interval rotates at midnight.
+Rotated files are gzipped in a background thread, and the oldest ones are
+deleted to keep the total size of the logs within a budget.
+"""
+
+import gzip
+import json
+import os
+import Queue
+import re
+import shutil
+import threading
+import time
+
+from logbook import Handler, NOTSET
+
+__author__ = 'Gareth Coles'
+
+#: Multipliers for size suffixes, as used in configuration files
+SIZE_UNITS = {
+    "": 1,
+    "b": 1,
+    "k": 1024,
+    "kb": 1024,
+    "m": 1024 ** 2,
+    "mb": 1024 ** 2,
+    "g": 1024 ** 3,
+    "gb": 1024 ** 3
+}
+
+#: Queued to tell the compressor thread to tidy up the rotated files
+_MAINTAIN = object()
+
+#: Queued to tell the compressor thread to exit
+_STOP = object()
+
+
+def parse_size(size):
+    """
+    Get a number of bytes from a size - for example, "100 MB".
+
+    :param size: The size, as a string or number of bytes
+    :type size: str, int, None
+
+    :return: The number of bytes, or None if size is None
+    :rtype: int, None
+    """
+
+    if size is None or isinstance(size, (int, long)):
+        return size
+
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$", size)
+
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise ValueError("Unknown size: %s" % size)
+
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+class NDJSONHandler(Handler):
+    """
+    Writes records to a file as newline-delimited JSON, rotating and
+    compressing it as it goes.
+    """
+
+    #: Function returning the current time, for tests
+    clock = time.time
+
+    def __init__(self, filename, max_size=None, interval=None, budget=None,
+                 compress=True, level=NOTSET, filter=None, bubble=False):
+        """
+        :param filename: The file to write to
+        :param max_size: How big the file may get before it's rotated, in
+            bytes - or None for no limit
+        :param interval: How often to rotate the file, in seconds - or None
+            to only rotate by size
+        :param budget: How many bytes the file and its rotated copies may
+            take up altogether, or None for no limit - room is left for the
+            current file to reach max_size
+        :param compress: Whether to gzip rotated files
+
+        :type filename: str
+        :type max_size: int, None
+        :type interval: int, None
+        :type budget: int, None
+        :type compress: bool
+        """
+
+        Handler.__init__(self, level, filter, bubble)
+
+        self.filename = filename
+        self.max_size = max_size
+        self.interval = interval
+        self.budget = budget
+        self.compress = compress
+
+        directory, name = os.path.split(filename)
+        root, ext = os.path.splitext(name)
+
+        self.directory = directory or "."
+        self.rotated_pattern = re.compile(
+            r"^%s\.(\d{8}-\d{6})(?:-(\d+))?%s(\.gz)?$" % (
+                re.escape(root), re.escape(ext)
+            )
+        )
+
+        self._root, self._ext = os.path.join(directory, root), ext
+
+        self._stream = None
+        self._size = 0
+        self._rollover_at = None
+        self._lock = threading.Lock()
+
+        self._queue = Queue.Queue()
+        self._thread = None
+
+        if os.path.isdir(self.directory):
+            # Compress anything left over from last time
+            self._submit(_MAINTAIN)
+
+    def emit(self, record):
+        line = self.format_json(record) + "\n"
+
+        with self._lock:
+            if self._stream is None:
+                self._open()
+
+            if self._should_rotate(len(line)):
+                self._rotate()
+                self._open()
+
+            self._stream.write(line)
+            self._stream.flush()
+
+            self._size += len(line)
+
+    def format_json(self, record):
+        """
+        Turn a record into a line of JSON.
+
+        :param record: The record to format
+        :type record: logbook.LogRecord
+
+        :rtype: str
+        """
+
+        data = {
+            "time": record.time.isoformat() + "Z",
+            "channel": record.channel,
+            "level": record.level_name,
+            "message": record.message,
+            "protocol": record.extra.get("protocol")
+        }
+
+        if record.exc_info:
+            data["exception"] = record.formatted_exception
+
+        return json.dumps(data, sort_keys=True)
+
+    def get_rotated_files(self):
+        """
+        Get the rotated copies of the file, oldest first.
+
+        :return: A list of paths
+        :rtype: list
+        """
+
+        files = []
+
+        if not os.path.isdir(self.directory):
+            return files
+
+        for name in os.listdir(self.directory):
+            match = self.rotated_pattern.match(name)
+
+            if match:
+                files.append((
+                    match.group(1), int(match.group(2) or 0),
+                    os.path.join(self.directory, name)
+                ))
+
+        return [path for _stamp, _count, path in sorted(files)]
+
+    def close(self):
+        """
+        Close the file, and wait for any rotated files to be compressed.
+        """
+
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+        thread = self._thread
+
+        if thread is not None:
+            self._queue.put(_STOP)
+
+            if thread is not threading.current_thread():
+                thread.join()
+
+            self._thread = None
+
+    def _open(self):
+        # Must be called with the lock held
+        now = self.clock()
+
+        if self.interval and os.path.exists(self.filename):
+            # Left over from a previous period, so rotate it right away
+            if os.path.getmtime(self.filename) < self._period_start(now):
+                self._rotate()
+
+        directory = os.path.dirname(self.filename)
+
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._stream = open(self.filename, "ab")
+        self._size = self._stream.tell()
+
+        if self.interval:
+            self._rollover_at = self._period_start(now) + self.interval
+
+    def _period_start(self, now):
+        return now - (now % self.interval)
+
+    def _should_rotate(self, length):
+        # Must be called with the lock held
+        if self.interval:
+            now = self.clock()
+
+            if now >= self._rollover_at:
+                # On to the next period, even if there's nothing to rotate
+                self._rollover_at = self._period_start(now) + self.interval
+
+                if self._size > 0:
+                    return True
+
+        if self.max_size:
+            return self._size > 0 and self._size + length > self.max_size
+
+        return False
+
+    def _rotate(self):
+        # Must be called with the lock held
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+        if not os.path.exists(self.filename):
+            return
+
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(self.clock()))
+        path = "%s.%s%s" % (self._root, stamp, self._ext)
+        count = 0
+
+        while os.path.exists(path) or os.path.exists(path + ".gz"):
+            count += 1
+            path = "%s.%s-%s%s" % (self._root, stamp, count, self._ext)
+
+        os.rename(self.filename, path)
+        self._submit(path)
+
+    def _submit(self, item):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._work, name="Logging-Compressor"
+            )
+            self._thread.daemon = True
+            self._thread.start()
+
+        self._queue.put(item)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+
+            if item is _STOP:
+                return
+
+            try:
+                if item is _MAINTAIN:
+                    paths = self.get_rotated_files()
+                else:
+                    paths = [item]
+
+                if self.compress:
+                    for path in paths:
+                        if not path.endswith(".gz") and os.path.exists(path):
+                            self._compress(path)
+
+                self._enforce_budget()
+            except Exception as e:
+                # We can't exactly log this
+                print("Error tidying up rotated logs: {}".format(e))
+
+    def _compress(self, path):
+        temp = path + ".gz.tmp"
+
+        with open(path, "rb") as source:
+            with gzip.open(temp, "wb") as output:
+                shutil.copyfileobj(source, output)
+
+        # Keep the original time, for anyone looking at the files
+        stat = os.stat(path)
+        os.utime(temp, (stat.st_atime, stat.st_mtime))
+
+        os.rename(temp, path + ".gz")
+        os.remove(path)
+
+    def _enforce_budget(self):
+        if not self.budget:
+            return
+
+        rotated = self.get_rotated_files()
+        sizes = [os.path.getsize(path) for path in rotated]
+
+        # Leave room for the current file to grow to its full size
+        total = sum(sizes) + (self.max_size or 0)
+
+        if os.path.exists(self.filename):
+            total = max(total, sum(sizes) + os.path.getsize(self.filename))
+
+        for path, size in zip(rotated, sizes):
+            if total <= self.budget:
+                break
+
+            os.remove(path)
+            total -= size
@@ -12,10 +12,23 @@ For custom handlers, you may either edit the *configuration* defined in this
 module with something loaded from your plugin's config, or you can require
 that your users do their configuration in the main **logging.yml** file. It's
 up to you.
+
+Each configured handler is only created once, and shared between every
+logger - so there's one file handler with one open file, for example. The
+handlers are recreated whenever the configuration or the registered handlers
+change, and swapped in for every logger at once.
+
+By default, records are handed to the handlers in a background thread, so
+the thread that's logging - usually the reactor - never waits on them. See
+system.logging.dispatch for more on that, and remember to call `shutdown`
+when you're done, so that everything queued gets written.
 """
 
 __author__ = 'Gareth Coles'
 
+import atexit
+import threading
+
 from kitchen.text.converters import to_unicode
 
 # This does the magic - let's make logbook more suitable for us
@@ -32,8 +45,10 @@ from system.logging.handlers.builders import create_syshandler, \
     create_notification_handler, create_notifo_handler, \
     create_pushover_handler, create_twitter_handler, \
     create_redis_handler, create_zeromq_handler, create_metrics_handler, \
-    create_mail_handler
+    create_mail_handler, create_ndjson_handler
 from system.logging.handlers.colours import ColourHandler
+from system.logging.dispatch import QueuedDispatcher
+from system.enums import OverflowPolicy
 
 
 def get_level_from_name(name):
@@ -52,7 +67,8 @@ def get_level_from_name(name):
 #: Default handler list
 defaults = [
     "boxcar", "notifo", "pushover", "email", "redis", "system", "colour",
-    "zeromq", "notification", "twitter", "external", "file", "metrics", "null"
+    "zeromq", "notification", "twitter", "external", "file", "ndjson",
+    "metrics", "null"
 ]
 
 #: Storage for the configuration of each handler
@@ -64,6 +80,7 @@ configuration = {
         "boxcar": False,
         "email": False,
         "external": False,
+        "ndjson": False,
         "notification": False,
         "redis": False,
         "system": False,
@@ -84,12 +101,30 @@ configuration = {
     },
 
     "configured": False,
-    "level": INFO
+    "level": INFO,
+
+    # Queued dispatch, in a background thread
+    "queue": {
+        "enabled": True,
+        "size": 10000,
+        "overflow": OverflowPolicy.Block
+    }
 }
 
 #: Cached loggers
 loggers = {}
 
+#: The configured handlers, shared by every logger - directly, or through
+#: the dispatcher
+active_handlers = ()
+
+#: The QueuedDispatcher passing records on to the handlers, if queued
+#: dispatch is enabled
+dispatcher = None
+
+# Held while the shared handlers are being replaced
+_handlers_lock = threading.RLock()
+
 #: Each handler object
 handlers = {
     # Default handlers
@@ -97,6 +132,7 @@ handlers = {
     "boxcar": create_boxcar_handler,
     "email": create_mail_handler,
     "external": create_external_handler,
+    "ndjson": create_ndjson_handler,
     "notification": create_notification_handler,
     "notifo": create_notifo_handler,
     "pushover": create_pushover_handler,
@@ -114,8 +150,8 @@ handlers = {
 # The order handlers should be added to loggers
 handler_order = [
     "boxcar", "notifo", "pushover", "email", "redis", "zeromq",
-    "notification", "twitter", "external", "system", "file", "colour",
-    "metrics", "null"
+    "notification", "twitter", "external", "system", "file", "ndjson",
+    "colour", "metrics", "null"
 ]
 
 
@@ -186,73 +222,119 @@ def getLogger(name, add_handlers=True):
         return loggers[name]
 
 
-def add_all_handlers(logger):
+def build_handler(name):
     """
-    Add all the configured handlers to a logger.
+    Create an instance of a configured handler.
 
-    If you need to use this, you're doing something wrong.
+    :param name: The name of the handler to create
+    :type name: str
 
-    :type logger: shim.OurLogger, shim.LoggerForwarder
-    :param logger: The logger to add the handlers to
+    :return: The handler, or None if it isn't configured or couldn't be
+        created
+    :rtype: logbook.Handler, None
     """
 
-    if not configuration["configured"]:
-        return
-
-    for handler in handler_order:
-        config = configuration["handlers"].get(handler, False)
-        if config is None:
-            continue
+    config = configuration["handlers"].get(name, False)
+    if config is None:
+        return None
 
-        if isinstance(config, bool) and not config:
-            continue
+    if isinstance(config, bool) and not config:
+        return None
 
-        #: :type: logbook.Handler
-        handler_obj = handlers.get(handler, None)
+    #: :type: logbook.Handler
+    handler_obj = handlers.get(name, None)
 
-        if handler_obj is None:
-            continue
+    if handler_obj is None:
+        return None
 
-        try:
-            if isinstance(config, dict):
-                default = {
-                    "level": configuration["level"],
-                    "format_string": configuration["format_string"],
-                    "bubble": True
-                }
+    try:
+        if isinstance(config, dict):
+            default = {
+                "level": configuration["level"],
+                "format_string": configuration["format_string"],
+                "bubble": True
+            }
 
-                if "level" in config:
-                    config["level"] = get_level_from_name(config["name"])
+            default.update(config)
 
-                default.update(config)
+            if "level" in config:
+                default["level"] = get_level_from_name(config["level"])
 
-                logger.handlers.append(handler_obj(
-                    **default
-                ))
-            elif isinstance(config, list):
-                logger.handlers.append(handler_obj(
-                    *config
-                ))
-            else:
-                logger.handlers.append(handler_obj(
-                    level=configuration["level"],
-                    format_string=configuration["format_string"],
-                    bubble=True
-                ))
-        except Exception as e:
-            print(
-                "Unable to add handler {} to logger {}: {}".format(
-                    handler, logger.name, e
-                )
+            return handler_obj(**default)
+        elif isinstance(config, list):
+            return handler_obj(*config)
+        else:
+            return handler_obj(
+                level=configuration["level"],
+                format_string=configuration["format_string"],
+                bubble=True
             )
+    except Exception as e:
+        print(
+            "Unable to create handler {}: {}".format(name, e)
+        )
+
+
+def build_handlers():
+    """
+    Create one instance of each configured handler, in order.
+
+    :rtype: list
+    """
+
+    built = []
+
+    for name in handler_order:
+        handler = build_handler(name)
+
+        if handler is not None:
+            built.append(handler)
+
+    return built
+
+
+def get_handlers():
+    """
+    Get the handlers that are currently shared between all the loggers.
+
+    When queued dispatch is enabled, these are the handlers that the
+    dispatcher passes records on to.
+
+    :rtype: tuple
+    """
+
+    return active_handlers
+
+
+def _get_actual_logger(logger):
+    if isinstance(logger, shim.LoggerForwarder):
+        return logger.logger
+    return logger
+
+
+def add_all_handlers(logger):
+    """
+    Have a logger use the configured handlers.
+
+    Every logger shares the same handler instances, so this doesn't create
+    anything - the handlers are created when logging is configured, and
+    whenever the handlers list changes.
+
+    If you need to use this, you're doing something wrong.
+
+    :type logger: shim.OurLogger, shim.LoggerForwarder
+    :param logger: The logger to add the handlers to
+    """
+
+    _get_actual_logger(logger).use_shared_handlers = True
 
 
 def redo_handlers(logger):
     """
-    Remove all the handlers from a logger and add all the configured handlers
-    to it again.
+    Have a logger use the configured handlers, if it's one of ours.
 
-    This is used on every logger every time the handlers list is modified.
+    Since handlers are shared, this doesn't recreate them - use
+    `redo_all_handlers` for that.
 
     :param logger: The logger to redo
     :type logger: basestring, shim.LoggerForwarder
@@ -264,19 +346,111 @@ def redo_handlers(logger):
         logger_name = logger
 
     if logger_name in loggers:
-        loggers[logger_name].handlers = []
-
-        add_all_handlers(logger)
+        add_all_handlers(loggers[logger_name])
 
 
 def redo_all_handlers():
     """
-    Remove all handlers from all loggers and add the configured handlers
-    back to them.
+    Recreate all of the configured handlers, and swap them in for every
+    logger at once.
+
+    The new handlers are created before anything is swapped, so no logger is
+    ever left without handlers, and the old ones are closed afterwards - once
+    any queued records have been written, if queued dispatch is enabled.
     """
 
-    for logger in loggers.itervalues():
-        redo_handlers(logger)
+    global active_handlers, dispatcher
+
+    with _handlers_lock:
+        if configuration["configured"]:
+            new_handlers = tuple(build_handlers())
+        else:
+            new_handlers = ()
+
+        old_handlers, active_handlers = active_handlers, new_handlers
+        old_dispatcher = None
+
+        queue = configuration["queue"]
+
+        if configuration["configured"] and queue["enabled"]:
+            if dispatcher is None:
+                dispatcher = QueuedDispatcher()
+
+            dispatcher.size = queue["size"]
+            dispatcher.overflow = queue["overflow"]
+            dispatcher.set_handlers(new_handlers)
+
+            shim.OurLogger.shared_handlers = (dispatcher,)
+        else:
+            old_dispatcher, dispatcher = dispatcher, None
+            shim.OurLogger.shared_handlers = new_handlers
+
+        for logger in loggers.itervalues():
+            add_all_handlers(logger)
+
+    if old_dispatcher is not None:
+        old_dispatcher.stop()  # Writes everything that's queued
+
+    if dispatcher is not None:
+        dispatcher.call_later(_close_handlers, old_handlers)
+    else:
+        _close_handlers(old_handlers)
+
+
+def _close_handlers(handlers):
+    for handler in handlers:
+        try:
+            handler.close()
+        except Exception as e:
+            print(
+                "Unable to close handler {}: {}".format(handler, e)
+            )
+
+
+def flush(timeout=None):
+    """
+    Wait for all the queued records to be passed on to the handlers, if
+    queued dispatch is enabled.
+
+    :param timeout: How long to wait for, or None to wait for as long as it
+        takes
+    :type timeout: float, None
+
+    :return: Whether everything was written in time
+    :rtype: bool
+    """
+
+    current = dispatcher
+
+    if current is None:
+        return True
+    return current.flush(timeout)
+
+
+def shutdown(timeout=None):
+    """
+    Stop the background writer thread, once everything that's queued has
+    been written. Anything logged after this is passed to the handlers
+    right away.
+
+    This is also done when Python exits, just in case.
+
+    :param timeout: How long to wait for the queue to drain, or None to wait
+        for as long as it takes
+    :type timeout: float, None
+    """
+
+    global dispatcher
+
+    with _handlers_lock:
+        current, dispatcher = dispatcher, None
+        shim.OurLogger.shared_handlers = active_handlers
+
+    if current is not None:
+        current.stop(timeout)
+
+
+atexit.register(shutdown)
 
 
 def configure(config, args=None):
@@ -297,6 +471,25 @@ def configure(config, args=None):
             "handlers", configuration["handlers"]
         )
 
+        queue = config.get("queue", {})
+
+        if isinstance(queue, bool):
+            queue = {"enabled": queue}
+
+        if queue is not None:
+            # Not imported at the top, as the workers module logs
+            from system.workers import get_overflow_policy
+
+            configuration["queue"] = {
+                "enabled": queue.get(
+                    "enabled", configuration["queue"]["enabled"]
+                ),
+                "size": queue.get("size", configuration["queue"]["size"]),
+                "overflow": get_overflow_policy(queue.get(
+                    "overflow", configuration["queue"]["overflow"]
+                ))
+            }
+
         if args is not None:
             if args.trace:
                 configuration["level"] = get_level_from_name("trace")
@@ -324,8 +517,7 @@ def configure(config, args=None):
 
     configuration["configured"] = True
 
-    for logger in loggers.values():
-        add_all_handlers(logger)
+    redo_all_handlers()
 
     getLogger("Logging").info("    ")
     getLogger("Logging").info("    === Logging session opened ===")
@@ -380,9 +572,9 @@ def handler_after(this, after):
 
 def add_handler(name, handler):
     """
-    Register your handler proper. This will recreate all handlers on all
-    loggers, so you should only do this when your plugin is loaded, for
-    instance.
+    Register your handler proper. This will recreate all handlers and swap
+    them in on all loggers, so you should only do this when your plugin is
+    loaded, for instance.
 
     :param name: The name of your handler
     :param handler: The handler class
@@ -401,9 +593,9 @@ def add_handler(name, handler):
 
 def remove_handler(name):
     """
-    Remove a registered handler. This will recreate all handlers on all
-    loggers, so you should use this very sparingly, in special circumstances
-    only.
+    Remove a registered handler. This will recreate all handlers and swap
+    them in on all loggers, so you should use this very sparingly, in special
+    circumstances only.
 
     :param name: The name of the handler to remove
     :type name: str
@@ -9,9 +9,16 @@ Your all-access-pass to Logbookdom includes:
     room for it
     * A small amount of duck-punching so TRACE can be imported from the logbook
       packages
-* A custom logger that includes a .trace() method and simple handlers list, as
-  well as a .setLevel() that works with Python's standard logging levels and a
-  .failure(message, Failure) for logging Twisted Failures
+* A custom logger that includes a .trace() method and a handlers list that may
+  be shared between every logger, as well as a .setLevel() that works with
+  Python's standard logging levels and a .failure(message, Failure) for
+  logging Twisted Failures, plus .extra fields for every record it makes
+* Records that format their messages with %-style arguments (or {}-style,
+  if that doesn't work), only when they're needed - so
+  `logger.debug("Thing: %s", thing)` costs next to nothing when nothing is
+  handling debug records
+* An .is_enabled_for(level) on loggers, for when even working out the
+  arguments is too expensive
 * A logger forwarder so that loggers can be recreated without modules having
   to grab the new instances
 """
@@ -19,9 +26,11 @@ Your all-access-pass to Logbookdom includes:
 import logging
 import logbook.base
 
-from logbook import Logger
+from itertools import chain
 
-from kitchen.text.converters import to_bytes
+from logbook import Handler, Logger, LogRecord
+
+from kitchen.text.converters import to_bytes, to_unicode
 from twisted.python.failure import Failure
 
 __author__ = 'Gareth Coles'
@@ -79,16 +88,131 @@ setattr(logbook.base, "_level_names", level_names)
 setattr(logbook.base, "_reverse_level_names", reverse_level_names)
 
 
+class OurLogRecord(LogRecord):
+    """
+    Log record that formats its message with %-style arguments, like the
+    standard logging module does.
+
+    Messages that don't work with %-style formatting are formatted with
+    str.format instead, as Logbook does - so older {}-style calls, like
+    `logger.info("Thing: {}", thing)`, still work.
+    """
+
+    def _format_message(self, msg, *args, **kwargs):
+        values = args
+
+        if len(args) == 1 and isinstance(args[0], dict):
+            values = args[0]  # logger.info("%(thing)s", {"thing": ...})
+        elif kwargs and not args:
+            values = kwargs
+
+        try:
+            try:
+                message = msg % values
+            except UnicodeError:
+                # Mixed-up bytes and unicode, usually from a translation
+                if isinstance(values, tuple):
+                    values = tuple(to_unicode(x) if isinstance(x, str) else x
+                                   for x in values)
+                message = to_unicode(msg) % values
+        except (TypeError, ValueError, KeyError):
+            # Not %-style
+            return msg.format(*args, **kwargs)
+
+        if message == msg and not isinstance(values, tuple) and "{" in msg:
+            # Mappings don't complain about unused values
+            return msg.format(*args, **kwargs)
+
+        return message
+
+
 # This is our own Logger, which also has a .trace()
 class OurLogger(Logger):
-    handlers = []
+    #: Handlers shared by every logger that has `use_shared_handlers` set.
+    #: This is replaced as a whole, never modified - see
+    #: system.logging.logger.redo_all_handlers
+    shared_handlers = ()
+
+    #: Whether this logger uses the shared handlers instead of its own
+    use_shared_handlers = False
+
+    _handlers = None
+
+    def __init__(self, name=None, level=our_NOTSET):
+        super(OurLogger, self).__init__(name, level)
+
+        #: Extra fields added to every record from this logger - for example,
+        #: "protocol" for protocols' loggers
+        self.extra = {}
+
+    @property
+    def handlers(self):
+        if self.use_shared_handlers:
+            return OurLogger.shared_handlers
+        return self._handlers
+
+    @handlers.setter
+    def handlers(self, value):
+        self._handlers = value
+
+    def is_enabled_for(self, level):
+        """
+        Check whether anything would handle a record at a given level, so you
+        can avoid doing expensive work for a record that's going nowhere.
+
+        This only checks levels, not any filters the handlers might have.
+
+        :param level: The level to check
+        :type level: int
+
+        :rtype: bool
+        """
+
+        if self.disabled or level < self.level:
+            return False
+
+        handlers = chain(self.handlers,
+                         Handler.stack_manager.iter_context_objects())
+
+        for handler in handlers:
+            if level >= handler.level:
+                return not handler.blackhole
+
+        return False
 
     def _log(self, level, args, kwargs):
+        if not self.is_enabled_for(level):
+            return
+
         args = list(args)
         args[0] = to_bytes(args[0])
 
         super(OurLogger, self)._log(level, args, kwargs)
 
+    def make_record_and_handle(self, level, msg, args, kwargs, exc_info,
+                               extra, frame_correction):
+        # Logbook's, but with our records
+        channel = None
+        if not self.suppress_dispatcher:
+            channel = self
+
+        record = OurLogRecord(self.name, level, msg, args, kwargs, exc_info,
+                              extra, None, channel, frame_correction)
+
+        try:
+            self.handle(record)
+        finally:
+            record.late = True
+            if not record.keep_open:
+                record.close()
+
+    def process_record(self, record):
+        super(OurLogger, self).process_record(record)
+
+        for key, value in self.extra.iteritems():
+            if key not in record.extra:
+                record.extra[key] = value
+
     def trace(self, *args, **kwargs):
         """
         Same as Logbook's debug, etc functions, but for a custom TRACE level.
@@ -165,6 +289,19 @@ class LoggerForwarder(object):
     def reassign(self, logger):
         self.logger = logger
 
+    def is_enabled_for(self, level):
+        """
+        Check whether anything would handle a record at a given level - see
+        `OurLogger.is_enabled_for`.
+
+        :param level: The level to check
+        :type level: int
+
+        :rtype: bool
+        """
+
+        return self.logger.is_enabled_for(level)
+
     def __getattr__(self, item):
         logger = self.__getattribute__("logger")
 
@@ -4,10 +4,14 @@ import json
 import platform
 import psutil
 import sys
+import threading
+import time
 import traceback
 import urllib
 import urllib2
 
+from collections import deque, OrderedDict
+
 from twisted.internet.task import LoopingCall
 
 from system.constants import version_info
@@ -62,6 +66,248 @@ warning = """
 """
 
 
+def get_signature(exc_info):
+    """
+    Get something that identifies an exception - its type, and where it was
+    raised from. The message isn't included, as that often contains things
+    like IDs and names that change every time.
+
+    :param exc_info: The exception, as returned by sys.exc_info()
+    :type exc_info: tuple
+
+    :rtype: tuple
+    """
+
+    frames = []
+    tb = exc_info[2]
+
+    while tb is not None:
+        code = tb.tb_frame.f_code
+        frames.append((code.co_filename, code.co_name, tb.tb_lineno))
+
+        tb = tb.tb_next
+
+    return exc_info[0], tuple(frames)
+
+
+def get_report(exc_info, count=1):
+    """
+    Get a report for an exception, as sent to the metrics service. This
+    includes the traceback, and the local variables of the frame the
+    exception was raised in.
+
+    :param exc_info: The exception, as returned by sys.exc_info()
+    :param count: How many times the exception happened
+
+    :type exc_info: tuple
+    :type count: int
+
+    :rtype: dict
+    """
+
+    t = None
+
+    try:
+        t = traceback.format_exception(*exc_info)
+        tb = exc_info[2]
+
+        scope = {}
+
+        if tb is not None:
+            while tb.tb_next:
+                tb = tb.tb_next
+
+            for key, value in sorted(tb.tb_frame.f_locals.items()):
+                if key == "__doc__":
+                    v = "[DOCSTRING]"
+                else:
+                    try:
+                        v = str(value)
+                    except Exception:
+                        try:
+                            v = repr(value)
+                        except Exception:
+                            v = "[UNKNOWN]"
+                scope[key] = v
+
+        return {
+            "traceback": "\n".join(t),
+            "type": str(exc_info[0]),
+            "value": str(exc_info[1]),
+            "scope": scope,
+            "count": count
+        }
+    finally:
+        del exc_info, t
+
+
+class ExceptionReporter(object):
+    """
+    Sends exception reports from a background thread, so that logging an
+    exception never waits on the network.
+
+    Exceptions are grouped by their signature - see `get_signature`. While
+    one is waiting to be sent, any more like it just add to its count, so an
+    exception that happens for every message only takes up one place in the
+    queue. At most `size` different exceptions may be waiting, and any more
+    are dropped.
+
+    At most `rate` reports are sent every `period` seconds - the rest wait
+    for their turn, collecting counts as they go.
+    """
+
+    def __init__(self, send, size=100, rate=10, period=60):
+        """
+        :param send: Function that sends a report, given the dict from
+            `get_report` - swap this out to send reports somewhere else
+        :param size: How many different exceptions may be waiting to be sent
+        :param rate: How many reports may be sent every period
+        :param period: The period for the rate limit, in seconds
+
+        :type send: function
+        :type size: int
+        :type rate: int
+        :type period: float
+        """
+
+        self.send = send
+        self.size = size
+        self.rate = rate
+        self.period = period
+
+        self.log = getLogger("Metrics")
+
+        self.dropped = 0
+        self.stopped = False
+
+        # Signature: [exc_info, count]
+        self._pending = OrderedDict()
+        # When recent reports were sent, for the rate limit
+        self._sent = deque()
+
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __repr__(self):
+        return "<%s: %s/%s queued, %s dropped>" % (
+            self.__class__.__name__, self.pending, self.size, self.dropped
+        )
+
+    @property
+    def pending(self):
+        """
+        How many different exceptions are waiting to be sent.
+        """
+
+        return len(self._pending)
+
+    def submit(self, exc_info):
+        """
+        Queue an exception to be sent.
+
+        :param exc_info: The exception, as returned by sys.exc_info()
+        :type exc_info: tuple
+
+        :return: Whether the exception was queued, or added to the count of
+            one that already was
+        :rtype: bool
+        """
+
+        signature = get_signature(exc_info)
+
+        with self._condition:
+            if self.stopped:
+                return False
+
+            entry = self._pending.get(signature)
+
+            if entry is not None:
+                entry[1] += 1
+                return True
+
+            if len(self._pending) >= self.size:
+                self.dropped += 1
+                return False
+
+            self._pending[signature] = [exc_info, 1]
+            self._start()
+
+            self._condition.notify_all()
+
+        return True
+
+    def stop(self, timeout=None):
+        """
+        Stop the sending thread. Anything still waiting to be sent is
+        dropped, rather than holding up the shutdown.
+
+        :param timeout: How long to wait for a report that's being sent, or
+            None to wait for as long as it takes
+        :type timeout: float, None
+        """
+
+        with self._condition:
+            if self.stopped:
+                return
+
+            self.stopped = True
+            thread = self._thread
+
+            self._condition.notify_all()
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _start(self):
+        # Must be called with the condition held
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._work,
+                                        name="Metrics-Exceptions")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _wait(self):
+        # Must be called with the condition held - waits until there's
+        # something to send that the rate limit allows, or until stopped
+        while not self.stopped:
+            if not self._pending:
+                self._condition.wait()
+                continue
+
+            now = time.time()
+
+            while self._sent and self._sent[0] <= now - self.period:
+                self._sent.popleft()
+
+            if len(self._sent) < self.rate:
+                return True
+
+            self._condition.wait(self._sent[0] + self.period - now)
+
+        return False
+
+    def _work(self):
+        while True:
+            with self._condition:
+                if not self._wait():
+                    self.dropped += len(self._pending)
+                    self._pending.clear()
+                    return
+
+                exc_info, count = self._pending.popitem(last=False)[1]
+                self._sent.append(time.time())
+
+            try:
+                self.send(get_report(exc_info, count))
+            except Exception as e:
+                # Not logged as an exception, or we'd just be reporting it
+                self.log.warn(_("Error sending exception report: %s"), e)
+            finally:
+                del exc_info
+
+
 class Metrics(object):
     """
     Configurable metrics handler.
@@ -86,6 +332,13 @@ class Metrics(object):
 
     interval = 300  # Every 5 minutes
 
+    #: Sends exceptions in the background - see ExceptionReporter
+    reporter = None
+
+    exception_queue_size = 100  # Different exceptions waiting to be sent
+    exception_rate = 10  # Exceptions sent..
+    exception_period = 60  # ..every minute
+
     domain = "https://ultros.io"
 
     submit_url = domain + "/api/metrics/post/%s"
@@ -103,6 +356,11 @@ class Metrics(object):
         self.manager = manager
         self.log = getLogger("Metrics")
 
+        self.reporter = ExceptionReporter(
+            self.send_exception, self.exception_queue_size,
+            self.exception_rate, self.exception_period
+        )
+
         self.storage = StorageManager()
         self.events = EventManager()
         self.packages = Packages(get=False)
@@ -118,7 +376,7 @@ class Metrics(object):
             elif self.status == "off":
                 self.status = False
         else:
-            self.log.warn("\n%s\n" % warning)
+            self.log.warn("\n%s\n", warning)
             self.log.warn(_(
                 "We couldn't find a \"metrics\" option in your settings.yml"
                 " file!"
@@ -248,11 +506,11 @@ class Metrics(object):
                 r = self.post(self.submit_url % self.data["uuid"], compiled)
                 r = json.loads(r)
 
-                self.log.trace(_("Submitted. Result: %s") % r)
+                self.log.trace(_("Submitted. Result: %s"), r)
 
                 if r["result"] == "error":
-                    self.log.error(_("Error submitting metrics: %s")
-                                   % r["error"])
+                    self.log.error(_("Error submitting metrics: %s"),
+                                   r["error"])
             except Exception:
                 self.log.exception(_("Error submitting metrics"))
         elif self.status is False:
@@ -262,11 +520,11 @@ class Metrics(object):
                 r = self.post(self.submit_url % self.data["uuid"], compiled)
                 r = json.loads(r)
 
-                self.log.trace(_("Submitted. Result: %s") % r)
+                self.log.trace(_("Submitted. Result: %s"), r)
 
                 if r["result"] == "error":
-                    self.log.error(_("Error submitting disable message: %s")
-                                   % r["error"])
+                    self.log.error(_("Error submitting disable message: %s"),
+                                   r["error"])
             except Exception:
                 self.log.exception(_("Error submitting disable message"))
             else:
@@ -280,7 +538,7 @@ class Metrics(object):
                 r = self.get(self.destroy_url % self.data["uuid"])
                 r = json.loads(r)
 
-                self.log.trace("Submitted. Result: %s" % r)
+                self.log.trace("Submitted. Result: %s", r)
 
                 if r["result"] == "success":
                     self.log.info(_("Metrics data has been removed from the "
@@ -297,55 +555,51 @@ class Metrics(object):
             finally:
                 self.task.stop()
         else:
-            self.log.warn(_("Unknown status: %s") % self.status)
+            self.log.warn(_("Unknown status: %s"), self.status)
             self.task.stop()
 
     def submit_exception(self, exc_info):
-        t = None
+        """
+        Queue an exception to be sent to the metrics service, if exception
+        sending is enabled. This returns right away - the exception is sent
+        in the background, by `reporter`.
+
+        :param exc_info: The exception, as returned by sys.exc_info()
+        :type exc_info: tuple
+
+        :return: Whether the exception was queued
+        :rtype: bool
+        """
 
         if self.status is True and self.send_exceptions:
-            try:
-                t = traceback.format_exception(*exc_info)
-                tb = exc_info[2]
+            return self.reporter.submit(exc_info)
+        return False
 
-                while 1:
-                    if not tb.tb_next:
-                        break
+    def send_exception(self, report):
+        """
+        Send an exception report to the metrics service. This is called by
+        `reporter`, in its thread.
 
-                    tb = tb.tb_next
+        :param report: The report, as returned by `get_report`
+        :type report: dict
+        """
 
-                f = tb.tb_frame
+        self.post(self.exception_url % self.data["uuid"], report)
 
-                scope = {}
+    def stop_reporter(self, timeout=None):
+        """
+        Stop sending exceptions. Anything still waiting to be sent is
+        dropped.
 
-                for key, value in sorted(f.f_locals.items()):
-                    if key == "__doc__":
-                        v = "[DOCSTRING]"
-                    else:
-                        try:
-                            v = str(value)
-                        except Exception:
-                            try:
-                                v = repr(value)
-                            except Exception:
-                                v = "[UNKNOWN]"
-                    scope[key] = v
-
-                self.post(
-                    self.exception_url % self.data["uuid"],
-                    {
-                        "traceback": "\n".join(t),
-                        "type": str(exc_info[0]),
-                        "value": str(exc_info[1]),
-                        "scope": scope
-                    }
-                )
-            finally:
-                del exc_info, t
+        :param timeout: How long to wait for a report that's being sent
+        :type timeout: float, None
+        """
+
+        self.reporter.stop(timeout)
 
     def post(self, url, data):
         data = json.dumps(data)
-        self.log.debug("Posting data: %s" % data)
+        self.log.debug("Posting data: %s", data)
 
         data = urllib.urlencode({"data": data})
         req = urllib2.Request(
@@ -353,7 +607,7 @@ class Metrics(object):
         )
 
         result = urllib2.urlopen(req).read()
-        self.log.debug("Result: %s" % result)
+        self.log.debug("Result: %s", result)
         return result
 
     def get(self, url):
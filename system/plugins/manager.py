@@ -101,7 +101,7 @@ class PluginManager(object):
 
                 if name in self.info_objects:
                     self.log.error(
-                        "Duplicate plugin name detected: %s" % c_name
+                        "Duplicate plugin name detected: %s", c_name
                     )
                     self.log.error("Only the first one will be able to load!")
                     continue
@@ -109,12 +109,12 @@ class PluginManager(object):
                 self.info_objects[name] = Info(obj)
 
                 if output:
-                    self.log.debug("Found plugin info: %s" % c_name)
+                    self.log.debug("Found plugin info: %s", c_name)
             except Exception:
-                self.log.exception("Error loading info file: %s" % fn)
+                self.log.exception("Error loading info file: %s", fn)
 
         if output:
-            self.log.info("%s plugins found." % len(self.info_objects))
+            self.log.info("%s plugins found.", len(self.info_objects))
 
         extra = 0
 
@@ -127,7 +127,7 @@ class PluginManager(object):
 
         if output:
             if extra > 1:
-                self.log.warning("%s plugins have disappeared." % extra)
+                self.log.warning("%s plugins have disappeared.", extra)
 
     def load_plugins(self, plugins, output=True):
         """
@@ -156,7 +156,7 @@ class PluginManager(object):
 
             if name not in self.info_objects:
                 if output:
-                    self.log.warning("Unknown plugin: %s" % name)
+                    self.log.warning("Unknown plugin: %s", name)
                 continue
 
             info = self.info_objects[name]
@@ -174,7 +174,7 @@ class PluginManager(object):
                 deps = to_load[x][1]
 
                 self.log.trace(
-                    "Checking dependencies for plugins: %s" % info.name
+                    "Checking dependencies for plugins: %s", info.name
                 )
 
                 for i, dep in enumerate(copy(deps)):
@@ -232,18 +232,15 @@ class PluginManager(object):
             for plugin in to_load:
                 self.log.warning(
                     'Unable to load plugin "%s" due to failed dependencies: '
-                    '%s' %
-                    (
-                        plugin[0].name,
-                        ", ".join(plugin[1])
-                    )
+                    '%s',
+                    plugin[0].name, ", ".join(plugin[1])
                 )
 
         did_load = []
 
         # Deal with loadable plugins
         for info in load_order:
-            self.log.debug("Loading plugin: %s" % info.name)
+            self.log.debug("Loading plugin: %s", info.name)
 
             result = self.load_plugin(info.name)
 
@@ -251,22 +248,19 @@ class PluginManager(object):
                 self.log.debug("LoadError")
                 pass  # Already output by load_plugin
             elif result is PluginState.NotExists:  # Should never happen
-                self.log.warning("No such plugin: %s" % info.name)
+                self.log.warning("No such plugin: %s", info.name)
             elif result is PluginState.Loaded:
                 if output:
                     self.log.info(
-                        "Loaded plugin: %s v%s by %s" % (
-                            info.name,
-                            info.version,
-                            info.author
-                        )
+                        "Loaded plugin: %s v%s by %s", info.name,
+                        info.version, info.author
                     )
                 did_load.append(info.name)
             elif result is PluginState.AlreadyLoaded:
                 if output:
-                    self.log.warning("Plugin already loaded: %s" % info.name)
+                    self.log.warning("Plugin already loaded: %s", info.name)
             elif result is PluginState.Unloaded:  # Can actually happen now
-                self.log.warn("Plugin unloaded: %s" % info.name)
+                self.log.warn("Plugin unloaded: %s", info.name)
                 self.log.warn("This means the plugin disabled itself - did "
                               "it output anything on its own?")
             elif result is PluginState.DependencyMissing:
@@ -328,7 +322,7 @@ class PluginManager(object):
         module = info.get_module()
 
         try:
-            self.log.trace("Module: %s" % module)
+            self.log.trace("Module: %s", module)
             obj = None
 
             if module in sys.modules:
@@ -338,23 +332,23 @@ class PluginManager(object):
             else:
                 module_obj = importlib.import_module(module)
 
-            self.log.trace("Module object: %s" % module_obj)
+            self.log.trace("Module object: %s", module_obj)
 
             obj = self.find_plugin_class(module_obj)
 
             if obj is None:
                 self.log.error(
-                    "Unable to find plugin class for plugin: %s" % info.name
+                    "Unable to find plugin class for plugin: %s", info.name
                 )
                 return PluginState.LoadError
 
             self.plugin_objects[name] = obj
         except ImportError:
-            self.log.exception("Unable to import plugin: %s" % info.name)
-            self.log.debug("Module: %s" % module)
+            self.log.exception("Unable to import plugin: %s", info.name)
+            self.log.debug("Module: %s", module)
             return PluginState.LoadError
         except Exception:
-            self.log.exception("Error loading plugin: %s" % info.name)
+            self.log.exception("Error loading plugin: %s", info.name)
             return PluginState.LoadError
         else:
             try:
@@ -374,7 +368,7 @@ class PluginManager(object):
                 if name in self.plugin_objects:
                     del self.plugin_objects[name]
 
-                self.log.exception("Error setting up plugin: %s" % info.name)
+                self.log.exception("Error setting up plugin: %s", info.name)
                 return PluginState.LoadError
             else:
                 event = PluginLoadedEvent(self, obj)
@@ -383,7 +377,7 @@ class PluginManager(object):
 
     def find_plugin_class(self, module):
         for name_, clazz in inspect.getmembers(module):
-            self.log.trace("Member: %s" % name_)
+            self.log.trace("Member: %s", name_)
             if inspect.isclass(clazz):
                 self.log.trace("It's a class!")
                 if clazz.__module__ == module.__name__:
@@ -393,7 +387,7 @@ class PluginManager(object):
                             return clazz()
                     except RuntimeError:
                         self.log.exception(
-                            "Recursion limit hit while trying to import: %s" %
+                            "Recursion limit hit while trying to import: %s",
                             clazz.__name__
                         )
                         return None
@@ -411,7 +405,7 @@ class PluginManager(object):
         """
 
         if output:
-            self.log.info("Unloading %s plugins.." % len(self.plugin_objects))
+            self.log.info("Unloading %s plugins..", len(self.plugin_objects))
 
         for key in self.plugin_objects.keys():
             result = self.unload_plugin(key)
@@ -419,14 +413,14 @@ class PluginManager(object):
             if result is PluginState.LoadError:
                 pass  # Should never happen
             elif result is PluginState.NotExists:
-                self.log.warning("No such plugin: %s" % key)
+                self.log.warning("No such plugin: %s", key)
             elif result is PluginState.Loaded:
                 pass  # Should never happen
             elif result is PluginState.AlreadyLoaded:
                 pass  # Should never happen
             elif result is PluginState.Unloaded:  # Should never happen
                 if output:
-                    self.log.info("Plugin unloaded: %s" % key)
+                    self.log.info("Plugin unloaded: %s", key)
             elif result is PluginState.DependencyMissing:
                 pass  # Should never happen
 
@@ -456,7 +450,7 @@ class PluginManager(object):
             # TODO: Handle deferreds here
             d = obj.deactivate()
         except Exception:
-            self.log.exception("Error deactivating plugin: %s" % obj.info.name)
+            self.log.exception("Error deactivating plugin: %s", obj.info.name)
 
         event = PluginLoadedEvent(self, obj)
         self.events.run_callback("PluginUnloaded", event)
@@ -482,13 +476,13 @@ class PluginManager(object):
             if result is PluginState.LoadError:
                 pass  # Already output
             elif result is PluginState.NotExists:
-                self.log.warning("Plugin has disappeared: %s" % c_name)
+                self.log.warning("Plugin has disappeared: %s", c_name)
             elif result is PluginState.Loaded:
                 if output:
-                    self.log.info("Reloaded plugin: %s" % c_name)
+                    self.log.info("Reloaded plugin: %s", c_name)
             elif result is PluginState.AlreadyLoaded:
                 if output:
-                    self.log.warning("Plugin already loaded: %s" % c_name)
+                    self.log.warning("Plugin already loaded: %s", c_name)
             elif result is PluginState.Unloaded:
                 pass  # Should never happen
             elif result is PluginState.DependencyMissing:
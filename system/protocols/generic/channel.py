@@ -13,8 +13,13 @@ class Channel(object):
 
     @ivar name The name of the channel
     @ivar users A set containing all the User objects in the channel
+
+    Like users, channels store their attributes in **__slots__** - list any
+    attributes you add in your subclass's **__slots__** too.
     """
 
+    __slots__ = ["name", "protocol", "users", "__dict__", "__weakref__"]
+
     def __init__(self, name, protocol=None):
         """
         Initialise the channel. Remember to call super in subclasses!
@@ -41,6 +46,6 @@ class Channel(object):
             self.users.remove(user)
         except KeyError:
             self.protocol.log.debug(
-                "Tried to remove non-existent user \"%s\" from channel \"%s\""
-                % (user, self)
+                "Tried to remove non-existent user \"%s\" from channel \"%s\"",
+                user, self
             )
@@ -54,6 +54,7 @@ class BaseFactory(ClientFactory):
         self.factory_manager = factory_manager
 
         self.logger = getLogger("F: {}".format(self.name))
+        self.logger.extra["protocol"] = self.name
 
     # Custom Ultros functions - must be overridden
 
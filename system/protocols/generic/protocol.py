@@ -3,6 +3,7 @@
 from twisted.internet import protocol
 
 from system.decorators.log import deprecated
+from system.enums import CommandState
 from system.logging.logger import getLogger
 from system.translations import Translations
 
@@ -38,6 +39,8 @@ class Protocol(protocol.Protocol):
     * event_manager: The event manager
     * command_manager: The command manager
     * CHANNELS: Don't override this, use one of the relevant subclasses instead
+    * deferred_command_done(self, result, caller): Add this as a callback
+      when running a command gives you CommandState.Deferred
 
     These ones you should override, but are optional:
 
@@ -122,6 +125,7 @@ class Protocol(protocol.Protocol):
         self.factory = factory
         self.config = config
         self.log = getLogger(self.name)
+        self.log.extra["protocol"] = self.name
         # Default values for optional main config section
         try:
             self.can_flood = self.config["main"]["can-flood"]
@@ -137,6 +141,30 @@ class Protocol(protocol.Protocol):
         self.transport.loseConnection()
         raise NotImplementedError(_("This function needs to be implemented!"))
 
+    def deferred_command_done(self, result, caller):
+        """
+        Tell the user about any problems with a command that was run in a
+        worker thread - add this as a callback to the Deferred you get along
+        with CommandState.Deferred.
+
+        :param result: The (CommandState, None or Exception) tuple the
+            Deferred fired with
+        :param caller: The user that ran the command
+
+        :type result: tuple
+        :type caller: User
+        """
+
+        state, error = result
+
+        if state is CommandState.RateLimited:
+            caller.respond(_("That command has been rate-limited, please try "
+                             "again later."))
+        elif state is CommandState.Error:
+            caller.respond(_("Error running command: %s") % error)
+
+        return result
+
     def get_user(self, user):
         """
         Used to retrieve a user.
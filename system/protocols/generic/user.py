@@ -7,16 +7,27 @@ _ = Translations().get()
 
 
 class User(object):
+    """
+    A user - Represents a user on a protocol. Subclass this!
 
-    authorized = False
-    auth_name = ""
-    away = False
+    We may be tracking a lot of users, so attributes are stored in
+    **__slots__**. Subclasses should list the attributes they add in their
+    own **__slots__**; anything else set on a user will still work, but ends
+    up in a **__dict__** instead.
+    """
+
+    __slots__ = ["nickname", "protocol", "is_tracked", "authorized",
+                 "auth_name", "away", "__dict__", "__weakref__"]
 
     def __init__(self, nickname, protocol=None, is_tracked=False):
         self.nickname = nickname
         self.protocol = protocol
         self.is_tracked = is_tracked
 
+        self.authorized = False
+        self.auth_name = ""
+        self.away = False
+
     @property
     def name(self):
         return self.nickname
@@ -9,6 +9,8 @@ _ = Translations().get()
 
 
 class Channel(channel.Channel):
+    __slots__ = ["_modes"]
+
     def __init__(self, protocol, name):
         super(Channel, self).__init__(name, protocol)
         self.users = set()
@@ -27,8 +29,8 @@ class Channel(channel.Channel):
             # According to PEP8, this is easier to read on two lines <_<
             self.protocol.log.debug(
                 _("Tried to remove non-existent user \"%s\" from channel "
-                  "\"%s\"")
-                % (user, self))
+                  "\"%s\""),
+                user, self)
 
     def set_mode(self, mode, arg=None):
         """
@@ -42,8 +44,8 @@ class Channel(channel.Channel):
         except KeyError:
             self.protocol.log.debug(
                 _("Tried to remove non-existent mode \"%s\" from channel "
-                  "\"%s\"")
-                % (mode, self))
+                  "\"%s\""),
+                mode, self)
 
     def get_mode(self, mode):
         """
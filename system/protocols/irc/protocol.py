@@ -9,6 +9,7 @@ from twisted.words.protocols import irc
 from system.constants import __version__
 from system.commands.manager import CommandManager
 from system.decorators.log import deprecated
+from system.decorators.threads import reactor_thread
 from system.enums import CommandState
 from system.events import general as general_events
 from system.events import irc as irc_events
@@ -100,6 +101,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         ChannelsProtocol.__init__(self, name, factory, config)
 
         self.log = getLogger(self.name)
+        self.log.extra["protocol"] = self.name
         self.log.info(_("Setting up.."))
 
         try:
@@ -171,7 +173,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         Overriding this because fuck Twisted unicode support.
         """
         if output:
-            self.log.info(_("SERVER -> %s") % line)
+            self.log.info(_("SERVER -> %s"), line)
 
         line = to_bytes(line)  # The magical line
 
@@ -240,7 +242,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     def joined(self, channel):
         """ Called when we join a channel. """
-        self.log.info(_("Joined channel: %s") % channel)
+        self.log.info(_("Joined channel: %s"), channel)
         chan_obj = Channel(self, channel)
         # Do user-tracking in irc_JOIN
 
@@ -250,7 +252,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
     def left(self, channel):
         """ Called when we part a channel.
         This could include opers using /sapart. """
-        self.log.info(_("Parted channel: %s") % channel)
+        self.log.info(_("Parted channel: %s"), channel)
         chan_obj = self.get_channel(channel)
         # User-tracking stuff:
         self.self_part_channel(chan_obj)
@@ -260,8 +262,8 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     def kickedFrom(self, channel, kicker, message):
         """ Called when we get kicked from a channel. """
-        self.log.info(_("Kicked from %s by %s: %s")
-                      % (channel, kicker, message))
+        self.log.info(_("Kicked from %s by %s: %s"),
+                      channel, kicker, message)
 
         user_obj = self.get_user(nickname=kicker)
         channel_obj = self.get_channel(channel)
@@ -277,13 +279,13 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             password = self.config["channels"][channel]["key"]
 
         if self.config["kick_rejoin"]:
-            self.log.info(_("Rejoining in %s seconds..") %
+            self.log.info(_("Rejoining in %s seconds.."),
                           self.config["rejoin_delay"])
             reactor.callLater(self.config["rejoin_delay"], self.join_channel,
                               channel, password)
         elif channel in self.config["channels"]:
             if self.config["channels"][channel].get("kick_rejoin", False):
-                self.log.info(_("Rejoining in %s seconds..") %
+                self.log.info(_("Rejoining in %s seconds.."),
                               self.config["rejoin_delay"])
                 reactor.callLater(self.config["rejoin_delay"],
                                   self.join_channel,
@@ -291,7 +293,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     def nickChanged(self, nick):
         """ Called when our nick is forcibly changed. """
-        self.log.info(_("Nick changed to %s") % nick)
+        self.log.info(_("Nick changed to %s"), nick)
 
         event = general_events.NameChangedSelf(self, nick)
         self.event_manager.run_callback("NameChangedSelf", event)
@@ -307,7 +309,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             user_obj = self._get_user_from_user_string(user)
         except Exception:
             # Privmsg from the server itself and things (if that happens)
-            self.log.trace(_("Message from irregular user: %s") % user)
+            self.log.trace(_("Message from irregular user: %s"), user)
             user_obj = User(self, nickname=user)
 
         if self.utils.compare_nicknames(channel, self.get_nickname()):
@@ -322,8 +324,8 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         self.event_manager.run_callback("PreMessageReceived", event)
 
         if event.printable:
-            self.log.info("<%s:%s> %s" % (user_obj.nickname, channel,
-                                          event.message))
+            self.log.info("<%s:%s> %s", user_obj.nickname, channel,
+                          event.message)
 
         if not event.cancelled:
             result = self.command_manager.process_input(
@@ -352,11 +354,16 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
                 if case(CommandState.NoPermission):
                     self.log.debug("No permission to run command")
                     return  # It was a command
+                if case(CommandState.Deferred):
+                    self.log.debug("Command running in a worker thread")
+                    result[1].addCallback(self.deferred_command_done,
+                                          user_obj)
+                    return  # It was a command
                 if case(CommandState.Error):
                     user_obj.respond("Error running command: %s" % result[1])
                     return  # It was a command
                 if default:
-                    self.log.debug("Unknown command state: %s" % result[0])
+                    self.log.debug("Unknown command state: %s", result[0])
                     break
 
             second_event = general_events.MessageReceived(
@@ -373,7 +380,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             user_obj = self._get_user_from_user_string(user)
         except Exception:
             # Notices from the server itself and things
-            self.log.trace(_("Notice from irregular user: %s") % user)
+            self.log.trace(_("Notice from irregular user: %s"), user)
             user_obj = User(self, nickname=user, is_tracked=False)
 
         if self.utils.compare_nicknames(channel, self.get_nickname()):
@@ -389,7 +396,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
                                                   printable=True)
         self.event_manager.run_callback("PreMessageReceived", event)
         if event.printable:
-            self.log.info("-%s:%s- %s" % (user, channel, event.message))
+            self.log.info("-%s:%s- %s", user, channel, event.message)
 
         second_event = general_events.MessageReceived(self,
                                                       user_obj,
@@ -409,7 +416,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         if self._ctcp_flood_enabled and action != "ACTION":
             if self._ctcp_flood_last + self._ctcp_flood_time < time.time():
                 self.log.debug(
-                    _("First CTCP in over %s seconds - resetting counter") %
+                    _("First CTCP in over %s seconds - resetting counter"),
                     self._ctcp_flood_time
                 )
                 # First CTCP in a while - reset counter
@@ -429,7 +436,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             user_obj = self._get_user_from_user_string(user)
         except Exception:
             # CTCP from the server itself and things (if that happens)
-            self.log.trace(_("CTCP from irregular user: %s") % user)
+            self.log.trace(_("CTCP from irregular user: %s"), user)
             user_obj = User(self, nickname=user, is_tracked=False)
 
         if self.utils.compare_nicknames(channel, self.get_nickname()):
@@ -444,7 +451,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         self.event_manager.run_callback("IRC/CTCPQueryReceived", event)
 
         if action.upper() == "ACTION":
-            self.log.info("* %s:%s %s" % (user_obj, channel_obj, data))
+            self.log.info("* %s:%s %s", user_obj, channel_obj, data)
 
             e = general_events.ActionReceived(
                 self, user_obj, channel_obj, data
@@ -454,9 +461,8 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
             self.event_manager.run_callback("ActionReceived", e)
         else:
-            self.log.info(u"[{} {}] {}".format(
-                user.split("!", 1)[0], message[0], message[1] or ""
-            ))
+            self.log.info(u"[%s %s] %s", user.split("!", 1)[0], message[0],
+                          message[1] or "")
 
         if not event.cancelled:
             # Call super() to handle specific commands appropriately
@@ -472,7 +478,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     def userJoined(self, user, channel):
         """ Called when someone else joins a channel we're in. """
-        self.log.info(_("%s joined %s") % (user.nickname, channel))
+        self.log.info(_("%s joined %s"), user.nickname, channel)
         # Note: User tracking is done in irc_JOIN rather than here
 
         event = irc_events.UserJoinedEvent(self, channel, user)
@@ -480,7 +486,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     def userLeft(self, user, channel):
         """ Called when someone else leaves a channel we're in. """
-        self.log.info(_("%s parted %s") % (user, channel))
+        self.log.info(_("%s parted %s"), user, channel)
         chan_obj = self.get_channel(channel)
         user_obj = self.get_user(nickname=user)
         # User-tracking stuff
@@ -491,8 +497,8 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     def userKicked(self, kickee, channel, kicker, message):
         """ Called when someone else is kicked from a channel we're in. """
-        self.log.info(_("%s was kicked from %s by %s: %s") % (
-            kickee, channel, kicker, message))
+        self.log.info(_("%s was kicked from %s by %s: %s"),
+                      kickee, channel, kicker, message)
         kickee_obj = self.get_user(nickname=kickee)
         kicker_obj = self.get_user(nickname=kicker)
         channel_obj = self.get_channel(channel)
@@ -509,7 +515,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
     def irc_QUIT(self, user, params):
         """ Called when someone else quits IRC. """
         quitmessage = params[0]
-        self.log.info(_("%s has left IRC: %s") % (user, quitmessage))
+        self.log.info(_("%s has left IRC: %s"), user, quitmessage)
         # User-tracking stuff
         user_obj = self.get_user(fullname=user)
         temp_chans = set(user_obj.channels)
@@ -540,17 +546,18 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         method should be placed elsewhere and call user/channelModeChanged()
         instead.
         """
-        self.log.info(_("%s sets mode %s: %s%s %s") % (
+        self.log.info(
+            _("%s sets mode %s: %s%s %s"),
             user, channel, "+" if action else "-", modes,
             " ".join([str(x) for x in args if x is not None])
-        ))
+        )
 
         # Get user/channel objects
         try:
             user_obj = self._get_user_from_user_string(user)
         except Exception:
             # Mode change from the server itself and things
-            self.log.trace(_("Mode change from irregular user: %s") % user)
+            self.log.trace(_("Mode change from irregular user: %s"), user)
             user_obj = User(self, nickname=user, is_tracked=False)
             # Note: Unlike in privmsg/notice/ctcpQuery, channel_obj = None when
         # the target is ourself, rather than a user object. Perhaps this should
@@ -577,8 +584,8 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
                         user_obj.remove_rank_in_channel(channel, rank)
                 else:
                     self.log.warning(
-                        _("Rank mode %s set on invalid user %s in channel %s")
-                        % (modes[x], args[x], channel))
+                        _("Rank mode %s set on invalid user %s in channel %s"),
+                        modes[x], args[x], channel)
             else:
                 # Other channel mode
                 if action:
@@ -594,7 +601,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         """ Called when the topic is updated in a channel -
         also called when we join a channel. """
         self.log.info(
-            _("Topic for %s: %s (set by %s)") % (channel, newTopic, user)
+            _("Topic for %s: %s (set by %s)"), channel, newTopic, user
         )
 
         user_obj = self.get_user(nickname=user) or User(self, nickname=user,
@@ -668,7 +675,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             user_obj = User(self, newnick, is_tracked=False)
         user_obj.nickname = newnick
 
-        self.log.info(_("%s is now known as %s") % (oldnick, newnick))
+        self.log.info(_("%s is now known as %s"), oldnick, newnick)
 
         event = general_events.NameChanged(self, user_obj, oldnick)
         self.event_manager.run_callback("NameChanged", event)
@@ -712,7 +719,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         self.sendLine("AUTHENTICATE %s" % sasl)
 
     def irc_CAP(self, prefix, params):
-        self.log.debug("Capability message: %s / %s" % (prefix, params))
+        self.log.debug("Capability message: %s / %s", prefix, params)
 
         if (
             len(params) < 2 or
@@ -811,7 +818,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
     def irc_RPL_ISUPPORT(self, prefix, params):
         irc.IRCClient.irc_RPL_ISUPPORT(self, prefix, params)
         for param in params[1:-1]:
-            self.log.trace(_("RPL_ISUPPORT received: %s") % param)
+            self.log.trace(_("RPL_ISUPPORT received: %s"), param)
             prm = param.split("=")[0].strip("-")
             # prm is the param changed - don't bother parsing the value since
             # it can be grabbed from self.supported with this:
@@ -888,7 +895,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         elif command == "ERR_INVITEONLYCHAN":
             channel = params[1]
             self.log.warn(
-                _("Unable to join %s - Channel is invite-only") % channel)
+                _("Unable to join %s - Channel is invite-only"), channel)
 
             event = irc_events.InviteOnlyChannelErrorEvent(self,
                                                            Channel(self,
@@ -897,11 +904,11 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
         elif command == "ERR_ALREADYREGISTRED":
             message = params[1]
-            self.log.warn("Already registered: %s" % message)
+            self.log.warn("Already registered: %s", message)
 
         elif str(command) == "972" or str(command) == "ERR_UNKNOWNCOMMAND":
-            self.log.warn(_("Cannot do command '%s': %s") % (params[1],
-                                                             params[2]))
+            self.log.warn(_("Cannot do command '%s': %s"), params[1],
+                          params[2])
             # Called when some command we attempted can't be done.
 
             event = irc_events.CannotDoCommandErrorEvent(self, params[1],
@@ -910,14 +917,10 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
         elif str(command) == "333":  # Channel creation details
             ___, channel, creator, when = params
-            self.log.info(_("%s created by %s (%s)") %
-                          (channel, creator,
-                           time.strftime(
-                               "%a, %d %b %Y %H:%M:%S",
-                               time.localtime(
-                                   float(when)
-                               ))
-                           ))
+            self.log.info(_("%s created by %s (%s)"),
+                          channel, creator,
+                          time.strftime("%a, %d %b %Y %H:%M:%S",
+                                        time.localtime(float(when))))
             chan_obj = self.get_channel(channel)
             user_obj = self.get_user(nickname=creator) \
                 or User(self, nickname=creator, is_tracked=False)
@@ -944,7 +947,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
                 self.event_manager.run_callback("IRC/GLOBALUSERS", event)
 
         elif str(command) == "396":  # VHOST was set
-            self.log.info(_("VHOST set to %s by %s") % (params[1], prefix))
+            self.log.info(_("VHOST set to %s by %s"), params[1], prefix)
 
             event = irc_events.VHOSTSetEvent(self, params[1], prefix)
             self.event_manager.run_callback("IRC/VHOSTSet", event)
@@ -960,18 +963,18 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
                 user = User(self, *mask, is_tracked=False)
             channel = params[1]
 
-            self.log.info(_("Invited to %s by %s.") % (channel, user.nickname))
+            self.log.info(_("Invited to %s by %s."), channel, user.nickname)
 
             event = irc_events.InvitedEvent(self, user, channel,
                                             self.invite_join)
             self.event_manager.run_callback("IRC/Invited", event)
             if self.invite_join:
-                self.log.info(_("Automatically joining %s..") % channel)
+                self.log.info(_("Automatically joining %s.."), channel)
                 self.join_channel(params[1])
 
         else:
             self.log.debug(
-                "Unhandled: %s | %s | %s" % (prefix, command, params))
+                "Unhandled: %s | %s | %s", prefix, command, params)
             event = irc_events.UnhandledMessageEvent(self, prefix, command,
                                                      params)
             self.event_manager.run_callback("IRC/UnhandledMessage", event)
@@ -997,7 +1000,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             if not rank:
                 return []
 
-            self.log.debug("Rank for {}: {}".format(user, rank))
+            self.log.debug("Rank for %s: %s", user, rank)
             return ["{}-{}".format(self.TYPE, rank.symbol)]
 
         return []
@@ -1107,8 +1110,8 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
                 # themselves if they really need, or we can add stuff if a
                 # proper use/specification is given.
                 self.log.debug(
-                    _("Unexpected status in WHO response for user %s: %s") %
-                    (user, s))
+                    _("Unexpected status in WHO response for user %s: %s"),
+                    user, s)
         user.realname = gecos.split(" ")[-1]
 
     def user_channel_part(self, user, channel):
@@ -1126,7 +1129,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
     def user_check_lost_track(self, user):
         """User-tracking related"""
         if len(user.channels) == 0:
-            self.log.trace(_("Lost track of user: %s") % user)
+            self.log.trace(_("Lost track of user: %s"), user)
             self._users.remove(user)
             user.is_tracked = False
             # TODO: Throw event: lost track of user
@@ -1145,6 +1148,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
     #   - get_user() and get_users()                                      #
     #######################################################################
 
+    @reactor_thread
     def send_msg(self, target, message, target_type=None, use_event=True):
         if isinstance(target, str):
             if self.utils.is_channel(target):
@@ -1165,6 +1169,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             return False
         return True
 
+    @reactor_thread
     def send_action(self, target, message, target_type=None, use_event=True):
         if isinstance(target, str):
             if self.utils.is_channel(target):
@@ -1187,6 +1192,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             return False
         return False
 
+    @reactor_thread
     def send_raw(self, message):
         if "\n" in message:
             messages = message.replace("\r", "").split("\n")
@@ -1218,6 +1224,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
     part = leave
 
+    @reactor_thread
     def invite(self, user, channel):
         """
         Attempt to invite user to channel
@@ -1231,6 +1238,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         """
         self.sendLine(u"INVITE %s %s" % (user, channel))
 
+    @reactor_thread
     def topic(self, channel, topic=None):
         """
         Attempt to set the topic of the given channel, or ask what it is.
@@ -1262,6 +1270,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         # removed if we ever get around to removing that dependency.
         self.send_msg(channel, message)
 
+    @reactor_thread
     def channel_ban(self, user, channel=None, reason=None, force=False):
         # TODO: Event?
         # TODO: Ban types
@@ -1277,6 +1286,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         self.channel_kick(user, channel, reason, force)
         return True
 
+    @reactor_thread
     def channel_kick(self, user, channel=None, reason=None, force=False):
         # TODO: Event?
         if not force:
@@ -1293,6 +1303,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             self.sendLine(u"KICK %s %s" % (channel, user))
         return True
 
+    @reactor_thread
     def global_ban(self, user, reason=None, force=False, duration="1d"):
         if reason is None:
             reason = "Automated ban"
@@ -1306,6 +1317,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             return True
         return False
 
+    @reactor_thread
     def global_kick(self, user, reason=None, force=False):
         if force or self.ourselves.is_oper:
             # TODO: Event?
@@ -1316,6 +1328,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             return True
         return False
 
+    @reactor_thread
     def join_channel(self, channel, password=None):
         if password:
             self.sendLine(u"JOIN %s %s" % (channel, password))
@@ -1323,6 +1336,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             self.sendLine(u"JOIN %s" % (channel,))
         return True
 
+    @reactor_thread
     def leave_channel(self, channel, reason=None):
         if reason:
             self.sendLine(u"PART %s :%s" % (channel, reason))
@@ -1330,6 +1344,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             self.sendLine(u"PART %s" % (channel,))
         return True
 
+    @reactor_thread
     def send_notice(self, target, message, use_event=True):
         if not message:
             message = " "
@@ -1341,9 +1356,9 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             msg = to_unicode(event.message)
 
             if event.printable:
-                self.log.info("-> -%s- %s" % (target, msg))
+                self.log.info("-> -%s- %s", target, msg)
         else:
-            self.log.info("-> -%s- %s" % (target, msg))
+            self.log.info("-> -%s- %s", target, msg)
 
         if isinstance(target, User):
             target = to_unicode(target.nickname)
@@ -1352,6 +1367,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
         self.sendLine(u"NOTICE %s :%s" % (target, msg))
 
+    @reactor_thread
     def send_notice_no_event(self, target, message):
         """
         Sends a notice without printing it or firing an event.
@@ -1366,6 +1382,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
         self.sendLine(u"NOTICE %s :%s" % (target, msg))
 
+    @reactor_thread
     def send_privmsg(self, target, message, use_event=True):
         if not message:
             message = " "
@@ -1377,9 +1394,9 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
             msg = to_unicode(event.message)
 
             if event.printable:
-                self.log.info("-> *%s* %s" % (target, msg))
+                self.log.info("-> *%s* %s", target, msg)
         else:
-            self.log.info("-> *%s* %s" % (target, msg))
+            self.log.info("-> *%s* %s", target, msg)
 
         if isinstance(target, User):
             target = to_unicode(target.nickname)
@@ -1388,6 +1405,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
         self.sendLine(u"PRIVMSG %s :%s" % (target, msg))
 
+    @reactor_thread
     def send_privmsg_no_event(self, target, message):
         """
         Sends a privmsg without printing it or firing an event.
@@ -1402,6 +1420,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
 
         self.sendLine(u"PRIVMSG %s :%s" % (target, msg))
 
+    @reactor_thread
     def send_ctcp(self, target, command, args=None):
         if isinstance(target, User):
             target = to_unicode(target.nickname)
@@ -1414,6 +1433,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         self.send_privmsg_no_event(target, constants.CTCP + message +
                                    constants.CTCP)
 
+    @reactor_thread
     def send_ctcp_reply(self, target, command, args=None):
         if isinstance(target, User):
             target = to_unicode(target.nickname)
@@ -1426,6 +1446,7 @@ class Protocol(irc.IRCClient, ChannelsProtocol):
         self.send_notice_no_event(target, constants.CTCP + message +
                                   constants.CTCP)
 
+    @reactor_thread
     def send_who(self, mask, operators_only=False):
         query = u"WHO %s" % mask
         if operators_only:
@@ -9,6 +9,8 @@ _ = Translations().get()
 
 
 class User(user.User):
+    __slots__ = ["ident", "host", "realname", "is_oper", "channels", "_ranks"]
+
     def __init__(self, protocol, nickname, ident=None, host=None,
                  realname=None, is_oper=False, is_tracked=False):
         super(User, self).__init__(nickname, protocol, is_tracked)
@@ -38,8 +40,8 @@ class User(user.User):
         except KeyError:
             self.protocol.log.debug(
                 _("Tried to remove non-existent channel \"%s\" from user "
-                  "\"%s\"")
-                % (channel, self))
+                  "\"%s\""),
+                channel, self)
 
     def get_ranks_in_channel(self, channel):
         if isinstance(channel, Channel):
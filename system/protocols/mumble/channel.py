@@ -8,6 +8,8 @@ _ = Translations().get()
 
 
 class Channel(channel.Channel):
+    __slots__ = ["channel_id", "parent", "position", "links"]
+
     def __init__(self, protocol, channel_id, name, parent, position, links):
         super(Channel, self).__init__(name, protocol)
         self.channel_id = channel_id
@@ -37,8 +39,8 @@ class Channel(channel.Channel):
             # According to PEP8, this is easier to read on two lines <_<
             self.protocol.log.debug(
                 _("Tried to remove non-existent user \"%s\" from channel "
-                  "\"%s\"")
-                % (user, self))
+                  "\"%s\""),
+                user, self)
 
     def respond(self, message):
         self.protocol.send_msg(self, message, target_type="channel")
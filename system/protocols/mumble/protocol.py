@@ -8,6 +8,8 @@ from twisted.internet import reactor, ssl, task
 
 from system.commands.manager import CommandManager
 
+from system.decorators.threads import reactor_thread
+
 from system.enums import CommandState
 
 from system.events.manager import EventManager
@@ -112,6 +114,7 @@ class Protocol(SingleChannelProtocol):
 
         self.received = ""
         self.log = getLogger(self.name)
+        self.log.extra["protocol"] = self.name
         self.log.info("Setting up..")
 
         self.command_manager = CommandManager()
@@ -276,8 +279,8 @@ class Protocol(SingleChannelProtocol):
 
             full_length = Protocol.PREFIX_LENGTH + length
 
-            self.log.trace("Length: %d" % length)
-            self.log.trace("Message type: %d" % msg_type)
+            self.log.trace("Length: %d", length)
+            self.log.trace("Message type: %d", msg_type)
 
             # Check if this this a valid message ID
             if msg_type not in Protocol.MESSAGE_ID.values():
@@ -328,13 +331,13 @@ class Protocol(SingleChannelProtocol):
     def recvProtobuf(self, msg_type, message):
         if isinstance(message, Mumble_pb2.Version):
             # version, release, os, os_version
-            self.log.info(_("Connected to Murmur v%s") % message.release)
+            self.log.info(_("Connected to Murmur v%s"), message.release)
             event = general_events.PostSetupEvent(self, self.config)
             self.event_manager.run_callback("PostSetup", event)
         elif isinstance(message, Mumble_pb2.Reject):
             # version, release, os, os_version
-            self.log.info(_("Could not connect to server: %s - %s") %
-                          (message.type, message.reason))
+            self.log.info(_("Could not connect to server: %s - %s"),
+                          message.type, message.reason)
 
             self.transport.loseConnection()
             self.pinging = False
@@ -366,10 +369,10 @@ class Protocol(SingleChannelProtocol):
             flush = message.flush
             self.set_permissions(channel, permissions, flush)
             self.log.trace("PermissionQuery received: channel: '%s', "
-                           "permissions: '%s', flush:'%s'" %
-                           (channel,
-                            Perms.get_permissions_names(permissions),
-                            flush))
+                           "permissions: '%s', flush:'%s'",
+                           channel,
+                           Perms.get_permissions_names(permissions),
+                           flush)
             event = mumble_events.PermissionsQuery(self, channel, permissions,
                                                    flush)
             self.event_manager.run_callback("Mumble/PermissionsQuery", event)
@@ -389,9 +392,9 @@ class Protocol(SingleChannelProtocol):
             welcome_text = html_to_text(message.welcome_text, True)
             self.log.info(_("===   Welcome message   ==="))
             self.log.trace("ServerSync received: max_bandwidth: '%s', "
-                           "permissions: '%s', welcome text: [below]" %
-                           (max_bandwidth,
-                            Perms.get_permissions_names(permissions)))
+                           "permissions: '%s', welcome text: [below]",
+                           max_bandwidth,
+                           Perms.get_permissions_names(permissions))
             for line in welcome_text.split("\n"):
                 self.log.info(line)
             self.log.info(_("=== End welcome message ==="))
@@ -444,7 +447,7 @@ class Protocol(SingleChannelProtocol):
             if message.session in self.users:
                 user = self.users[message.session]
                 user.is_tracked = False
-                self.log.info(_("User left: %s") %
+                self.log.info(_("User left: %s"),
                               user)
                 user.channel.remove_user(user)
                 del self.users[message.session]
@@ -465,9 +468,9 @@ class Protocol(SingleChannelProtocol):
         elif isinstance(message, Mumble_pb2.UserStats):
             self.handle_msg_userstats(message)
         else:
-            self.log.trace(_("Unknown message type: %s") % message.__class__)
-            self.log.trace(_("Received message '%s' (%d):\n%s")
-                           % (message.__class__, msg_type, str(message)))
+            self.log.trace(_("Unknown message type: %s"), message.__class__)
+            self.log.trace(_("Received message '%s' (%d):\n%s"),
+                           message.__class__, msg_type, message)
 
             event = mumble_events.Unknown(self, type(message), message)
             self.event_manager.run_callback("Mumble/Unknown", event)
@@ -547,22 +550,22 @@ class Protocol(SingleChannelProtocol):
             if message.links:
                 links = list(message.links)
                 for link in links:
-                    self.log.debug(_("Channel link: %s to %s") %
-                                   (self.channels[link],
-                                    self.channels[message.channel_id]))
+                    self.log.debug(_("Channel link: %s to %s"),
+                                   self.channels[link],
+                                   self.channels[message.channel_id])
             self.channels[message.channel_id] = Channel(self,
                                                         message.channel_id,
                                                         message.name,
                                                         parent,
                                                         message.position,
                                                         links)
-            self.log.info(_("New channel: %s") % message.name)
+            self.log.info(_("New channel: %s"), message.name)
         if message.links_add:
             for link in message.links_add:
                 self.channels[message.channel_id].add_link(link)
-                self.log.info(_("Channel link added: %s to %s") %
-                              (self.channels[link],
-                               self.channels[message.channel_id]))
+                self.log.info(_("Channel link added: %s to %s"),
+                              self.channels[link],
+                              self.channels[message.channel_id])
 
                 # TOTALLY MORE READABLE
                 # GOOD JOB PEP8
@@ -573,9 +576,9 @@ class Protocol(SingleChannelProtocol):
         if message.links_remove:
             for link in message.links_remove:
                 self.channels[message.channel_id].remove_link(link)
-                self.log.info(_("Channel link removed: %s from %s") %
-                              (self.channels[link],
-                               self.channels[message.channel_id]))
+                self.log.info(_("Channel link removed: %s from %s"),
+                              self.channels[link],
+                              self.channels[message.channel_id])
 
                 # Jesus fuck.
                 event = mumble_events.ChannelUnlinked(self, self.channels
@@ -624,7 +627,7 @@ class Protocol(SingleChannelProtocol):
             if message.HasField("hash"):
                 user.certificate_hash = message.hash
 
-            self.log.info(_("User joined: %s") % message.name)
+            self.log.info(_("User joined: %s"), message.name)
 
             # We can't just flow into the next section to deal with this, as
             # that would count as a channel change, and it doesn't always work
@@ -654,14 +657,14 @@ class Protocol(SingleChannelProtocol):
                         if cid in self.channels:
                             self.join_channel(self.channels[cid])
                         else:
-                            self.log.warning(_("No channel with id '%s'") %
+                            self.log.warning(_("No channel with id '%s'"),
                                              cid)
                     elif "name" in conf and conf["name"]:
                         chan = self.get_channel(conf["name"])
                         if chan is not None:
                             self.join_channel(chan)
                         else:
-                            self.log.warning(_("No channel with name '%s'") %
+                            self.log.warning(_("No channel with name '%s'"),
                                              conf["name"])
                     else:
                         self.log.warning(_("No channel found in config"))
@@ -681,11 +684,11 @@ class Protocol(SingleChannelProtocol):
             else:
                 actor = None
             if message.HasField('channel_id'):
-                self.log.info(_("User moved channel: %s from %s to %s by %s") %
-                              (user,
-                               user.channel,
-                               self.channels[message.channel_id],
-                               actor))
+                self.log.info(_("User moved channel: %s from %s to %s by %s"),
+                              user,
+                              user.channel,
+                              self.channels[message.channel_id],
+                              actor)
                 old = self.channels[user.channel.channel_id]
                 user.channel.remove_user(user)
                 self.channels[message.channel_id].add_user(user)
@@ -695,11 +698,11 @@ class Protocol(SingleChannelProtocol):
                 self.event_manager.run_callback("Mumble/UserMoved", event)
             if message.HasField('mute'):
                 if message.mute:
-                    self.log.info(_("User was muted: %s by %s")
-                                  % (user, actor))
+                    self.log.info(_("User was muted: %s by %s"),
+                                  user, actor)
                 else:
-                    self.log.info(_("User was unmuted: %s by %s")
-                                  % (user, actor))
+                    self.log.info(_("User was unmuted: %s by %s"),
+                                  user, actor)
                 user.mute = message.mute
 
                 event = mumble_events.UserMuteToggle(self, user, user.mute,
@@ -707,11 +710,11 @@ class Protocol(SingleChannelProtocol):
                 self.event_manager.run_callback("Mumble/UserMuteToggle", event)
             if message.HasField('deaf'):
                 if message.deaf:
-                    self.log.info(_("User was deafened: %s by %s") % (user,
-                                                                      actor))
+                    self.log.info(_("User was deafened: %s by %s"),
+                                  user, actor)
                 else:
-                    self.log.info(_("User was undeafened: %s by %s") % (user,
-                                                                        actor))
+                    self.log.info(_("User was undeafened: %s by %s"),
+                                  user, actor)
                 user.deaf = message.deaf
 
                 event = mumble_events.UserDeafToggle(self, user, user.deaf,
@@ -719,9 +722,9 @@ class Protocol(SingleChannelProtocol):
                 self.event_manager.run_callback("Mumble/UserDeafToggle", event)
             if message.HasField('suppress'):
                 if message.suppress:
-                    self.log.info(_("User was suppressed: %s") % user)
+                    self.log.info(_("User was suppressed: %s"), user)
                 else:
-                    self.log.info(_("User was unsuppressed: %s") % user)
+                    self.log.info(_("User was unsuppressed: %s"), user)
                 user.suppress = message.suppress
 
                 event = mumble_events.UserSuppressionToggle(self, user,
@@ -730,9 +733,9 @@ class Protocol(SingleChannelProtocol):
                                                 event)
             if message.HasField('self_mute'):
                 if message.self_mute:
-                    self.log.info(_("User muted themselves: %s") % user)
+                    self.log.info(_("User muted themselves: %s"), user)
                 else:
-                    self.log.info(_("User unmuted themselves: %s") % user)
+                    self.log.info(_("User unmuted themselves: %s"), user)
                 user.self_mute = message.self_mute
 
                 event = mumble_events.UserSelfMuteToggle(self, user,
@@ -741,9 +744,9 @@ class Protocol(SingleChannelProtocol):
                                                 event)
             if message.HasField('self_deaf'):
                 if message.self_deaf:
-                    self.log.info(_("User deafened themselves: %s") % user)
+                    self.log.info(_("User deafened themselves: %s"), user)
                 else:
-                    self.log.info(_("User undeafened themselves: %s") % user)
+                    self.log.info(_("User undeafened themselves: %s"), user)
                 user.self_deaf = message.self_deaf
 
                 event = mumble_events.UserSelfDeafToggle(self, user,
@@ -753,12 +756,12 @@ class Protocol(SingleChannelProtocol):
             if message.HasField('priority_speaker'):
                 if message.priority_speaker:
                     self.log.info(_("User was given priority speaker: %s by "
-                                    "%s")
-                                  % (user, actor))
+                                    "%s"),
+                                  user, actor)
                 else:
                     self.log.info(_("User was revoked priority speaker: %s by "
-                                    "%s")
-                                  % (user, actor))
+                                    "%s"),
+                                  user, actor)
                 state = user.priority_speaker = message.priority_speaker
 
                 event = mumble_events.UserPrioritySpeakerToggle(self, user,
@@ -767,9 +770,9 @@ class Protocol(SingleChannelProtocol):
                                                 "Toggle", event)
             if message.HasField('recording'):
                 if message.recording:
-                    self.log.info(_("User started recording: %s") % user)
+                    self.log.info(_("User started recording: %s"), user)
                 else:
-                    self.log.info(_("User stopped recording: %s") % user)
+                    self.log.info(_("User stopped recording: %s"), user)
                 user.recording = message.recording
 
                 event = mumble_events.UserRecordingToggle(self, user,
@@ -798,13 +801,13 @@ class Protocol(SingleChannelProtocol):
                 old_user_id = user.user_id
                 user.user_id = user_id
                 if user_id >= 0:
-                    self.log.info("User was registered: {} by {}",
+                    self.log.info("User was registered: %s (%s) by %s",
                                   user, user_id, actor)
                     event = mumble_events.UserRegistered(self, user,
                                                          user_id, actor)
                     event_type = "Mumble/UserRegistered"
                 else:
-                    self.log.info("User was unregistered: {} by {}",
+                    self.log.info("User was unregistered: %s (%s) by %s",
                                   user, user_id, actor)
                     event = mumble_events.UserUnregistered(self, user,
                                                            old_user_id, actor)
@@ -833,7 +836,7 @@ class Protocol(SingleChannelProtocol):
             self.event_manager.run_callback("PreMessageReceived", event)
             if event.printable:
                 for line in event.message.split("\n"):
-                    self.log.info("<%s> %s" % (user_obj, line))
+                    self.log.info("<%s> %s", user_obj, line)
 
             if not event.cancelled:
                 result = self.command_manager.process_input(
@@ -862,12 +865,17 @@ class Protocol(SingleChannelProtocol):
                     if case(CommandState.NoPermission):
                         self.log.debug("No permission to run command")
                         return  # It was a command
+                    if case(CommandState.Deferred):
+                        self.log.debug("Command running in a worker thread")
+                        result[1].addCallback(self.deferred_command_done,
+                                              user_obj)
+                        return  # It was a command
                     if case(CommandState.Error):
                         user_obj.respond("Error running command: %s"
                                          % result[1])
                         return  # It was a command
                     if default:
-                        self.log.debug("Unknown command state: %s" % result[0])
+                        self.log.debug("Unknown command state: %s", result[0])
                         break
 
                 second_event = general_events.MessageReceived(
@@ -957,6 +965,7 @@ class Protocol(SingleChannelProtocol):
         event = mumble_events.UserStats(self, user)
         self.event_manager.run_callback("Mumble/UserStats", event)
 
+    @reactor_thread
     def send_msg(self, target, message, target_type=None, use_event=True):
         if isinstance(target, int) or isinstance(target, str):
             if target_type == "user":
@@ -980,6 +989,7 @@ class Protocol(SingleChannelProtocol):
 
         return False
 
+    @reactor_thread
     def send_action(self, target, message, target_type=None, use_event=True):
         if isinstance(target, int) or isinstance(target, str):
             if target_type == "user":
@@ -1009,9 +1019,10 @@ class Protocol(SingleChannelProtocol):
             return True
         return False
 
+    @reactor_thread
     def channel_kick(self, user, channel=None, reason=None, force=False):
         # TODO: Event?
-        self.log.debug("Attempting to kick '%s' for '%s'" % (user, reason))
+        self.log.debug("Attempting to kick '%s' for '%s'", user, reason)
         if not isinstance(user, User):
             user = self.get_user(user)
             if user is None:
@@ -1028,9 +1039,10 @@ class Protocol(SingleChannelProtocol):
 
         self.sendProtobuf(msg)
 
+    @reactor_thread
     def channel_ban(self, user, channel=None, reason=None, force=False):
         # TODO: Event?
-        self.log.debug("Attempting to ban '%s' for '%s'" % (user, reason))
+        self.log.debug("Attempting to ban '%s' for '%s'", user, reason)
         if not isinstance(user, User):
             user = self.get_user(user)
             if user is None:
@@ -1056,11 +1068,12 @@ class Protocol(SingleChannelProtocol):
         # TODO: Event?
         return False
 
+    @reactor_thread
     def msg(self, message, target="channel", target_id=None):
         if target_id is None and target == "channel":
             target_id = self.ourselves.channel.channel_id
 
-        self.log.trace(_("Sending text message: %s") % message)
+        self.log.trace(_("Sending text message: %s"), message)
 
         if self.use_cgi:
             message = cgi.escape(message)
@@ -1074,6 +1087,7 @@ class Protocol(SingleChannelProtocol):
 
         self.sendProtobuf(msg)
 
+    @reactor_thread
     def msg_channel(self, message, channel, use_event=True):
         if isinstance(channel, Channel):
             channel = channel.channel_id
@@ -1085,10 +1099,11 @@ class Protocol(SingleChannelProtocol):
 
             message = event.message
 
-        self.log.info("-> *%s* %s" % (self.channels[channel], message))
+        self.log.info("-> *%s* %s", self.channels[channel], message)
 
         self.msg(message, "channel", channel)
 
+    @reactor_thread
     def msg_user(self, message, user, use_event=True):
         if isinstance(user, User):
             user = user.session
@@ -1100,10 +1115,11 @@ class Protocol(SingleChannelProtocol):
 
             message = event.message
 
-        self.log.info("-> (%s) %s" % (self.users[user], message))
+        self.log.info("-> (%s) %s", self.users[user], message)
 
         self.msg(message, "user", user)
 
+    @reactor_thread
     def join_channel(self, channel, password=None):
         if isinstance(channel, str) or isinstance(channel, unicode):
             channel = self.get_channel(channel)
@@ -1119,9 +1135,10 @@ class Protocol(SingleChannelProtocol):
     def leave_channel(self, channel=None, reason=None):
         return False
 
+    @reactor_thread
     def request_userstats(self, user, stats_only=False):
         self.log.debug(
-            "Requesting UserStats for {}, stats_only={}", user, stats_only
+            "Requesting UserStats for %s, stats_only=%s", user, stats_only
         )
         user_stats = Mumble_pb2.UserStats()
         user_stats.session = user.session
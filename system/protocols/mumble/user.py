@@ -8,6 +8,16 @@ from system.protocols.generic import user
 
 
 class User(user.User):
+    __slots__ = [
+        "session", "channel", "mute", "deaf", "suppress", "self_mute",
+        "self_deaf", "priority_speaker", "recording", "comment",
+        "comment_hash", "avatar", "avatar_hash", "user_id", "certificate_hash",
+        "certificates", "packet_stats_from_client", "packet_stats_from_server",
+        "udp_packets_sent", "tcp_packets_sent", "udp_ping_avg", "udp_ping_var",
+        "tcp_ping_avg", "tcp_ping_var", "version", "celt_versions", "address",
+        "bandwidth", "online_time", "idle_time", "strong_certificate", "opus"
+    ]
+
     def __init__(self, protocol, session, name, channel, mute, deaf,
                  suppress, self_mute, self_deaf, priority_speaker, recording):
         # Mumble is always "tracked"
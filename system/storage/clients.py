@@ -0,0 +1,288 @@
+# coding=utf-8
+
+"""
+Shared clients for the database-backed data objects.
+
+Every Redis or MongoDB data object used to make its own client, and so its
+own connection pool - ten plugins using the same Redis server meant ten
+pools. Instead, data objects get their clients from the registry here, which
+hands out the same client to everything that connects with the same
+parameters, and closes it once the last of them has been released. ::
+
+    registry = ClientRegistry()
+
+    key, client = registry.acquire("redis", host="localhost")
+    # ...
+    registry.release(key)
+
+The size of each client's connection pool can be set in the registry, and
+`get_stats` tells you how many connections each client has open.
+
+The registry also has a worker pool for running client operations away from
+the reactor - see system.storage.deferred.
+"""
+
+import pymongo
+import redis
+import threading
+
+from system.enums import OverflowPolicy
+from system.logging.logger import getLogger
+from system.singleton import Singleton
+from system.translations import Translations
+from system.workers import WorkerPool
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+#: Keyword arguments that might contain passwords, so aren't shown in stats
+SECRET_KWARGS = ["password", "url"]
+
+
+def _make_redis(pool_size, *args, **kwargs):
+    url = kwargs.pop("url", None)
+    kwargs.setdefault("max_connections", pool_size)
+
+    if url:
+        return redis.StrictRedis.from_url(url, *args, **kwargs)
+    return redis.StrictRedis(*args, **kwargs)
+
+
+def _make_mongo(pool_size, *args, **kwargs):
+    url = kwargs.pop("url", None)
+    kwargs.setdefault("maxPoolSize", pool_size)
+
+    return pymongo.MongoClient(url, *args, **kwargs)
+
+
+def _close_redis(client):
+    client.connection_pool.disconnect()
+
+
+def _close_mongo(client):
+    client.close()
+
+
+def _count_redis(client):
+    # This is how many connections the pool has made and not yet dropped
+    return client.connection_pool._created_connections
+
+
+def _count_mongo(client):
+    # PyMongo doesn't give us this publicly
+    servers = client._topology._servers.values()
+    return sum(len(server.pool.sockets) + server.pool.active_sockets
+               for server in servers)
+
+
+class ClientRegistry(object):
+    """
+    Registry of shared database clients, keyed by their type and connection
+    parameters.
+    """
+
+    __metaclass__ = Singleton
+
+    #: Functions making, closing and counting the connections of each type
+    #: of client
+    kinds = {
+        "redis": (_make_redis, _close_redis, _count_redis),
+        "mongo": (_make_mongo, _close_mongo, _count_mongo)
+    }
+
+    #: Default connection pool size for each type of client, used unless
+    #: the connection parameters say otherwise
+    pool_sizes = {
+        "redis": 10,
+        "mongo": 10
+    }
+
+    #: WorkerPool that client operations are run in, for the Deferred API
+    pool = None
+
+    def __init__(self):
+        self.logger = getLogger("Storage")
+
+        self.clients = {}  # Key: [client, references, description]
+        self.created = 0
+        self.reused = 0
+
+        self._lock = threading.Lock()
+
+    def setup_pool(self, size=5, queue_size=100,
+                   overflow=OverflowPolicy.Reject):
+        """
+        Set up the worker pool that client operations are run in, when
+        they're run through the Deferred API.
+
+        Each thread may use a connection from each client's connection pool,
+        so keep this no bigger than the pool sizes.
+
+        :param size: How many worker threads to run
+        :param queue_size: How many operations may be waiting to run before
+            the overflow policy is used
+        :param overflow: What to do when the queue is full
+
+        :type size: int
+        :type queue_size: int
+        :type overflow: OverflowPolicy, str
+        """
+
+        self.stop_pool()
+        self.pool = WorkerPool("Clients", size, queue_size, overflow)
+
+    def stop_pool(self):
+        """
+        Stop the worker pool, once it's run the operations that are already
+        queued.
+        """
+
+        if self.pool is None:
+            return
+
+        pool, self.pool = self.pool, None
+        pool.stop()
+
+    def get_pool(self):
+        """
+        Get the worker pool that client operations are run in, setting up a
+        default one if `setup_pool` hasn't been called.
+
+        :rtype: WorkerPool
+        """
+
+        if self.pool is None:
+            self.setup_pool()
+
+        return self.pool
+
+    def make_key(self, kind, *args, **kwargs):
+        """
+        Get the key that a client would be stored under.
+
+        :param kind: The type of client - "redis" or "mongo"
+        :param args: The client's connection arguments
+        :param kwargs: The client's connection keyword arguments
+
+        :rtype: tuple
+        """
+
+        return (
+            kind, repr(args),
+            repr(sorted(kwargs.items()))
+        )
+
+    def acquire(self, kind, *args, **kwargs):
+        """
+        Get a client, making it if nothing else is using one with the same
+        connection parameters. Remember to `release` it when you're done.
+
+        :param kind: The type of client - "redis" or "mongo"
+        :param args: The client's connection arguments
+        :param kwargs: The client's connection keyword arguments
+
+        :return: A tuple of (key, client) - you'll need the key to release
+            the client
+        :rtype: tuple
+        """
+
+        if kind not in self.kinds:
+            raise ValueError(_("Unknown client type: %s") % kind)
+
+        key = self.make_key(kind, *args, **kwargs)
+
+        with self._lock:
+            if key in self.clients:
+                entry = self.clients[key]
+                entry[1] += 1
+
+                self.reused += 1
+                return key, entry[0]
+
+            make = self.kinds[kind][0]
+            client = make(self.pool_sizes.get(kind), *args, **dict(kwargs))
+
+            description = self._describe(args, kwargs)
+
+            self.clients[key] = [client, 1, description]
+            self.created += 1
+
+            self.logger.debug(_("Created shared %s client: %s"),
+                              kind, description)
+
+            return key, client
+
+    def release(self, key):
+        """
+        Release a client that was acquired earlier. Once everything that
+        acquired it has released it, it's closed.
+
+        :param key: The key that `acquire` returned
+
+        :return: Whether the client was closed
+        :rtype: bool
+        """
+
+        with self._lock:
+            if key not in self.clients:
+                return False
+
+            entry = self.clients[key]
+            entry[1] -= 1
+
+            if entry[1] > 0:
+                return False
+
+            del self.clients[key]
+
+        close = self.kinds[key[0]][1]
+
+        try:
+            close(entry[0])
+        except Exception:
+            self.logger.exception(_("Error closing %s client: %s"),
+                                  key[0], entry[2])
+
+        return True
+
+    def get_stats(self):
+        """
+        Get some stats on the clients - how many there are, how many things
+        are using them, and how many connections they have open.
+
+        Connection counts are None when they can't be found.
+
+        :return: A list of dicts, one for each client, with "kind",
+            "params", "references" and "connections" keys
+        :rtype: list
+        """
+
+        with self._lock:
+            items = self.clients.items()
+
+        stats = []
+
+        for key, (client, references, description) in items:
+            try:
+                connections = self.kinds[key[0]][2](client)
+            except Exception:
+                connections = None
+
+            stats.append({
+                "kind": key[0],
+                "params": description,
+                "references": references,
+                "connections": connections
+            })
+
+        return stats
+
+    def _describe(self, args, kwargs):
+        # Don't show passwords in logs and stats
+        kwargs = dict(kwargs)
+
+        for name in SECRET_KWARGS:
+            if name in kwargs:
+                kwargs[name] = "***"
+
+        return "%s %s" % (args, kwargs)
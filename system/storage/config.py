@@ -172,7 +172,7 @@ class YamlConfig(Config):
         Reload configuration data from the filesystem.
         """
         if not os.path.exists(self.filename):
-            self.logger.error(_("File not found: %s") % self.filename)
+            self.logger.error(_("File not found: %s"), self.filename)
             return False
         try:
             self.fh = open(self.filename, "r")
@@ -186,8 +186,8 @@ class YamlConfig(Config):
                     try:
                         callback()
                     except Exception:
-                        self.logger.exception(_("Error running callback %s")
-                                              % callback)
+                        self.logger.exception(_("Error running callback %s"),
+                                              callback)
             return True
 
     load = reload
@@ -325,7 +325,7 @@ class JSONConfig(Config):
         Reload configuration data from the filesystem.
         """
         if not os.path.exists(self.filename):
-            self.logger.error(_("File not found: %s") % self.filename)
+            self.logger.error(_("File not found: %s"), self.filename)
             return False
         try:
             self.fh = open(self.filename, "r")
@@ -339,8 +339,8 @@ class JSONConfig(Config):
                     try:
                         callback()
                     except Exception:
-                        self.logger.exception(_("Error running callback %s")
-                                              % callback)
+                        self.logger.exception(_("Error running callback %s"),
+                                              callback)
             return True
 
     load = reload
@@ -469,8 +469,8 @@ class MemoryConfig(Config):
                 try:
                     callback()
                 except Exception:
-                    self.logger.exception(_("Error running callback %s")
-                                          % callback)
+                    self.logger.exception(_("Error running callback %s"),
+                                          callback)
         return True
 
     def read(self):
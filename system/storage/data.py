@@ -8,31 +8,72 @@ choose from, each will store data using a different format and sometimes
 method. There are, so far, three types of data storage, encapsulating a bunch
 of classes.
 
-* Key-value  (Dictionary-like)
+* Key-value  (Dictionary-like, including SQLite)
 * Relational (SQL databases)
 * Document-based (NoSQL databases)
 """
 
 __author__ = "Gareth Coles"
 
+import copy
 import datetime
 import json
 import os
 import pprint
-import pymongo
-import redis
+import sqlite3
 import yaml
 
-from threading import Lock
+from contextlib import contextmanager
+from threading import RLock
 from twisted.enterprise import adbapi
 
 from system.storage import formats
+from system.storage.clients import ClientRegistry
+from system.storage.deferred import DeferredMongo, DeferredRedis
+from system.storage.writer import FileWriter
 from system.logging.logger import getLogger
+from utils.rwlock import ReadWriteLock
 
 from system.translations import Translations
 _ = Translations().get()
 
 
+class FrozenDict(dict):
+    """
+    A dict that can't be changed, as returned by `Data.snapshot`.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(_("Snapshots can't be changed"))
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.iteritems())))
+
+    def copy(self):
+        return FrozenDict(self)
+
+
+def freeze(obj):
+    """
+    Make an unchangeable copy of some data - dicts become FrozenDicts, lists
+    become tuples, and sets become frozensets. Anything else is copied as-is.
+
+    :param obj: The data to copy
+    :return: The unchangeable copy
+    """
+
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.iteritems())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(x) for x in obj)
+    if isinstance(obj, (set, frozenset)):
+        return frozenset(freeze(x) for x in obj)
+    return copy.deepcopy(obj)
+
+
 class Data(object):
     """
     Base class for data storage objects, mostly for type-checking.
@@ -52,6 +93,12 @@ class Data(object):
     #: Whether the file exists
     exists = True
 
+    #: The ReadWriteLock for this data object, for the dict-like ones
+    lock = None
+
+    #: The current snapshot, until the data is next saved or reloaded
+    _snapshot = None
+
     @property
     def mtime(self):
         """
@@ -126,6 +173,67 @@ class Data(object):
 
         pass
 
+    def close(self):
+        """
+        Release anything this data object is holding on to, like database
+        connections, if applicable. The storage manager does this when the
+        file is released, so don't use the object after this.
+        """
+
+        pass
+
+    def flush(self):
+        """
+        Make sure that any saved changes have actually been written, if
+        applicable. Saves may be written in the background, so call this if
+        you need to be sure that your changes are on disk.
+        """
+
+        pass
+
+    @contextmanager
+    def reading(self):
+        """
+        Read from the data safely, without saving it afterwards. ::
+
+            with data.reading():
+                thing = data["x"]["y"]
+
+        Unlike the *with* macro, nothing is written to the file when the
+        block is done - so don't change anything in here, because it won't be
+        saved. Don't reload the data in here either.
+
+        Any number of threads may be reading at once, but they'll wait for
+        any *with* block that's changing the data to finish, and vice versa.
+
+        This is only supported by the dict-like data objects.
+        """
+
+        with self.lock.reading():
+            yield self
+
+    def snapshot(self):
+        """
+        Get an unchangeable copy of the data, which can be read from anywhere
+        without any locking.
+
+        The same copy is returned until the data is next saved or reloaded,
+        so this is cheap to call often - see `freeze` for what the copy is
+        made of.
+
+        This is only supported by the dict-like data objects.
+
+        :rtype: FrozenDict
+        """
+
+        snapshot = self._snapshot
+
+        if snapshot is None:
+            with self.reading():
+                snapshot = self._snapshot = freeze(self.data)
+
+        return snapshot
+
 
 class YamlData(Data):
     """
@@ -147,13 +255,24 @@ class YamlData(Data):
             # Some other stuff
         # File is now saved
 
+    If you only need to read safely, use `reading` instead - it takes the
+    same lock, but doesn't write the whole file out again afterwards. For
+    reads that don't need a lock at all, use `snapshot`. ::
+
+        with data.reading():
+            thing = data["a"]
+
+        thing = data.snapshot()["a"]
+
     This object uses dict-like access methods, including iteration, `keys`
     and `values` methods. Use it how you would a dict. Additionally, the
     following methods are supported:
 
     * Normal dict getters and setters, length, contains, and deletion methods.
-    * `save` - Force a flush to file.
-    * `load` - Force a reload from file.
+    * `save` - Save to file, soon - see system.storage.writer.
+    * `flush` - Force any saved changes to be written to file right away.
+    * `load` - Force a reload from file, forgetting about anything that
+      hasn't been written yet.
 
     Note: Data access is "jailed" - you can't load a file from outside the data
     directory.
@@ -167,10 +286,6 @@ class YamlData(Data):
 
     data = {}
 
-    mutex = Lock()
-    context_mutex = Lock()
-    _context_guarded = False
-
     format = formats.YAML
 
     @property
@@ -193,36 +308,28 @@ class YamlData(Data):
             os.makedirs(folders)
 
         self.filename = filename
+        self.lock = ReadWriteLock()
+        self.writer = FileWriter(filename, self._dump)
         self.reload(False)
 
     def reload(self, run_callbacks=True):
         """
         Load or reload data from the filesystem.
         """
-        if not self._context_guarded:
-            with self.mutex:
-                self._load()
-                if run_callbacks:
-                    for callback in self.callbacks:
-                        try:
-                            callback()
-                        except Exception:
-                            self.logger.exception(_("Error running callback "
-                                                    "%s")
-                                                  % callback)
-        else:
+        with self.lock.writing():
             self._load()
             if run_callbacks:
                 for callback in self.callbacks:
                     try:
                         callback()
                     except Exception:
-                        self.logger.exception(_("Error running callback %s")
-                                              % callback)
+                        self.logger.exception(_("Error running callback %s"),
+                                              callback)
 
     load = reload
 
     def _load(self):
+        self.writer.discard()
         if not os.path.exists(self.filename):
             open(self.filename, "w").close()
         fh = open(self.filename, "r")
@@ -230,23 +337,30 @@ class YamlData(Data):
         fh.close()
         if not self.data:
             self.data = {}
+        self._snapshot = None
 
     def save(self):
         """
         Save data to the filesystem.
+
+        The file may be written in the background, shortly afterwards - use
+        `flush` if you need it to be written right away.
         """
-        if not self._context_guarded:
-            with self.mutex:
-                self._save()
-        else:
+        with self.lock.writing():
             self._save()
+            self._snapshot = None
+
+    def flush(self):
+        self.writer.flush()
+
+    flush.__doc__ = Data.flush.__doc__
 
     def _save(self):
-        data = yaml.dump(self.data, default_flow_style=False)
-        fh = open(self.filename, "w")
-        fh.write(data)
-        fh.flush()
-        fh.close()
+        self.writer.save()
+
+    def _dump(self):
+        with self.lock.reading():
+            return yaml.dump(self.data, default_flow_style=False)
 
     def validate(self, data):
         try:
@@ -312,12 +426,13 @@ class YamlData(Data):
     get.__doc__ = data.get.__doc__
 
     def __enter__(self):
-        with self.context_mutex:
-            self._context_guarded = True
+        self.lock.acquire_write()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.save()
-        self._context_guarded = False
+        try:
+            self.save()
+        finally:
+            self.lock.release_write()
         if exc_type is None:
             return True
         return False
@@ -326,9 +441,11 @@ class YamlData(Data):
         return self.data.__getitem__(y)
 
     def __setitem__(self, key, value):
+        self._snapshot = None
         return self.data.__setitem__(key, value)
 
     def __delitem__(self, key):
+        self._snapshot = None
         return self.data.__delitem__(key)
 
     def __len__(self):
@@ -362,51 +479,35 @@ class MemoryData(Data):
     data = {}
     format = formats.MEMORY
 
-    mutex = Lock()
-    _context_guarded = True
-
     filename = ":memory:"  # So plugins can check for this easier
 
     def __init__(self, data_dict):
         self.callbacks = []
 
         self.logger = getLogger("Data")
+        self.lock = ReadWriteLock()
         self.data = data_dict
 
     def reload(self, run_callbacks=True):
         """
-        Does nothing.
+        Does nothing, apart from running the callbacks.
         """
-        if not self._context_guarded:
-            with self.mutex:
-                if run_callbacks:
-                    for callback in self.callbacks:
-                        try:
-                            callback()
-                        except Exception:
-                            self.logger.exception(_("Error running callback "
-                                                    "%s")
-                                                  % callback)
-        else:
+        with self.lock.writing():
             if run_callbacks:
                 for callback in self.callbacks:
                     try:
                         callback()
                     except Exception:
-                        self.logger.exception(_("Error running callback %s")
-                                              % callback)
+                        self.logger.exception(_("Error running callback %s"),
+                                              callback)
 
     load = reload
 
     def save(self):
         """
-        Does nothing.
+        Does nothing, apart from throwing away the current snapshot.
         """
-        if not self._context_guarded:
-            with self.mutex:
-                return
-        else:
-            return
+        self._snapshot = None
 
     def read(self):
         dumped = pprint.pformat(self.data)
@@ -440,11 +541,13 @@ class MemoryData(Data):
     get.__doc__ = data.get.__doc__
 
     def __enter__(self):
-        with self.mutex:
-            self._context_guarded = True
+        self.lock.acquire_write()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._context_guarded = False
+        try:
+            self.save()
+        finally:
+            self.lock.release_write()
         if exc_type is None:
             return True
         return False
@@ -453,9 +556,11 @@ class MemoryData(Data):
         return self.data.__getitem__(y)
 
     def __setitem__(self, key, value):
+        self._snapshot = None
         return self.data.__setitem__(key, value)
 
     def __delitem__(self, key):
+        self._snapshot = None
         return self.data.__delitem__(key)
 
     def __len__(self):
@@ -493,10 +598,6 @@ class JSONData(Data):
     data = {}
     format = formats.JSON
 
-    mutex = Lock()
-    context_mutex = Lock()
-    _context_guarded = False
-
     @property
     def mtime(self):
         return datetime.datetime.fromtimestamp(
@@ -517,36 +618,28 @@ class JSONData(Data):
             os.makedirs(folders)
 
         self.filename = filename
+        self.lock = ReadWriteLock()
+        self.writer = FileWriter(filename, self._dump)
         self.reload(False)
 
     def reload(self, run_callbacks=True):
         """
         Load or reload data from the filesystem.
         """
-        if not self._context_guarded:
-            with self.mutex:
-                self._load()
-                if run_callbacks:
-                    for callback in self.callbacks:
-                        try:
-                            callback()
-                        except Exception:
-                            self.logger.exception(_("Error running callback "
-                                                    "%s")
-                                                  % callback)
-        else:
+        with self.lock.writing():
             self._load()
             if run_callbacks:
                 for callback in self.callbacks:
                     try:
                         callback()
                     except Exception:
-                        self.logger.exception(_("Error running callback %s")
-                                              % callback)
+                        self.logger.exception(_("Error running callback %s"),
+                                              callback)
 
     load = reload
 
     def _load(self):
+        self.writer.discard()
         if not os.path.exists(self.filename):
             f = open(self.filename, "w")
             f.write("{}")
@@ -557,24 +650,31 @@ class JSONData(Data):
         fh.close()
         if not self.data:
             self.data = {}
+        self._snapshot = None
 
     def save(self):
         """
         Save data to the filesystem.
+
+        The file may be written in the background, shortly afterwards - use
+        `flush` if you need it to be written right away.
         """
-        if not self._context_guarded:
-            with self.mutex:
-                self._save()
-        else:
+        with self.lock.writing():
             self._save()
+            self._snapshot = None
+
+    def flush(self):
+        self.writer.flush()
+
+    flush.__doc__ = Data.flush.__doc__
 
     def _save(self):
-        data = json.dumps(self.data, indent=4, sort_keys=True,
-                          separators=(",", ": "))
-        fh = open(self.filename, "w")
-        fh.write(data)
-        fh.flush()
-        fh.close()
+        self.writer.save()
+
+    def _dump(self):
+        with self.lock.reading():
+            return json.dumps(self.data, indent=4, sort_keys=True,
+                              separators=(",", ": "))
 
     def validate(self, data):
         try:
@@ -646,12 +746,13 @@ class JSONData(Data):
     get.__doc__ = data.get.__doc__
 
     def __enter__(self):
-        with self.context_mutex:
-            self._context_guarded = True
+        self.lock.acquire_write()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.save()
-        self._context_guarded = False
+        try:
+            self.save()
+        finally:
+            self.lock.release_write()
         if exc_type is None:
             return True
         return False
@@ -660,9 +761,11 @@ class JSONData(Data):
         return self.data.__getitem__(y)
 
     def __setitem__(self, key, value):
+        self._snapshot = None
         return self.data.__setitem__(key, value)
 
     def __delitem__(self, key):
+        self._snapshot = None
         return self.data.__delitem__(key)
 
     def __len__(self):
@@ -681,6 +784,360 @@ class JSONData(Data):
         return True
 
 
+class SQLiteData(Data):
+    """
+    Data object that uses a local SQLite database for storage, as a
+    key-value store.
+
+    This works like the YAML and JSON data objects, and its base type is a
+    dictionary with string keys - but each top-level key is stored in its own
+    row, so changing one key only writes that key, no matter how big the
+    rest of the data is. ::
+
+        with data:
+            data["x"]["y"] = "z"
+            thing = data["a"]
+        # Only "x" (and "a", if it changed) is written
+
+    Values are loaded lazily, the first time they're used, and are stored as
+    JSON - so they can only contain what JSON can.
+
+    Changes made inside a *with* block are written in a single transaction
+    when the block is left, or thrown away if it raised an exception. Setting
+    or deleting a top-level key outside of a *with* block writes it right
+    away. Changes you make to a value without a *with* block are written the
+    next time the data is saved.
+
+    You can use `get_path` and `set_path` to get at nested dicts without
+    creating them yourself. ::
+
+        data.set_path(["channels", "#ultros", "status"], True)
+        status = data.get_path(["channels", "#ultros", "status"], False)
+
+    Existing YAML and JSON data files can be moved over to this format with
+    system.storage.migrate.
+
+    For sanity's sake, all SQLite files should end in .sqlite - but this is
+    not enforced.
+    """
+
+    editable = False
+    representation = "json"
+
+    format = formats.SQLITE
+
+    @property
+    def mtime(self):
+        return datetime.datetime.fromtimestamp(
+            os.path.getmtime(self.filename)
+        )
+
+    @property
+    def data(self):
+        """
+        All of the data, as a dict. This loads every value, so try not to
+        use it if you don't need to.
+        """
+        return dict(self.iteritems())
+
+    def __init__(self, filename):
+        self.callbacks = []
+
+        self.logger = getLogger("Data")
+        filename = filename.strip("..")
+
+        folders = filename.split("/")
+        folders.pop()
+        folders = "/".join(folders)
+
+        if not os.path.exists(folders):
+            os.makedirs(folders)
+
+        self.filename = filename
+
+        self.mutex = RLock()
+        self._depth = 0
+
+        # Values that have been loaded, with the JSON they were loaded from
+        self._cache = {}
+        # Keys that have been used since the last save, and may have changed
+        self._touched = set()
+
+        self.connection = sqlite3.connect(
+            filename, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS data "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def reload(self, run_callbacks=True):
+        """
+        Forget about all loaded values, so that they're loaded from the
+        database again, without saving them.
+        """
+        with self.mutex:
+            self._cache = {}
+            self._touched = set()
+            self._snapshot = None
+
+            if run_callbacks:
+                for callback in self.callbacks:
+                    try:
+                        callback()
+                    except Exception:
+                        self.logger.exception(_("Error running callback %s"),
+                                              callback)
+
+    load = reload
+
+    def save(self):
+        """
+        Write any values that have changed since they were loaded.
+
+        Only values that have been used since the last save are checked.
+        """
+        with self.mutex:
+            if self._depth:
+                return  # We'll be saved when the with block is left
+
+            self.connection.execute("BEGIN")
+
+            try:
+                self._save()
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            else:
+                self.connection.execute("COMMIT")
+
+    def _save(self):
+        for key in self._touched:
+            if key not in self._cache:
+                continue
+
+            value, stored = self._cache[key]
+            dumped = json.dumps(value, sort_keys=True)
+
+            if dumped != stored:
+                self._upsert(key, dumped)
+                self._cache[key] = value, dumped
+
+        self._touched = set()
+        self._snapshot = None
+
+    def _upsert(self, key, dumped):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO data (key, value) VALUES (?, ?)",
+            (key, dumped)
+        )
+
+    def _load(self, key):
+        # Returns the value for a key, loading it if necessary
+        try:
+            value = self._cache[key][0]
+        except KeyError:
+            row = self.connection.execute(
+                "SELECT value FROM data WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                raise KeyError(key)
+
+            value = json.loads(row[0])
+            self._cache[key] = value, row[0]
+
+        self._touched.add(key)
+        return value
+
+    @contextmanager
+    def reading(self):
+        # The connection and cache can only be used by one thread at a
+        # time, so there's no shared reading here
+        with self.mutex:
+            yield self
+
+    reading.__doc__ = Data.reading.__doc__
+
+    def get_path(self, path, default=None):
+        """
+        Get a value from nested dicts.
+
+        :param path: The keys to follow, starting with the top-level key
+        :param default: What to return if any of the keys don't exist
+
+        :type path: list, tuple
+        """
+        with self.mutex:
+            try:
+                value = self._load(path[0])
+
+                for key in path[1:]:
+                    value = value[key]
+            except (IndexError, KeyError, TypeError):
+                return default
+
+            return value
+
+    def set_path(self, path, value):
+        """
+        Set a value in nested dicts, creating any of them that don't exist.
+
+        This is saved in the same way as setting a top-level key.
+
+        :param path: The keys to follow, starting with the top-level key
+        :param value: The value to set
+
+        :type path: list, tuple
+        """
+        if len(path) == 1:
+            self[path[0]] = value
+            return
+
+        with self.mutex:
+            try:
+                top = self._load(path[0])
+            except KeyError:
+                top = {}
+
+            current = top
+
+            for key in path[1:-1]:
+                current = current.setdefault(key, {})
+
+            current[path[-1]] = value
+            self[path[0]] = top
+
+    def read(self):
+        dumped = json.dumps(self.data, indent=4, sort_keys=True,
+                            separators=(",", ": "))
+
+        return [self.editable, dumped]
+
+    def keys(self):
+        with self.mutex:
+            return [row[0] for row in self.connection.execute(
+                "SELECT key FROM data"
+            )]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def iteritems(self):
+        with self.mutex:
+            keys = self.keys()
+            return iter([(key, self._load(key)) for key in keys])
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        return (value for key, value in self.iteritems())
+
+    def values(self):
+        return [value for key, value in self.iteritems()]
+
+    def get(self, key, default=None):
+        with self.mutex:
+            try:
+                return self._load(key)
+            except KeyError:
+                return default
+
+    keys.__doc__ = dict.keys.__doc__
+    items.__doc__ = dict.items.__doc__
+    values.__doc__ = dict.values.__doc__
+    get.__doc__ = dict.get.__doc__
+
+    def close(self):
+        """
+        Close the database connection. Don't use this object after this.
+        """
+        with self.mutex:
+            self.connection.close()
+
+    def __enter__(self):
+        self.mutex.acquire()
+        self._depth += 1
+
+        if self._depth == 1:
+            self.connection.execute("BEGIN")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self._depth -= 1
+
+            if self._depth:
+                return exc_type is None
+
+            if exc_type is None:
+                try:
+                    self._save()
+                except Exception:
+                    self.connection.execute("ROLLBACK")
+                    self.reload(False)
+                    raise
+
+                self.connection.execute("COMMIT")
+                return True
+
+            # Throw away everything from the failed block
+            self.connection.execute("ROLLBACK")
+            self.reload(False)
+            return False
+        finally:
+            self.mutex.release()
+
+    def __getitem__(self, y):
+        with self.mutex:
+            return self._load(y)
+
+    def __setitem__(self, key, value):
+        with self.mutex:
+            dumped = json.dumps(value, sort_keys=True)
+
+            self._upsert(key, dumped)
+            self._cache[key] = value, dumped
+            self._snapshot = None
+
+    def __delitem__(self, key):
+        with self.mutex:
+            cursor = self.connection.execute(
+                "DELETE FROM data WHERE key = ?", (key,)
+            )
+
+            self._cache.pop(key, None)
+            self._touched.discard(key)
+            self._snapshot = None
+
+            if not cursor.rowcount:
+                raise KeyError(key)
+
+    def __len__(self):
+        with self.mutex:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM data"
+            ).fetchone()[0]
+
+    def __contains__(self, item):
+        with self.mutex:
+            if item in self._cache:
+                return True
+
+            return self.connection.execute(
+                "SELECT 1 FROM data WHERE key = ?", (item,)
+            ).fetchone() is not None
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def __str__(self):
+        return "<Ultros SQLite data handler: %s>" % self.filename
+
+    def __nonzero__(self):
+        return True
+
+
 class DBAPIData(Data):
     """
     Data object that uses Twisted's async DBAPI adapters.
@@ -772,16 +1229,16 @@ class DBAPIData(Data):
 
         self.path = path
 
-        self.logger.trace("Path: %s" % path)
-        self.logger.trace("Args: %s" % (args or "[]"))
-        self.logger.trace("KWArgs: %s" % (kwargs or "{}"))
+        self.logger.trace("Path: %s", path)
+        self.logger.trace("Args: %s", args or "[]")
+        self.logger.trace("KWArgs: %s", kwargs or "{}")
 
         parsed_module = path.split(":", 1)[0]
         self.parsed_module = parsed_module
         self.args = args
         self.kwargs = kwargs
 
-        self.logger.debug(_("Parsed module: %s") % parsed_module)
+        self.logger.debug(_("Parsed module: %s"), parsed_module)
 
         self.reconnect()
 
@@ -866,6 +1323,13 @@ class MongoDBData(Data):
         for r in results:
             pass  # Do stuff with each document
 
+    All of that talks to the database in the thread you're in. To do it in a
+    worker pool instead, and get a Deferred back, use *deferred* - see
+    system.storage.deferred. ::
+
+        coll = x.deferred.collection("dbname", "collection_name")
+        d = coll.find({"key": "value"})  # Fires with a list of documents
+
     More info: http://api.mongodb.org/python/2.7rc0/
     """
 
@@ -873,6 +1337,7 @@ class MongoDBData(Data):
     format = formats.MONGO
 
     client = None
+    client_key = None
     info = ""
 
     def __init__(self, path, *args, **kwargs):
@@ -883,19 +1348,33 @@ class MongoDBData(Data):
         self.path = path
         self.url = kwargs.get("url", None)
 
-        self.logger.trace("Path: %s" % path)
-        self.logger.trace("Args: %s" % (args or "[]"))
-        self.logger.trace("KWArgs: %s" % (kwargs or "{}"))
+        self.logger.trace("Path: %s", path)
+        self.logger.trace("Args: %s", args or "[]")
+        self.logger.trace("KWArgs: %s", kwargs or "{}")
 
         self.args = args
         self.kwargs = kwargs
 
+        #: Deferred API for this data object
+        self.deferred = DeferredMongo(self)
+
         self.reconnect()
 
     def reconnect(self):
-        args = self.args
-        kwargs = self.kwargs
-        self.client = pymongo.MongoClient(self.url, *args, **kwargs)
+        """
+        Get a client from the shared client registry, giving back the one
+        we had if there was one.
+        """
+        self.close()
+        self.client_key, self.client = ClientRegistry().acquire(
+            "mongo", *self.args, **self.kwargs
+        )
+
+    def close(self):
+        if self.client_key is not None:
+            ClientRegistry().release(self.client_key)
+            self.client_key = None
+            self.client = None
 
     def serialize(self, yielder):
         """
@@ -958,6 +1437,13 @@ class RedisData(Data):
     this class as well. This is one of the only storage options that doesn't
     provide access with the *with* macro at all.
 
+    All of that talks to Redis in the thread you're in. To do it in a worker
+    pool instead, and get a Deferred back, use *deferred* - see
+    system.storage.deferred. ::
+
+        d = x.deferred.get("key")
+        d = x.deferred.batch([("set", "key", value), ("get", "other")])
+
     More info: https://github.com/andymccurdy/redis-py/blob/master/README.rst
     """
 
@@ -965,6 +1451,7 @@ class RedisData(Data):
     format = formats.REDIS
 
     client = None
+    client_key = None
     info = ""
 
     def __init__(self, path, *args, **kwargs):
@@ -975,19 +1462,33 @@ class RedisData(Data):
         self.path = path
         self.url = kwargs.get("url", None)
 
-        self.logger.trace("Path: %s" % path)
-        self.logger.trace("Args: %s" % (args or "[]"))
-        self.logger.trace("KWArgs: %s" % (kwargs or "{}"))
+        self.logger.trace("Path: %s", path)
+        self.logger.trace("Args: %s", args or "[]")
+        self.logger.trace("KWArgs: %s", kwargs or "{}")
 
         self.args = args
         self.kwargs = kwargs
 
+        #: Deferred API for this data object
+        self.deferred = DeferredRedis(self)
+
         self.reconnect()
 
     def reconnect(self):
-        args = self.args
-        kwargs = self.kwargs
-        self.client = redis.StrictRedis(*args, **kwargs)
+        """
+        Get a client from the shared client registry, giving back the one
+        we had if there was one.
+        """
+        self.close()
+        self.client_key, self.client = ClientRegistry().acquire(
+            "redis", *self.args, **self.kwargs
+        )
+
+    def close(self):
+        if self.client_key is not None:
+            ClientRegistry().release(self.client_key)
+            self.client_key = None
+            self.client = None
 
     def serialize(self, yielder):
         # Only used when we don't have a conventional serialization, this
@@ -0,0 +1,183 @@
+# coding=utf-8
+
+"""
+Deferred APIs for the Redis and MongoDB data objects.
+
+Using those data objects directly talks to the database right there and
+then, in whichever thread you're in - usually the reactor, where a slow
+database holds up every protocol. Instead, you can go through their
+*deferred* attribute, which runs the same operations in the client registry's
+worker pool and gives you a Deferred for the result. ::
+
+    d = redis_data.deferred.get("key")
+    d.addCallback(...)
+
+    d = redis_data.deferred.batch([
+        ("set", "key", "value"),
+        ("incr", "counter"),
+        ("get", "other")
+    ])  # Fires with a list of results, sent in one round trip
+
+    coll = mongo_data.deferred.collection("database", "things")
+    d = coll.find({"key": "value"})  # Fires with a list of documents
+
+Anything the client can do can be run this way - any method you call on the
+facade is called on the client in the pool. If you need to do several things
+at once, use `DeferredFacade.run` with your own function.
+
+If the pool's queue is full - usually because the database is slow - new
+operations fail right away with a PoolOverflowError, rather than holding up
+the reactor. This can be changed with the "overflow" setting in the
+"storage-clients" section of settings.yml.
+"""
+
+from functools import partial
+
+from pymongo.command_cursor import CommandCursor
+from pymongo.cursor import Cursor
+
+from system.storage.clients import ClientRegistry
+
+__author__ = 'Gareth Coles'
+
+
+class DeferredFacade(object):
+    """
+    Runs a data object's client methods in a worker pool, returning
+    Deferreds.
+    """
+
+    def __init__(self, data, pool=None):
+        """
+        :param data: The data object whose client should be used
+        :param pool: The WorkerPool to run operations in - by default, the
+            client registry's
+        """
+
+        self._data = data
+        self._pool = pool
+
+    @property
+    def pool(self):
+        """
+        The WorkerPool that operations are run in.
+        """
+
+        if self._pool is not None:
+            return self._pool
+        return ClientRegistry().get_pool()
+
+    def run(self, func, *args, **kwargs):
+        """
+        Run a function in the pool, passing it the client as the first
+        argument.
+
+        :param func: The function to run
+        :param args: Any other arguments to pass to it
+        :param kwargs: Any keyword arguments to pass to it
+
+        :return: A Deferred firing with what the function returns
+        :rtype: Deferred
+        """
+
+        return self.pool.submit(self._run, func, args, kwargs)
+
+    def _run(self, func, args, kwargs):
+        # The client is got here, in case the data object has reconnected
+        return self._convert(func(self._data.client, *args, **kwargs))
+
+    def _convert(self, result):
+        # Override this to change results before they're sent back
+        return result
+
+    def _call(self, name, *args, **kwargs):
+        return self.run(
+            lambda client: getattr(client, name)(*args, **kwargs)
+        )
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return partial(self._call, name)
+
+
+class DeferredRedis(DeferredFacade):
+    """
+    Deferred API for Redis data objects. Call any client method on this to
+    run it in the pool.
+    """
+
+    def batch(self, commands, transaction=False):
+        """
+        Run several commands in one round trip, using a pipeline.
+
+        :param commands: Tuples of the name of a client method, followed by
+            its arguments - for example, ("set", "key", "value")
+        :param transaction: Whether to run the commands in a transaction
+
+        :type commands: list
+        :type transaction: bool
+
+        :return: A Deferred firing with a list of the commands' results
+        :rtype: Deferred
+        """
+
+        commands = list(commands)
+
+        def _batch(client):
+            pipe = client.pipeline(transaction=transaction)
+
+            for command in commands:
+                getattr(pipe, command[0])(*command[1:])
+
+            return pipe.execute()
+
+        return self.run(_batch)
+
+
+class DeferredMongo(DeferredFacade):
+    """
+    Deferred API for MongoDB data objects. Call any client method on this
+    to run it in the pool, or use `collection` to work with a collection.
+
+    Cursors are read in the pool, so you get lists of documents back rather
+    than cursors.
+    """
+
+    def collection(self, database, name):
+        """
+        Get a Deferred API for a collection. Call any collection method on
+        it to run it in the pool - including `bulk_write`, for batches.
+
+        :param database: The name of the database
+        :param name: The name of the collection
+
+        :type database: str
+        :type name: str
+
+        :rtype: DeferredCollection
+        """
+
+        return DeferredCollection(self._data, database, name, self._pool)
+
+    def _convert(self, result):
+        if isinstance(result, (Cursor, CommandCursor)):
+            return list(result)
+        return result
+
+
+class DeferredCollection(DeferredMongo):
+    """
+    Deferred API for a MongoDB collection - see `DeferredMongo.collection`.
+    """
+
+    def __init__(self, data, database, name, pool=None):
+        super(DeferredCollection, self).__init__(data, pool)
+
+        self._database = database
+        self._name = name
+
+    def _run(self, func, args, kwargs):
+        collection = self._data.client[self._database][self._name]
+        return self._convert(func(collection, *args, **kwargs))
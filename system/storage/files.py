@@ -31,7 +31,8 @@ file_formats_map = {
         Formats.YAML: Data.YamlData,
         Formats.DBAPI: Data.DBAPIData,
         Formats.MONGO: Data.MongoDBData,
-        Formats.REDIS: Data.RedisData
+        Formats.REDIS: Data.RedisData,
+        Formats.SQLITE: Data.SQLiteData
     }
 }
 
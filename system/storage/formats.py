@@ -16,6 +16,7 @@ class Formats(Enum):
     DBAPI = "DBAPI"
     MONGO = "MongoDB"
     REDIS = "Redis"
+    SQLITE = "SQLite"
 
 # TODO: Remove enum references below
 
@@ -25,7 +26,8 @@ MEMORY = Formats.MEMORY
 DBAPI = Formats.DBAPI
 MONGO = Formats.MONGO
 REDIS = Formats.REDIS
+SQLITE = Formats.SQLITE
 
-DATA = [YAML, JSON, MEMORY, DBAPI, MONGO, REDIS]
+DATA = [YAML, JSON, MEMORY, DBAPI, MONGO, REDIS, SQLITE]
 CONF = [YAML, JSON, MEMORY]
 ALL = [YAML, JSON, MEMORY]
@@ -15,8 +15,11 @@ __author__ = 'Gareth Coles'
 
 import system.storage.files as files
 
+from system.enums import OverflowPolicy
 from system.storage.exceptions import UnknownStorageTypeError
+from system.storage.writer import FileWriter
 from system.singleton import Singleton
+from system.workers import WorkerPool
 from system.logging.logger import getLogger
 
 from system.translations import Translations
@@ -40,12 +43,83 @@ class StorageManager(object):
 
     editor_warning = False
 
+    #: WorkerPool that data files are written in, if it's been set up
+    pool = None
+
     def __init__(self, conf_path="config/", data_path="data/"):
         self.conf_path = conf_path
         self.data_path = data_path
 
         self.log = getLogger("Storage")
 
+    def setup_pool(self, delay=0.5, queue_size=100):
+        """
+        Start writing data files in the background, instead of as soon as
+        they're saved. See system.storage.writer for more on this.
+
+        Files that are saved again within the delay are only written once.
+        If the pool's queue fills up, files are written in the thread that
+        saved them instead.
+
+        :param delay: How long to wait after a save before writing the file,
+            in seconds
+        :param queue_size: How many writes may be waiting at once
+
+        :type delay: float
+        :type queue_size: int
+        """
+
+        self.stop_pool()
+
+        self.pool = WorkerPool("Storage", 1, queue_size,
+                               OverflowPolicy.RunInline)
+
+        FileWriter.delay = delay
+        FileWriter.pool = self.pool
+
+    def stop_pool(self):
+        """
+        Write any outstanding changes to all data files, and stop writing
+        files in the background.
+        """
+
+        if self.pool is None:
+            return
+
+        pool, self.pool = self.pool, None
+        FileWriter.pool = None
+
+        self.flush_files()
+        pool.stop()
+
+    def flush_files(self):
+        """
+        Make sure that all saved changes to data files have been written.
+        """
+
+        for key, f in self.data_files.items():
+            self._flush_file(key, f)
+
+    def _flush_file(self, key, f):
+        if f.obj is None:
+            return
+
+        try:
+            f.obj.flush()
+        except Exception:
+            self.log.exception(_("Error writing data file: %s"), key)
+
+    def _close_file(self, key, f):
+        self._flush_file(key, f)
+
+        if f.obj is None:
+            return
+
+        try:
+            f.obj.close()
+        except Exception:
+            self.log.exception(_("Error closing data file: %s"), key)
+
     def get_file(self, obj, storage_type, file_format, path, *args, **kwargs):
         """
         Get the instance of a storage file, creating it if it doesn't exist.
@@ -115,6 +189,7 @@ class StorageManager(object):
 
         if storage_type == "data":
             if path in self.data_files:
+                self._close_file(path, self.data_files[path])
                 self.data_files[path].release(self)
                 del self.data_files[path]
                 return True
@@ -139,17 +214,18 @@ class StorageManager(object):
         """
 
         for key in self.config_files.keys():
-            self.log.trace(_("Checking config file: %s") % key)
+            self.log.trace(_("Checking config file: %s"), key)
             f = self.config_files[key]
             if f.is_owner(instance):
-                self.log.trace(_("Obj %s owns this file.") % instance)
+                self.log.trace(_("Obj %s owns this file."), instance)
                 f.release(self)
                 del self.config_files[key]
 
         for key in self.data_files.keys():
-            self.log.trace(_("Checking data file: %s") % key)
+            self.log.trace(_("Checking data file: %s"), key)
             f = self.data_files[key]
             if f.is_owner(instance):
-                self.log.trace(_("Obj %s owns this file.") % instance)
+                self.log.trace(_("Obj %s owns this file."), instance)
+                self._close_file(key, f)
                 f.release(self)
                 del self.data_files[key]
@@ -0,0 +1,144 @@
+# coding=utf-8
+
+"""
+Move data from YAML and JSON data files into SQLite data files.
+
+Run this from the bot's directory, while the bot isn't running::
+
+    python -m system.storage.migrate data/plugins/urls/channels.yml
+
+This creates data/plugins/urls/channels.sqlite, leaving the original file
+where it is - you'll need to change the plugin to use Formats.SQLITE and the
+new path before it'll be used. You can give the new file's path with
+--output, and migrate several files at once by giving more than one path.
+
+The whole file is migrated in one transaction, so a failed migration leaves
+nothing behind in the new file.
+"""
+
+import argparse
+import os
+import sys
+
+from system.storage.data import JSONData, SQLiteData, YamlData
+from system.translations import Translations
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+#: Data objects for each file extension that can be migrated
+SOURCE_FORMATS = {
+    ".yml": YamlData,
+    ".yaml": YamlData,
+    ".json": JSONData
+}
+
+
+class MigrationError(Exception):
+    """
+    Raised when a data file can't be migrated.
+    """
+
+    pass
+
+
+def get_output_path(path):
+    """
+    Get the default path to migrate a data file to - the same path, with
+    its extension replaced with ".sqlite".
+
+    :param path: The path to the file being migrated
+    :type path: str
+
+    :rtype: str
+    """
+
+    return os.path.splitext(path)[0] + ".sqlite"
+
+
+def migrate(source, output=None, overwrite=False):
+    """
+    Copy the contents of a YAML or JSON data file into a SQLite data file.
+
+    :param source: The path to the YAML or JSON file
+    :param output: The path to the SQLite file, if not the default one -
+        see `get_output_path`
+    :param overwrite: Whether to replace keys that are already in the SQLite
+        file; if this is False, it's an error for the file to have any data
+
+    :type source: str
+    :type output: str, None
+    :type overwrite: bool
+
+    :return: How many keys were migrated
+    :rtype: int
+    """
+
+    extension = os.path.splitext(source)[1].lower()
+
+    if extension not in SOURCE_FORMATS:
+        raise MigrationError(_("Unknown data file type: %s") % source)
+
+    if not os.path.exists(source):
+        raise MigrationError(_("No such file: %s") % source)
+
+    if output is None:
+        output = get_output_path(source)
+
+    data = SOURCE_FORMATS[extension](source)
+    target = SQLiteData(output)
+
+    try:
+        if len(target) and not overwrite:
+            raise MigrationError(_("%s already has data in it") % output)
+
+        with target:
+            for key, value in data.iteritems():
+                target[key] = value
+
+        return len(data)
+    finally:
+        target.close()
+
+
+def main(args=None):
+    """
+    Migrate the files given on the command line.
+
+    :return: The exit code
+    :rtype: int
+    """
+
+    p = argparse.ArgumentParser(
+        description=_("Move YAML and JSON data files into SQLite data files")
+    )
+    p.add_argument("files", nargs="+", help=_("The data files to migrate"))
+    p.add_argument("-o", "--output",
+                   help=_("Where to put the SQLite file, if there's only one "
+                          "file to migrate"))
+    p.add_argument("--overwrite", action="store_true",
+                   help=_("Replace keys that are already in the SQLite "
+                          "files"))
+
+    args = p.parse_args(args)
+
+    if args.output and len(args.files) > 1:
+        p.error(_("--output can only be used with a single file"))
+
+    failed = False
+
+    for path in args.files:
+        try:
+            count = migrate(path, args.output, args.overwrite)
+        except Exception as e:
+            failed = True
+            print(_("Unable to migrate %s: %s") % (path, e))
+        else:
+            print(_("Migrated %s keys from %s to %s")
+                  % (count, path, args.output or get_output_path(path)))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# coding=utf-8
+
+"""
+Background writing for file-backed data objects.
+
+Saving a data file used to mean serializing the whole thing and rewriting it
+right away, every time a *with* block was left - which adds up quickly for
+plugins that change their data on every message.
+
+Instead, a save just marks the file as dirty. The first save schedules a
+write a little later, and any other saves before then are written along with
+it - so each file is written at most once per delay, no matter how often
+it's saved. Both serializing and writing happen in the storage manager's
+worker pool, and files are written into a temporary file that then replaces
+the real one, so a file is never left half-written.
+
+If the storage manager hasn't set up its pool, files are written as soon as
+they're saved, in the thread that saved them.
+
+Call `FileWriter.flush` when you need to be sure that everything's been
+written - the storage manager does this for you when files are released.
+"""
+
+import os
+import threading
+
+from twisted.internet import reactor as _reactor
+
+from system.logging.logger import getLogger
+from system.translations import Translations
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+
+def atomic_write(filename, text):
+    """
+    Write a file by writing to a temporary file and replacing the original
+    with it, so that the original is never left half-written.
+
+    :param filename: The file to write
+    :param text: What to write to it
+
+    :type filename: str
+    :type text: str
+    """
+
+    temp = "%s.tmp" % filename
+
+    with open(temp, "w") as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    if os.name == "nt" and os.path.exists(filename):
+        # Windows won't rename over an existing file
+        os.remove(filename)
+
+    os.rename(temp, filename)
+
+
+class FileWriter(object):
+    """
+    Writes a single file in the background, coalescing saves that happen
+    close together.
+    """
+
+    #: WorkerPool to write files in, set up by the storage manager
+    pool = None
+
+    #: How long to wait after a save before writing, in seconds
+    delay = 0.5
+
+    #: The reactor to schedule writes with
+    clock = _reactor
+
+    def __init__(self, filename, serialize):
+        """
+        :param filename: The file to write
+        :param serialize: Function returning the text to write - this is
+            called when the file is actually written, not when it's saved,
+            possibly in another thread; so it should lock the data itself
+
+        :type filename: str
+        :type serialize: function
+        """
+
+        self.filename = filename
+        self.serialize = serialize
+
+        self.logger = getLogger("Storage")
+
+        #: Whether there are saves that haven't been serialized yet
+        self.dirty = False
+
+        self._call = None
+        self._lock = threading.Lock()
+
+        # Serialized text waiting to be written, and its version
+        self._pending = None
+        self._version = 0
+        self._written = 0
+
+    def __repr__(self):
+        return "<%s: %s%s>" % (
+            self.__class__.__name__, self.filename,
+            " (dirty)" if self.dirty or self._pending else ""
+        )
+
+    def save(self):
+        """
+        Mark the file as changed, so that it's written soon. This may be
+        called from any thread.
+        """
+
+        self.dirty = True
+
+        if self.pool is None:
+            self.flush()
+        else:
+            self.clock.callFromThread(self._schedule)
+
+    def flush(self):
+        """
+        Write any changes right away, in the calling thread, if there are
+        any that haven't been written yet.
+        """
+
+        call, self._call = self._call, None
+
+        if call is not None and call.active():
+            call.cancel()
+
+        if self.dirty:
+            self._take()
+
+        pending = self._pending
+
+        if pending is not None:
+            self._write(*pending)
+
+    def discard(self):
+        """
+        Forget about any changes that haven't been written yet - for
+        example, when the file is reloaded and they're no longer relevant.
+        """
+
+        self.dirty = False
+
+        with self._lock:
+            self._pending = None
+            # Stop writes that were already submitted from going through
+            self._written = self._version
+
+    def _schedule(self):
+        if self._call is None and self.dirty:
+            self._call = self.clock.callLater(self.delay, self._write_later)
+
+    def _write_later(self):
+        self._call = None
+
+        if not self.dirty:
+            return
+
+        d = self.pool.submit(self._write_dirty)
+        d.addErrback(self._write_failed)
+
+    def _write_dirty(self):
+        # Runs in the pool
+        if self.dirty:
+            self._write(*self._take())
+
+    def _take(self):
+        self.dirty = False
+
+        try:
+            text = self.serialize()
+        except Exception:
+            # Keep the changes, so they're written by the next attempt
+            self.dirty = True
+            raise
+
+        with self._lock:
+            self._version += 1
+            self._pending = text, self._version
+
+            return self._pending
+
+    def _write(self, text, version):
+        with self._lock:
+            if version <= self._written:
+                return  # Something newer has been written already
+
+            atomic_write(self.filename, text)
+
+            self._written = version
+
+            if self._pending is not None and self._pending[1] <= version:
+                self._pending = None
+
+    def _write_failed(self, failure):
+        self.logger.error(_("Error writing file %s: %s"),
+                          self.filename, failure.getErrorMessage())
+
+        self._schedule()  # Try again, if it couldn't be serialized
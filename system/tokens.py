@@ -86,9 +86,9 @@ class Tokens(object):
         return string
 
     def manual_replace(self, string, name, replace):
-        self.logger.info("String: %s" % string)
-        self.logger.info("Name: %s" % name)
-        self.logger.info("Replace: %s" % replace)
+        self.logger.info("String: %s", string)
+        self.logger.info("Name: %s", name)
+        self.logger.info("Replace: %s", replace)
 
         name = name.upper()
         tokens = self.get_tokens(string)
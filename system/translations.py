@@ -45,8 +45,8 @@ class Translations(object):
                 print("Unknown language '%s', defaulting to '%s'"
                       % (lang, DEFAULT))
             else:
-                self.logger.warn("Unknown language '%s', defaulting to '%s'"
-                                 % (lang, DEFAULT))
+                self.logger.warn("Unknown language '%s', defaulting to '%s'",
+                                 lang, DEFAULT)
 
             lang = DEFAULT
 
@@ -55,8 +55,8 @@ class Translations(object):
                 print("Unknown language '%s', defaulting to '%s'"
                       % (mlang, DEFAULT))
             else:
-                self.logger.warn("Unknown language '%s', defaulting to '%s'"
-                                 % (mlang, DEFAULT))
+                self.logger.warn("Unknown language '%s', defaulting to '%s'",
+                                 mlang, DEFAULT)
 
             mlang = DEFAULT
 
@@ -60,7 +60,7 @@ class VersionManager(object):
         else:
             self.log.info("No update messages detected.")
 
-        self.log.info("Current release: %s" % self.current)
+        self.log.info("Current release: %s", self.current)
 
     def load_release(self):
         if not os.path.exists("version"):
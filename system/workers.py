@@ -0,0 +1,247 @@
+# coding=utf-8
+
+"""
+Bounded worker pools, for running blocking work away from the reactor.
+
+Unlike Twisted's ThreadPool, these pools have a fixed number of threads and
+a bounded work queue, with a configurable policy for what happens to new work
+when that queue is full. This keeps both thread count and memory usage flat,
+no matter how much work is thrown at them.
+
+Work is submitted from the reactor thread, and you get a Deferred back that
+will be fired in the reactor thread once the work is done. ::
+
+    pool = WorkerPool("Example", size=5, queue_size=50)
+
+    d = pool.submit(some_blocking_function, arg1, arg2)
+    d.addCallback(...)
+"""
+
+import Queue
+import threading
+
+from twisted.internet import reactor as _reactor
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.python.failure import Failure
+
+from system.enums import OverflowPolicy
+from system.logging.logger import getLogger
+from system.translations import Translations
+
+__author__ = 'Gareth Coles'
+_ = Translations().get()
+
+#: Mapping of overflow policy names, as used in configuration files
+overflow_policies = {
+    "block": OverflowPolicy.Block,
+    "drop-oldest": OverflowPolicy.DropOldest,
+    "run-inline": OverflowPolicy.RunInline,
+    "reject": OverflowPolicy.Reject
+}
+
+#: Queued by `WorkerPool.stop` to tell a worker thread to exit
+_STOP = object()
+
+
+def get_overflow_policy(name):
+    """
+    Get an overflow policy from its name - for example, "drop-oldest".
+
+    If you pass in an actual OverflowPolicy, you'll get it straight back.
+
+    :param name: The name of the policy
+    :type name: str, OverflowPolicy
+
+    :return: The overflow policy
+    :rtype: OverflowPolicy
+    """
+
+    if isinstance(name, OverflowPolicy):
+        return name
+
+    try:
+        return overflow_policies[name.lower()]
+    except KeyError:
+        raise ValueError(_("Unknown overflow policy: %s") % name)
+
+
+class PoolOverflowError(Exception):
+    """
+    Passed to the errbacks of work that was dropped from a full queue.
+    """
+
+    pass
+
+
+class WorkerPool(object):
+    """
+    A named pool of worker threads, with a bounded work queue.
+
+    Threads are started the first time work is submitted, and are daemon
+    threads - remember to call `stop` when you're done with the pool.
+    """
+
+    def __init__(self, name, size=10, queue_size=100,
+                 overflow=OverflowPolicy.Block, reactor=None):
+        """
+        :param name: The name of the pool, used for naming its threads
+        :param size: How many worker threads to run
+        :param queue_size: How much work may be queued before the overflow
+            policy kicks in
+        :param overflow: What to do when the queue is full
+        :param reactor: The reactor to fire Deferreds with, mostly for tests
+
+        :type name: str
+        :type size: int
+        :type queue_size: int
+        :type overflow: OverflowPolicy, str
+        """
+
+        if size < 1:
+            raise ValueError(_("Worker pools need at least one thread"))
+
+        self.name = name
+        self.size = size
+        self.queue_size = queue_size
+        self.overflow = get_overflow_policy(overflow)
+        self.reactor = reactor or _reactor
+
+        self.logger = getLogger("Workers")
+
+        self.started = False
+        self.dropped = 0
+
+        self._queue = Queue.Queue(queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<%s %r: %s threads, %s/%s queued>" % (
+            self.__class__.__name__, self.name, len(self._threads),
+            self.pending, self.queue_size
+        )
+
+    @property
+    def pending(self):
+        """
+        How much work is waiting in the queue. This is only approximate, and
+        should be used for stats and debugging only.
+        """
+
+        return self._queue.qsize()
+
+    def start(self):
+        """
+        Start the worker threads, if they aren't already running.
+        """
+
+        with self._lock:
+            if self.started:
+                return
+
+            for i in xrange(self.size):
+                thread = threading.Thread(
+                    target=self._work, name="%s-%s" % (self.name, i)
+                )
+                thread.daemon = True
+                thread.start()
+
+                self._threads.append(thread)
+
+            self.started = True
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker threads, once they've finished the work that's
+        already been queued.
+
+        :param timeout: How long to wait for each thread, or None to wait
+            for as long as it takes
+        :type timeout: float, None
+        """
+
+        with self._lock:
+            if not self.started:
+                return
+
+            threads, self._threads = self._threads, []
+            self.started = False
+
+        for _thread in threads:
+            self._queue.put(_STOP)
+
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Submit some work to the pool. This should be called from the reactor
+        thread.
+
+        The returned Deferred will fire in the reactor thread with the result
+        of the work, or a Failure if it raised an exception or was dropped
+        because the queue was full.
+
+        :param func: The callable to run in the pool
+        :param args: Arguments to pass to the callable
+        :param kwargs: Keyword arguments to pass to the callable
+
+        :rtype: Deferred
+        """
+
+        if not self.started:
+            self.start()
+
+        d = Deferred()
+        task = (d, func, args, kwargs)
+
+        if self.overflow is OverflowPolicy.Block:
+            self._queue.put(task)
+            return d
+
+        while True:
+            try:
+                self._queue.put_nowait(task)
+                return d
+            except Queue.Full:
+                if self.overflow is OverflowPolicy.RunInline:
+                    return maybeDeferred(func, *args, **kwargs)
+
+            if self.overflow is OverflowPolicy.Reject:
+                dropped = task
+            else:  # OverflowPolicy.DropOldest
+                try:
+                    dropped = self._queue.get_nowait()
+                except Queue.Empty:
+                    continue  # A worker got to it first, so there's room
+
+            if dropped is _STOP:
+                # We're being stopped; put it back and give up on our work
+                self._queue.put(dropped)
+                dropped = task
+
+            self.dropped += 1
+            dropped[0].errback(Failure(PoolOverflowError(
+                _("Work dropped from full worker pool: %s") % self.name
+            )))
+
+            if dropped is task:
+                return d
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+
+            if task is _STOP:
+                return
+
+            d, func, args, kwargs = task
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.reactor.callFromThread(d.errback, Failure())
+            else:
+                self.reactor.callFromThread(d.callback, result)
+            finally:
+                del task, d, func, args, kwargs
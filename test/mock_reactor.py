@@ -0,0 +1,18 @@
+# coding=utf-8
+
+from twisted.internet.task import Clock
+
+
+__author__ = 'Gareth Coles'
+
+
+class InlineReactor(Clock):
+    """
+    An incomplete mock of the reactor, for testing code that hands work back
+    to the reactor thread. Calls made with callFromThread() are run right away
+    in the calling thread, and time only passes when advance() is called, as
+    with Twisted's own Clock.
+    """
+
+    def callFromThread(self, func, *args, **kwargs):
+        func(*args, **kwargs)
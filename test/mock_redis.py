@@ -0,0 +1,102 @@
+# coding=utf-8
+
+import SocketServer
+import threading
+
+
+__author__ = 'Gareth Coles'
+
+
+class _RedisHandler(SocketServer.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+
+        if not line:
+            return None
+
+        count = int(line[1:])
+        args = []
+
+        for i in xrange(count):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write("$-1\r\n")
+        elif value is True:
+            self.wfile.write("+OK\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(":%s\r\n" % value)
+        elif isinstance(value, Exception):
+            self.wfile.write("-ERR %s\r\n" % value)
+        else:
+            self.wfile.write("$%s\r\n%s\r\n" % (len(value), value))
+
+    def handle(self):
+        server = self.server
+
+        while True:
+            command = self.read_command()
+
+            if command is None:
+                return
+
+            name = command[0].upper()
+            args = command[1:]
+
+            with server.lock:
+                server.commands.append(name)
+
+                if name == "GET":
+                    self.reply(server.values.get(args[0]))
+                elif name == "SET":
+                    server.values[args[0]] = args[1]
+                    self.reply(True)
+                elif name == "DEL":
+                    self.reply(int(server.values.pop(args[0], None)
+                                   is not None))
+                elif name == "INCRBY":
+                    value = int(server.values.get(args[0], 0)) + int(args[1])
+                    server.values[args[0]] = str(value)
+                    self.reply(value)
+                else:
+                    self.reply(Exception("unknown command '%s'" % name))
+
+
+class MockRedisServer(SocketServer.ThreadingTCPServer):
+    """
+    A tiny, in-process stand-in for a Redis server, for testing code that
+    talks to Redis. It only knows GET, SET, DEL and INCRBY, and keeps a list
+    of the commands it's been sent.
+
+    It listens on a random port on localhost - see `port`.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        SocketServer.ThreadingTCPServer.__init__(
+            self, ("127.0.0.1", 0), _RedisHandler
+        )
+
+        self.lock = threading.Lock()
+        self.values = {}
+        self.commands = []
+
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
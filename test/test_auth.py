@@ -0,0 +1,192 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for the auth handler and its password hashing pool"""
+
+import time
+
+import nose.tools as nosetools
+from mock import Mock
+
+from plugins.auth.auth_handler import authHandler, LoginThrottledError
+from plugins.auth.crypto.pool import HashPool, HashingError
+from system.storage.data import MemoryData
+
+from mock_reactor import InlineReactor
+
+
+def wait(d, timeout=10):
+    """
+    Wait for a Deferred fired from the hashing pool, and get its result.
+    """
+
+    results = []
+    d.addBoth(results.append)
+
+    end = time.time() + timeout
+
+    while not results and time.time() < end:
+        time.sleep(0.01)
+
+    nosetools.assert_true(results, "Timed out waiting for the pool")
+    return results[0]
+
+
+class test_auth:
+
+    def setup(self):
+        self.hasher = HashPool(2, reactor=InlineReactor())
+
+        self.plugin = Mock(name="plugin")
+        self.plugin.config = {"auth-algo": "sha512", "replace-hashes": True}
+        self.plugin.get_permissions_handler.return_value = None
+
+        self.data = MemoryData({})
+        self.data["existing"] = {}  # Don't create a superadmin account
+
+        self.handler = authHandler(self.plugin, self.data, MemoryData({}),
+                                   hasher=self.hasher)
+
+    def teardown(self):
+        self.hasher.stop()
+
+    def test_pool(self):
+        """AUTHS | Test hashing passwords in a process pool"""
+        hashed = wait(self.hasher.hash("sha512", "password", "salt"))
+
+        nosetools.eq_(wait(self.hasher.check("sha512", hashed, "password",
+                                             "salt")), True)
+        nosetools.eq_(wait(self.hasher.check("sha512", hashed, "wrong",
+                                             "salt")), False)
+
+        failure = wait(self.hasher.hash("not-an-algo", "password", "salt"))
+        nosetools.assert_true(failure.check(HashingError))
+
+    def test_pool_concurrency(self):
+        """AUTHS | Test hashes over the concurrency limit wait their turn"""
+        hasher = HashPool(2, reactor=InlineReactor(), concurrency=1)
+
+        try:
+            first = hasher.hash("sha512", "password", "salt")
+            second = hasher.hash("sha512", "password", "salt")
+
+            nosetools.eq_(hasher.waiting, 1)
+            nosetools.eq_(wait(first), wait(second))
+            nosetools.eq_(hasher.waiting, 0)
+        finally:
+            hasher.stop()
+
+    def test_pool_timeout(self):
+        """AUTHS | Test hashes that take too long fail, and free their slot"""
+        reactor = InlineReactor()
+        hasher = HashPool(1, reactor=reactor, concurrency=1, timeout=5)
+
+        try:
+            hasher.start()
+
+            # Stands in for a process that never answers
+            stuck = hasher._submit(time.sleep, 1)
+            waiting = hasher.hash("sha512", "password", "salt")
+
+            nosetools.eq_(hasher.waiting, 1)
+
+            reactor.advance(5)
+
+            failure = wait(stuck)
+            nosetools.assert_true(failure.check(HashingError))
+
+            nosetools.eq_(hasher.waiting, 0)
+            nosetools.assert_true(isinstance(wait(waiting), str))
+        finally:
+            hasher.stop()
+
+    def test_accounts(self):
+        """AUTHS | Test creating accounts and logging in"""
+        nosetools.eq_(wait(self.handler.create_user("Test", "password")),
+                      True)
+        nosetools.eq_(wait(self.handler.create_user("test", "password")),
+                      False)
+
+        nosetools.eq_(wait(self.handler.check_login("test", "password")),
+                      True)
+        nosetools.eq_(wait(self.handler.check_login("test", "wrong")), False)
+        nosetools.eq_(wait(self.handler.check_login("nobody", "password")),
+                      False)
+
+        user = Mock(name="user")
+        user.authorized = False
+
+        nosetools.eq_(wait(self.handler.login(user, None, "test", "wrong")),
+                      False)
+        nosetools.assert_false(user.authorized)
+
+        nosetools.eq_(wait(self.handler.login(user, None, "test",
+                                              "password")), True)
+        nosetools.assert_true(user.authorized)
+        nosetools.eq_(user.auth_name, "test")
+
+        nosetools.eq_(wait(self.handler.change_password("test", "wrong",
+                                                        "new")), False)
+        nosetools.eq_(wait(self.handler.change_password("test", "password",
+                                                        "new")), True)
+        nosetools.eq_(wait(self.handler.check_login("test", "new")), True)
+
+    def test_replace_hashes(self):
+        """AUTHS | Test passwords are rehashed in the background"""
+        wait(self.handler.create_user("test", "password"))
+
+        self.plugin.config["auth-algo"] = "sha256"
+
+        nosetools.eq_(wait(self.handler.check_login("test", "wrong")), False)
+        nosetools.eq_(self.data["test"]["algo"], "sha512")
+
+        nosetools.eq_(wait(self.handler.check_login("test", "password")),
+                      True)
+
+        end = time.time() + 10
+
+        while self.data["test"]["algo"] != "sha256" and time.time() < end:
+            time.sleep(0.01)
+
+        nosetools.eq_(self.data["test"]["algo"], "sha256")
+        nosetools.eq_(wait(self.handler.check_login("test", "password")),
+                      True)
+
+    def test_login_limits(self):
+        """AUTHS | Test login attempts are throttled before hashing"""
+        self.plugin.config["login-limits"] = {
+            "username": (2, 300), "hostmask": (3, 300)
+        }
+        self.handler.setup_login_limits()
+
+        wait(self.handler.create_user("test", "password"))
+        wait(self.handler.create_user("other", "password"))
+
+        user = Mock(name="user")
+        user.authorized = False
+        user.host = "example.com"
+
+        for _ in xrange(2):
+            nosetools.eq_(wait(self.handler.login(user, None, "test",
+                                                  "wrong")), False)
+
+        self.hasher.check = Mock(name="check")
+
+        failure = wait(self.handler.login(user, None, "Test", "password"))
+        nosetools.assert_true(failure.check(LoginThrottledError))
+        nosetools.assert_false(self.hasher.check.called,
+                               "Throttled logins shouldn't be hashed")
+
+        del self.hasher.check
+
+        nosetools.eq_(wait(self.handler.login(user, None, "other",
+                                              "password")), True)
+
+        failure = wait(self.handler.login(user, None, "other", "password"))
+        nosetools.assert_true(failure.check(LoginThrottledError),
+                              "The host should be throttled too")
+
+        user.host = "example.org"
+        nosetools.eq_(wait(self.handler.login(user, None, "other",
+                                              "password")), True)
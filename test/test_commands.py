@@ -5,13 +5,19 @@ __author__ = 'Gareth Coles'
 """Tests for the command manager"""
 
 import logging
+import threading
 
 import nose
 import nose.tools as nosetools
 from mock import MagicMock as Mock
+from twisted.internet.defer import TimeoutError
+
+from mock_reactor import InlineReactor
+from mock_time import StoppedTime
 
 from system.commands.manager import CommandManager
 from system.enums import CommandState
+from system.workers import WorkerPool
 
 
 class test_commands:
@@ -30,6 +36,12 @@ class test_commands:
         self.manager.aliases = {}
         self.manager.auth_handler = None
         self.manager.perm_handler = None
+        self.manager.clock = CommandManager.clock
+        self.manager.timer = CommandManager.timer
+
+        if self.manager.pool is not None:
+            self.manager.pool.stop()
+            self.manager.pool = None
 
         self.plugin.reset_mock()
         self.plugin.handler.reset_mock()
@@ -247,3 +259,195 @@ class test_commands:
         r = self.manager.run_command("test7", caller, source, protocol, "")
         nosetools.assert_equals(r, (CommandState.Unknown, None))
         nosetools.assert_equals(self.plugin.handler.call_count, 0)
+
+    @nose.with_setup(teardown=teardown)
+    def test_process_input(self):
+        """CMNDS | Test processing input | Prefixes"""
+
+        self.manager.register_command("test", self.plugin.handler,
+                                      self.plugin, default=True)
+
+        caller = Mock(name="caller")
+        source = Mock(name="source")
+        protocol = Mock(name="protocol")
+        protocol.name = "test-protocol"
+
+        # Not commands
+
+        for message in ["", "Hello!", "test", "Ultros test", "Ultros"]:
+            r = self.manager.process_input(message, caller, source, protocol,
+                                           "{NAME}: ", "Ultros")
+            nosetools.assert_equals(r, (CommandState.NotACommand, None))
+
+        nosetools.assert_equals(self.plugin.handler.call_count, 0)
+
+        # Commands, ignoring case
+
+        for message in ["Ultros: test", "ultros: test a b", "ULTROS: test"]:
+            r = self.manager.process_input(message, caller, source, protocol,
+                                           "{NAME}: ", "Ultros")
+            nosetools.assert_equals(r, (CommandState.Success, None))
+
+        nosetools.assert_equals(self.plugin.handler.call_count, 3)
+        nosetools.assert_equals(
+            self.manager.prefixes["test-protocol"].prefix, "ultros: "
+        )
+
+        # Changing our nick changes the prefix
+
+        r = self.manager.process_input("Ultros: test", caller, source,
+                                       protocol, "{NAME}: ", "Ultros2")
+        nosetools.assert_equals(r, (CommandState.NotACommand, None))
+
+        r = self.manager.process_input("Ultros2: test", caller, source,
+                                       protocol, "{NAME}: ", "Ultros2")
+        nosetools.assert_equals(r, (CommandState.Success, None))
+
+        self.manager.prefixes.clear()
+
+    @nose.with_setup(teardown=teardown)
+    def test_lazy_args(self):
+        """CMNDS | Test running commands | Lazy argument parsing"""
+
+        args = []
+        self.plugin.handler.side_effect = lambda *a: args.append(a[-1])
+
+        self.manager.register_command("test", self.plugin.handler,
+                                      self.plugin, default=True)
+
+        caller = Mock(name="caller")
+        source = Mock(name="source")
+        protocol = Mock(name="protocol")
+
+        r = self.manager.run_command("test", caller, source, protocol,
+                                     'one "two three"')
+        nosetools.assert_equals(r, (CommandState.Success, None))
+
+        nosetools.assert_false(args[0].parsed)
+        nosetools.assert_equals(args[0], ["one", "two three"])
+        nosetools.assert_true(args[0].parsed)
+
+        # Unbalanced quotes fall back to splitting on whitespace
+
+        r = self.manager.run_command("test", caller, source, protocol,
+                                     'one "two')
+        nosetools.assert_equals(r, (CommandState.Success, None))
+        nosetools.assert_equals(args[1], ["one", '"two'])
+        nosetools.assert_true(args[1].failed)
+        nosetools.assert_false(args[0].failed)
+
+        self.plugin.handler.side_effect = lambda *a: a[-1][1]
+
+        r = self.manager.run_command("test", caller, source, protocol,
+                                     "page it's")
+        nosetools.assert_equals(r, (CommandState.Success, None))
+
+        self.plugin.handler.side_effect = None
+
+    @nose.with_setup(teardown=teardown)
+    def test_rate_limits(self):
+        """CMNDS | Test running commands | Rate limits"""
+
+        clock = StoppedTime(0)
+        self.manager.timer = clock.time
+
+        nosetools.assert_raises(
+            ValueError, self.manager.register_command, "bad",
+            self.plugin.handler, self.plugin, rate_limit={"planet": (1, 1)}
+        )
+
+        self.manager.register_command("test", self.plugin.handler,
+                                      self.plugin, default=True,
+                                      rate_limit={"user": (2, 60),
+                                                  "channel": (3, 60)})
+
+        protocol = Mock(name="protocol")
+        protocol.name = "protocol"
+        channel = Mock(name="channel")
+        channel.name = "#channel"
+
+        users = []
+
+        for name in ["user1", "user2"]:
+            user = Mock(name=name)
+            user.name = name
+            users.append(user)
+
+        def run(user):
+            return self.manager.run_command("test", user, channel, protocol,
+                                            "")[0]
+
+        nosetools.assert_equals(run(users[0]), CommandState.Success)
+        nosetools.assert_equals(run(users[0]), CommandState.Success)
+        nosetools.assert_equals(run(users[0]), CommandState.RateLimited)
+
+        # The user limit is used up, but the channel still has a use left
+        nosetools.assert_equals(run(users[1]), CommandState.Success)
+        nosetools.assert_equals(run(users[1]), CommandState.RateLimited)
+
+        nosetools.assert_equals(self.plugin.handler.call_count, 3)
+
+        clock.stoppedtime_increment_time(30)
+
+        # Half a minute only gives the user one use back
+        nosetools.assert_equals(run(users[0]), CommandState.Success)
+        nosetools.assert_equals(run(users[0]), CommandState.RateLimited)
+
+        clock.stoppedtime_increment_time(60)
+
+        nosetools.assert_equals(run(users[0]), CommandState.Success)
+        nosetools.assert_equals(self.plugin.handler.call_count, 5)
+
+    @nose.with_setup(teardown=teardown)
+    def test_blocking(self):
+        """CMNDS | Test running commands | Blocking commands"""
+
+        self.manager.pool = WorkerPool("Test", 1, reactor=InlineReactor())
+        self.manager.clock = InlineReactor()
+
+        threads = []
+        results = []
+        gate = threading.Event()
+        waiting = threading.Event()
+
+        def handler(*args):
+            threads.append(threading.current_thread())
+
+            if args[4] == "wait":
+                waiting.set()
+                gate.wait(10)
+            elif args[4] == "fail":
+                raise ValueError("Failed")
+
+        self.manager.register_command("test", handler, self.plugin,
+                                      default=True, blocking=True, timeout=5)
+
+        caller = Mock(name="caller")
+        source = Mock(name="source")
+        protocol = Mock(name="protocol")
+
+        for args in ["", "fail", "wait"]:
+            state, d = self.manager.run_command("test", caller, source,
+                                                protocol, args)
+            nosetools.assert_equals(state, CommandState.Deferred)
+            d.addCallback(results.append)
+
+        # Wait for the last one to start
+        nosetools.assert_true(waiting.wait(10))
+
+        # Time it out, then let it finish anyway
+
+        self.manager.clock.advance(5)
+        gate.set()
+        self.manager.pool.stop()
+
+        nosetools.assert_equals(len(results), 3)
+        nosetools.assert_true(threading.current_thread() not in threads)
+
+        nosetools.assert_equals(results[0], (CommandState.Success, None))
+
+        nosetools.assert_equals(results[1][0], CommandState.Error)
+        nosetools.assert_true(isinstance(results[1][1], ValueError))
+
+        nosetools.assert_equals(results[2][0], CommandState.Error)
+        nosetools.assert_true(isinstance(results[2][1], TimeoutError))
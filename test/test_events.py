@@ -0,0 +1,439 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for the event manager"""
+
+import logging
+import threading
+
+import nose
+import nose.tools as nosetools
+from mock import MagicMock as Mock
+from twisted.internet.defer import Deferred
+
+from system.events.base import BaseEvent
+from system.events.filters import EventFilter
+from system.events.general import MessageReceived
+from system.events.manager import EventManager
+from system.events.mumble import (
+    UserRegistered, UserStats, UserUnregistered
+)
+from system.events.stats import HandlerStats
+from system.protocols.generic.channel import Channel
+from system.protocols.generic.user import User
+from system.workers import PoolOverflowError, WorkerPool
+
+from mock_reactor import InlineReactor
+
+
+def make_plugin(name):
+    plugin = Mock(name=name)
+    plugin.info.name = name
+
+    return plugin
+
+
+class test_events:
+
+    def __init__(self):
+        self.manager = EventManager()
+        self.manager.logger.setLevel(logging.CRITICAL)  # Shut up, logger
+
+    @nosetools.nottest
+    def teardown(self):
+        # Clean up
+        self.manager.callbacks.clear()
+        self.manager.chains.clear()
+        self.manager.indexes.clear()
+        self.manager.stop_pool()
+        self.manager.pool = None
+        self.manager.semaphores.clear()
+        self.manager.stats.clear()
+
+    @nose.with_setup(teardown=teardown)
+    def test_singleton(self):
+        """EVNTS | Test Singleton metaclass"""
+        nosetools.assert_true(self.manager is EventManager())
+
+    @nose.with_setup(teardown=teardown)
+    def test_chain_compiled(self):
+        """EVNTS | Test handler chains are compiled in priority order"""
+        low, high = make_plugin("Low"), make_plugin("High")
+
+        self.manager.add_callback("Test", low, low.handler, 0)
+        self.manager.add_callback("Test", high, high.handler, 10)
+
+        chain = self.manager.chains["Test"]
+
+        nosetools.assert_true(isinstance(chain, tuple))
+        nosetools.assert_equals([h.name for h in chain], ["High", "Low"])
+
+        self.manager.remove_callback("Test", "High")
+        nosetools.assert_equals(
+            [h.name for h in self.manager.chains["Test"]], ["Low"]
+        )
+
+        self.manager.remove_callbacks_for_plugin("Low")
+        nosetools.assert_false("Test" in self.manager.chains)
+        nosetools.assert_false("Test" in self.manager.callbacks)
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback(self):
+        """EVNTS | Test running callbacks"""
+        order = []
+
+        first, second = make_plugin("First"), make_plugin("Second")
+        first.handler.side_effect = lambda e, x: order.append(("first", x))
+        second.handler.side_effect = lambda e: order.append(("second",))
+
+        self.manager.add_callback("Test", first, first.handler, 10,
+                                  extra_args=["arg"])
+        self.manager.add_callback("Test", second, second.handler, 0)
+
+        event = BaseEvent(None)
+        r = self.manager.run_callback("Test", event)
+
+        nosetools.assert_true(r is event)
+        nosetools.assert_equals(order, [("first", "arg"), ("second",)])
+
+        # Unknown callbacks are fine too
+        nosetools.assert_true(self.manager.run_callback("Nope", event) is
+                              event)
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback_filters(self):
+        """EVNTS | Test filters and cancellation when running callbacks"""
+        yes, no = make_plugin("Yes"), make_plugin("No")
+        bad = make_plugin("Bad")
+
+        self.manager.add_callback("Test", yes, yes.handler, 0,
+                                  lambda e: True, cancelled=True)
+        self.manager.add_callback("Test", no, no.handler, 0,
+                                  lambda e: False)
+        self.manager.add_callback("Test", bad, bad.handler, 0, "not callable")
+
+        event = BaseEvent(None)
+        self.manager.run_callback("Test", event)
+
+        nosetools.assert_equals(yes.handler.call_count, 1)
+        nosetools.assert_equals(no.handler.call_count, 0)
+        nosetools.assert_equals(bad.handler.call_count, 0)
+
+        other = make_plugin("Other")
+        self.manager.add_callback("Test", other, other.handler, 0)
+
+        event.cancelled = True
+        self.manager.run_callback("Test", event)
+
+        nosetools.assert_equals(yes.handler.call_count, 2)
+        nosetools.assert_equals(other.handler.call_count, 0)
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback_exception(self):
+        """EVNTS | Test handler exceptions don't stop other handlers"""
+        broken, fine = make_plugin("Broken"), make_plugin("Fine")
+        broken.handler.side_effect = Exception("Boom!")
+
+        self.manager.add_callback("Test", broken, broken.handler, 10)
+        self.manager.add_callback("Test", fine, fine.handler, 0)
+
+        self.manager.run_callback("Test", BaseEvent(None))
+
+        nosetools.assert_equals(broken.handler.call_count, 1)
+        nosetools.assert_equals(fine.handler.call_count, 1)
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback_threaded(self):
+        """EVNTS | Test running callbacks in the worker pool"""
+        threads = []
+        results = []
+
+        one, two = make_plugin("One"), make_plugin("Two")
+        one.handler.side_effect = lambda e: threads.append(
+            threading.current_thread()
+        )
+        two.handler.side_effect = Exception("Boom!")
+
+        self.manager.add_callback("Test", one, one.handler, 0)
+        self.manager.add_callback("Test", two, two.handler, 0)
+
+        self.manager.pool = WorkerPool("Test", reactor=InlineReactor())
+
+        event = BaseEvent(None)
+        d = self.manager.run_callback("Test", event, threaded=True)
+        d.addCallback(results.append)
+
+        self.manager.stop_pool()
+
+        nosetools.assert_equals(results, [event])
+        nosetools.assert_true(event.threaded)
+        nosetools.assert_equals(two.handler.call_count, 1)
+        nosetools.assert_false(threads[0] is threading.current_thread())
+
+        # Unknown callbacks still give you a Deferred
+        d = self.manager.run_callback("Nope", event, threaded=True)
+        d.addCallback(results.append)
+
+        nosetools.assert_equals(results, [event, event])
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback_async(self):
+        """EVNTS | Test running callbacks asynchronously"""
+        order = []
+        waiting = Deferred()
+
+        first, second, third = (make_plugin("First"), make_plugin("Second"),
+                                make_plugin("Third"))
+
+        def cancel(result, event):
+            order.append("first done")
+            event.cancelled = True
+
+        def first_handler(event):
+            order.append("first")
+            return waiting.addCallback(cancel, event)
+
+        first.handler.side_effect = first_handler
+        second.handler.side_effect = lambda e: order.append("second")
+        third.handler.side_effect = lambda e: order.append("third")
+
+        self.manager.add_callback("Test", first, first.handler, 10)
+        self.manager.add_callback("Test", second, second.handler, 5)
+        self.manager.add_callback("Test", third, third.handler, 0,
+                                  cancelled=True)
+
+        event = BaseEvent(None)
+        results = []
+
+        d = self.manager.run_callback_async("Test", event)
+        d.addCallback(results.append)
+
+        nosetools.assert_equals(order, ["first"])
+        nosetools.assert_equals(results, [])
+
+        waiting.callback(None)
+
+        nosetools.assert_equals(order, ["first", "first done", "third"])
+        nosetools.assert_equals(results, [event])
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback_async_timeout(self):
+        """EVNTS | Test async handler timeouts"""
+        clock = InlineReactor()
+        self.manager.clock = clock
+
+        slow, fast = make_plugin("Slow"), make_plugin("Fast")
+        slow.handler.return_value = Deferred()
+
+        self.manager.add_callback("Test", slow, slow.handler, 10, timeout=5)
+        self.manager.add_callback("Test", fast, fast.handler, 0)
+
+        results = []
+        d = self.manager.run_callback_async("Test", BaseEvent(None))
+        d.addCallback(results.append)
+
+        clock.advance(4)
+        nosetools.assert_equals(fast.handler.call_count, 0)
+
+        clock.advance(1)
+        nosetools.assert_equals(fast.handler.call_count, 1)
+        nosetools.assert_equals(len(results), 1)
+
+        del self.manager.clock
+
+    @nose.with_setup(teardown=teardown)
+    def test_run_callback_async_limits(self):
+        """EVNTS | Test async callback concurrency limits"""
+        waiting = []
+
+        plugin = make_plugin("Plugin")
+        plugin.handler.side_effect = lambda e: waiting.append(Deferred()) or \
+            waiting[-1]
+
+        self.manager.add_callback("Test", plugin, plugin.handler, 0)
+        self.manager.set_concurrency_limit("Test", 2)
+        self.manager.async_backlog = 1
+
+        failures = []
+
+        for x in range(4):
+            d = self.manager.run_callback_async("Test", BaseEvent(None))
+            d.addErrback(lambda f: failures.append(f.value))
+
+        # Two running, one waiting, one refused
+        nosetools.assert_equals(plugin.handler.call_count, 2)
+        nosetools.assert_equals(len(failures), 1)
+        nosetools.assert_true(isinstance(failures[0], PoolOverflowError))
+
+        waiting[0].callback(None)
+        nosetools.assert_equals(plugin.handler.call_count, 3)
+
+        self.manager.set_concurrency_limit("Test", None)
+        del self.manager.async_backlog
+
+    @nose.with_setup(teardown=teardown)
+    def test_declarative_filters(self):
+        """EVNTS | Test declarative, indexed event filters"""
+        protocol = Mock(name="protocol")
+        protocol.name = "Esper"
+        protocol.TYPE = "irc"
+
+        channel = Channel("#Ultros", protocol)
+        user = User("Someone", protocol)
+
+        irc, chan, ultros, users, notices = (
+            make_plugin("IRC"), make_plugin("Channels"),
+            make_plugin("Ultros"), make_plugin("Users"), make_plugin("Notices")
+        )
+
+        self.manager.add_callback("Test", irc, irc.handler, 0,
+                                  EventFilter(protocol_type="irc"))
+        self.manager.add_callback("Test", chan, chan.handler, 0,
+                                  EventFilter(target_type="channel",
+                                              event_type=MessageReceived))
+        self.manager.add_callback("Test", ultros, ultros.handler, 0,
+                                  EventFilter(protocol="esper",
+                                              channel=["#ultros", "#other"]))
+        self.manager.add_callback("Test", users, users.handler, 0,
+                                  EventFilter(target_type="user"))
+        self.manager.add_callback("Test", notices, notices.handler, 0,
+                                  EventFilter(message_type="notice"))
+
+        for x in range(3):
+            self.manager.run_callback(
+                "Test", MessageReceived(protocol, user, channel, "", "message")
+            )
+
+        nosetools.assert_equals(irc.handler.call_count, 3)
+        nosetools.assert_equals(chan.handler.call_count, 3)
+        nosetools.assert_equals(ultros.handler.call_count, 3)
+        nosetools.assert_equals(users.handler.call_count, 0)
+        nosetools.assert_equals(notices.handler.call_count, 0)
+
+        # One signature, so the matching handlers were only worked out once
+        nosetools.assert_equals(len(self.manager.indexes["Test"]), 1)
+
+        self.manager.run_callback(
+            "Test", MessageReceived(protocol, user, user, "", "notice")
+        )
+
+        nosetools.assert_equals(irc.handler.call_count, 4)
+        nosetools.assert_equals(chan.handler.call_count, 3)
+        nosetools.assert_equals(users.handler.call_count, 1)
+        nosetools.assert_equals(notices.handler.call_count, 1)
+
+        nosetools.assert_true(EventFilter(protocol_type="irc")(
+            MessageReceived(protocol, user, user, "", "notice")
+        ))
+        nosetools.assert_raises(ValueError, EventFilter, target_type="herp")
+
+        # Changing the handlers throws the index away
+        self.manager.remove_callback("Test", "IRC")
+        nosetools.assert_equals(self.manager.indexes["Test"], {})
+
+    @nose.with_setup(teardown=teardown)
+    def test_stats(self):
+        """EVNTS | Test handler call counts and timings"""
+        now = [0.0]
+
+        def timer():
+            return now[0]
+
+        self.manager.timer = timer
+        self.manager.stats_sample_rate = 2
+        self.manager.slow_threshold = 1.5
+        self.manager.logger.warn = Mock()
+
+        slow, broken = make_plugin("Slow"), make_plugin("Broken")
+
+        def slow_handler(event):
+            now[0] += 2.0
+
+        slow.handler.side_effect = slow_handler
+        broken.handler.side_effect = Exception("Boom!")
+
+        self.manager.add_callback("Test", slow, slow.handler, 10)
+        self.manager.add_callback("Test", broken, broken.handler, 0)
+
+        for x in range(4):
+            self.manager.run_callback("Test", BaseEvent(None))
+
+        stats = self.manager.get_stats()
+
+        nosetools.assert_equals([(s.plugin, s.calls, s.errors) for s in stats],
+                                [("Slow", 4, 0), ("Broken", 4, 4)])
+
+        # Only every other call was timed
+        nosetools.assert_equals(stats[0].timed, 2)
+        nosetools.assert_equals(stats[0].mean, 2.0)
+        nosetools.assert_equals(stats[0].max, 2.0)
+        nosetools.assert_equals(stats[0].estimated_total, 8.0)
+        nosetools.assert_equals(stats[0].histogram, [0, 0, 0, 0, 2, 0])
+        nosetools.assert_equals(self.manager.logger.warn.call_count, 2)
+
+        nosetools.assert_equals(self.manager.get_stats(plugin="Broken"),
+                                [stats[1]])
+        nosetools.assert_equals(self.manager.get_stats("Nope"), [])
+
+        # Stats survive handlers being changed, but not plugins going away
+        self.manager.remove_callback("Test", "Broken")
+        nosetools.assert_equals(self.manager.chains["Test"][0].stats.calls, 4)
+
+        self.manager.reset_stats()
+        nosetools.assert_equals(stats[0].calls, 0)
+
+        self.manager.remove_callbacks_for_plugin("Slow")
+        nosetools.assert_equals(self.manager.get_stats(plugin="Slow"), [])
+
+        del self.manager.timer, self.manager.stats_sample_rate, \
+            self.manager.slow_threshold, self.manager.logger.warn
+
+    def test_handler_stats(self):
+        """EVNTS | Test the HandlerStats histogram and summaries"""
+        stats = HandlerStats("Test", "Plugin")
+
+        nosetools.assert_equals(stats.mean, 0.0)
+
+        for elapsed in [0.0005, 0.005, 0.05, 0.5, 5, 50]:
+            stats.record(elapsed)
+
+        nosetools.assert_equals(stats.histogram, [1, 1, 1, 1, 1, 1])
+        nosetools.assert_equals(stats.max, 50)
+        nosetools.assert_equals(stats.as_dict()["histogram"][-1], (None, 1))
+
+    def test_slots(self):
+        """EVNTS | Test events and users use slots, with a dict fallback"""
+        user = User("Someone", None)
+        event = MessageReceived(None, user, user, "Hello!", "message")
+
+        nosetools.assert_false(event.cancelled)
+        nosetools.assert_equals(event.type, "message")
+        nosetools.assert_true("type" in MessageReceived.__slots__)
+
+        # Everything so far has gone into a slot
+        nosetools.assert_equals(event.__dict__, {})
+        nosetools.assert_equals(user.__dict__, {})
+
+        event.something_else = True
+        user.something_else = True
+
+        nosetools.assert_true(event.something_else)
+        nosetools.assert_equals(event.__dict__, {"something_else": True})
+        nosetools.assert_equals(user.__dict__, {"something_else": True})
+
+    def test_mumble_slots(self):
+        """EVNTS | Test Mumble user events keep everything in slots"""
+        user = User("Someone", None)
+
+        events = [
+            UserStats(None, user),
+            UserRegistered(None, user, 1, user),
+            UserUnregistered(None, user, 1, user)
+        ]
+
+        for event in events:
+            nosetools.assert_equals(event.__dict__, {})
+
+        nosetools.assert_equals(UserRegistered.__slots__, [])
+        nosetools.assert_equals(UserUnregistered.__slots__, [])
@@ -0,0 +1,460 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for the logging system"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import nose.tools as nosetools
+from mock import MagicMock as Mock
+
+from logbook import TestHandler, NullHandler
+
+from system.commands.manager import CommandManager
+from system.enums import OverflowPolicy
+from system.events.general import MessageReceived
+from system.events.manager import EventManager
+from system.logging import logger, shim
+from system.logging.dispatch import QueuedDispatcher
+from system.logging.handlers.structured import NDJSONHandler, parse_size
+
+# Not from logbook, as the shim shifts them
+INFO, DEBUG, TRACE = shim.our_INFO, shim.our_DEBUG, shim.our_TRACE
+
+
+class ClosingTestHandler(TestHandler):
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super(ClosingTestHandler, self).close()
+
+
+class BlockingTestHandler(TestHandler):
+    def __init__(self, *args, **kwargs):
+        super(BlockingTestHandler, self).__init__(*args, **kwargs)
+
+        self.gate = threading.Event()
+
+    def emit(self, record):
+        self.gate.wait(10)
+        super(BlockingTestHandler, self).emit(record)
+
+
+class Counted(object):
+    """
+    Counts how many times it's been turned into a string.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "Counted"
+
+    def __unicode__(self):
+        self.count += 1
+        return u"Counted"
+
+    __repr__ = __str__
+
+
+class test_logging:
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+        # Put back in teardown, so that other tests aren't affected
+        self.configured = logger.configuration["configured"]
+        self.file_config = logger.configuration["handlers"]["file"]
+
+        file_config = list(self.file_config)
+        file_config[0] = os.path.join(self.directory, "output.log")
+        logger.configuration["handlers"]["file"] = file_config
+
+        logger.configure(None)
+
+        logger.configuration["handlers"]["test"] = True
+        logger.handler_before("test", "null")
+        logger.add_handler("test", ClosingTestHandler)
+
+        logger.flush(10)  # Anything logged by configure()
+
+    def teardown(self):
+        logger.remove_handler("test")
+        logger.handler_order.remove("test")
+        del logger.configuration["handlers"]["test"]
+
+        logger.configuration["handlers"]["file"] = self.file_config
+        logger.configuration["configured"] = self.configured
+
+        logger.redo_all_handlers()  # Closes the ones we made
+        logger.shutdown()
+
+        shutil.rmtree(self.directory)
+
+    def find_handler(self):
+        for handler in logger.get_handlers():
+            if isinstance(handler, ClosingTestHandler):
+                return handler
+
+    def test_shared_handlers(self):
+        """LOGGING | Test that loggers share handler instances"""
+
+        one = logger.getLogger("LoggingTestOne")
+        two = logger.getLogger("LoggingTestTwo")
+
+        nosetools.assert_true(one.handlers is two.handlers)
+
+        handlers = logger.get_handlers()
+        nosetools.eq_(
+            len(handlers), len(set(type(x) for x in handlers)),
+            "Each handler should only be created once"
+        )
+
+        handler = self.find_handler()
+
+        one.info("One")
+        two.info("Two")
+        two.debug("Not logged")
+
+        nosetools.assert_true(logger.flush(10))
+        nosetools.eq_([r.message for r in handler.records], ["One", "Two"])
+
+    def test_redo_handlers(self):
+        """LOGGING | Test that redoing handlers swaps them for every logger"""
+
+        one = logger.getLogger("LoggingTestOne")
+        old = self.find_handler()
+
+        logger.redo_all_handlers()
+        new = self.find_handler()
+
+        nosetools.assert_true(logger.flush(10))
+
+        nosetools.assert_false(old is new)
+        nosetools.assert_true(old.closed, "Old handlers should be closed")
+        nosetools.assert_false(new.closed)
+
+        one.info("Message")
+        logger.flush(10)
+
+        nosetools.eq_(len(old.records), 0)
+        nosetools.eq_(len(new.records), 1)
+
+        nosetools.assert_true(new in logger.get_handlers())
+        nosetools.assert_true(
+            logger.getLogger("LoggingTestTwo").handlers is one.handlers
+        )
+
+    def make_dispatcher(self, overflow):
+        handler = BlockingTestHandler()
+        dispatcher = QueuedDispatcher([handler, NullHandler()], 2, overflow)
+
+        log = shim.OurLogger("LoggingTestQueue")
+        log.handlers = [dispatcher]
+
+        return handler, dispatcher, log
+
+    def test_queue_drops_low_priority(self):
+        """LOGGING | Test that full queues drop debug records first"""
+
+        handler, dispatcher, log = self.make_dispatcher(
+            OverflowPolicy.DropOldest
+        )
+
+        log.info("Writing")  # Held up by the handler
+        nosetools.assert_true(dispatcher.flush(0.1) is False)
+
+        log.debug("Debug")
+        log.info("One")
+        log.info("Two")  # Drops "Debug"
+        log.debug("Dropped")  # New debug records are dropped
+        log.info("Three")  # Drops "One"
+
+        nosetools.eq_(dispatcher.dropped, 3)
+
+        handler.gate.set()
+        nosetools.assert_true(dispatcher.flush(10))
+
+        nosetools.eq_([r.message for r in handler.records],
+                      ["Writing", "Two", "Three"])
+        dispatcher.stop()
+
+    def test_queue_drains_on_stop(self):
+        """LOGGING | Test that stopping a queue writes what's left in it"""
+
+        handler, dispatcher, log = self.make_dispatcher(OverflowPolicy.Block)
+        log.level = INFO
+
+        log.info("One")
+        log.info("Two")
+        log.info("Three")
+        log.debug("Not queued")
+
+        nosetools.assert_true(dispatcher.pending >= 2)
+
+        thread = threading.Thread(target=log.info, args=("Blocked",))
+        thread.start()
+        thread.join(0.1)
+
+        nosetools.assert_true(thread.is_alive(), "Should block when full")
+
+        handler.gate.set()
+        thread.join(10)
+        dispatcher.stop()
+
+        nosetools.eq_(dispatcher.pending, 0)
+        nosetools.eq_([r.message for r in handler.records],
+                      ["One", "Two", "Three", "Blocked"])
+
+        log.info("After")  # Handled right away
+        nosetools.eq_(handler.records[-1].message, "After")
+
+    def test_lazy_formatting(self):
+        """LOGGING | Test that records are only formatted when they're used"""
+
+        log = logger.getLogger("LoggingTestLazy")
+        counted = Counted()
+
+        nosetools.assert_true(log.is_enabled_for(INFO))
+        nosetools.assert_false(log.is_enabled_for(DEBUG))
+
+        log.debug("Debug: %s", counted)
+        log.trace("Trace: %s", counted)
+        logger.flush(10)
+
+        nosetools.eq_(counted.count, 0)
+
+        log.info("Info: %s", counted)
+        logger.flush(10)
+
+        nosetools.eq_(counted.count, 1)
+        nosetools.eq_(self.find_handler().records[-1].message,
+                      "Info: Counted")
+
+    def test_format_styles(self):
+        """LOGGING | Test that %-style and {}-style messages are formatted"""
+
+        log = logger.getLogger("LoggingTestStyles")
+
+        log.info("Percent: %s %s", "a", 1)
+        log.info("Mapping: %(x)s", {"x": "b"})
+        log.info("Braces: {0} {1}", "c", 2)
+        log.info("Empty braces: {} by {}", "d", 3, "ignored")
+        log.info("Keywords: {x}", x="e")
+        log.info(u"Unicode: %s", "f")
+
+        logger.flush(10)
+
+        records = self.find_handler().records[-6:]
+
+        nosetools.eq_([r.message for r in records], [
+            "Percent: a 1", "Mapping: b", "Braces: c 2",
+            "Empty braces: d by 3", "Keywords: e", "Unicode: f"
+        ])
+
+    def test_dispatch_does_not_format(self):
+        """LOGGING | Test that message dispatch at INFO does no formatting"""
+
+        events, commands = EventManager(), CommandManager()
+        levels = [events.logger.level, commands.logger.level]
+
+        # Other tests quieten these
+        events.logger.logger.level = commands.logger.logger.level = TRACE
+
+        formatted = []
+        format_message = shim.OurLogRecord._format_message
+
+        def _format_message(record, *args, **kwargs):
+            formatted.append(record.level)
+            return format_message(record, *args, **kwargs)
+
+        shim.OurLogRecord._format_message = _format_message
+
+        plugin, caller, source = Mock(), Mock(), Mock()
+        caller.name = "test-protocol"
+        plugin.info.name = "LoggingTest"
+
+        message, user = Counted(), Counted()
+
+        try:
+            events.add_callback("MessageReceived", plugin, plugin.handler, 0)
+            commands.register_command("logtest", plugin.command, plugin,
+                                      default=True)
+
+            for i in xrange(10):
+                event = MessageReceived(caller, user, source, message,
+                                        "message")
+                events.run_callback("MessageReceived", event)
+
+                # The command is logged at INFO, and that's fine
+                commands.process_input("Ultros: logtest %s" % i, plugin,
+                                       source, caller, "{NAME}: ", "Ultros")
+                commands.process_input("Not a command", plugin, source,
+                                       caller, "{NAME}: ", "Ultros")
+
+            logger.flush(10)
+        finally:
+            shim.OurLogRecord._format_message = format_message
+
+            events.remove_callbacks_for_plugin(plugin)
+            commands.unregister_commands_for_owner(plugin)
+            commands.prefixes.clear()
+
+            events.logger.logger.level = levels[0]
+            commands.logger.logger.level = levels[1]
+
+        nosetools.eq_(plugin.handler.call_count, 10)
+        nosetools.eq_(plugin.command.call_count, 10)
+
+        nosetools.eq_([x for x in formatted if x < INFO], [],
+                      "Debug and trace records were formatted")
+        nosetools.eq_(message.count + user.count, 0,
+                      "Event arguments were turned into strings")
+
+    def make_ndjson_handler(self, **kwargs):
+        directory = tempfile.mkdtemp()
+        now = [0]
+
+        handler = NDJSONHandler(os.path.join(directory, "output.ndjson"),
+                                **kwargs)
+        handler.clock = lambda: now[0]
+
+        log = shim.OurLogger("LoggingTestJSON")
+        log.handlers = [handler]
+        log.extra["protocol"] = "test-protocol"
+
+        return directory, now, handler, log
+
+    def read_ndjson(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+
+        with opener(path, "rb") as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_ndjson_rotation(self):
+        """LOGGING | Test that NDJSON logs are rotated by size and time"""
+
+        directory, now, handler, log = self.make_ndjson_handler(
+            max_size=parse_size("300 B"), interval=60
+        )
+
+        try:
+            for i in xrange(6):
+                log.info("Message %s", i)  # About 130 bytes each
+                now[0] += 1
+
+            log.info("Exception", exc_info=(ValueError, ValueError(), None))
+
+            now[0] = 60  # Next minute - rotated, even though it's small
+            log.info("Next minute")
+
+            handler.close()  # Waits for compression
+
+            rotated = handler.get_rotated_files()
+
+            nosetools.eq_(len(rotated), 4)
+            nosetools.assert_true(all(x.endswith(".gz") for x in rotated))
+
+            records = []
+
+            for path in rotated + [handler.filename]:
+                records.extend(self.read_ndjson(path))
+
+            expected = ["Message %s" % i for i in xrange(6)]
+            expected.extend(["Exception", "Next minute"])
+
+            nosetools.eq_([x["message"] for x in records], expected)
+
+            nosetools.eq_(records[0]["channel"], "LoggingTestJSON")
+            nosetools.eq_(records[0]["level"], "INFO")
+            nosetools.eq_(records[0]["protocol"], "test-protocol")
+            nosetools.eq_(records[0]["time"][-1], "Z")
+            nosetools.assert_true("ValueError" in records[-2]["exception"])
+        finally:
+            handler.close()
+            shutil.rmtree(directory)
+
+    def test_ndjson_new_period(self):
+        """LOGGING | Test that NDJSON logs start new periods when empty"""
+
+        directory, now, handler, log = self.make_ndjson_handler(interval=60)
+
+        try:
+            with handler._lock:
+                handler._open()  # Empty until the next period
+
+            now[0] = 61
+            log.info("One")
+
+            now[0] = 62
+            log.info("Two")
+
+            handler.close()
+
+            nosetools.eq_(handler.get_rotated_files(), [])
+            nosetools.eq_(
+                [x["message"] for x in self.read_ndjson(handler.filename)],
+                ["One", "Two"]
+            )
+        finally:
+            handler.close()
+            shutil.rmtree(directory)
+
+    def test_ndjson_missing_directory(self):
+        """LOGGING | Test that NDJSON logs can go in a new directory"""
+
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "new", "output.ndjson")
+
+        try:
+            handler = NDJSONHandler(filename)
+            nosetools.eq_(handler._thread, None, "Nothing to tidy up")
+
+            log = shim.OurLogger("LoggingTestJSON")
+            log.handlers = [handler]
+            log.info("Message")
+
+            handler.close()
+
+            nosetools.eq_(self.read_ndjson(filename)[0]["message"],
+                          "Message")
+        finally:
+            shutil.rmtree(directory)
+
+    def test_ndjson_budget(self):
+        """LOGGING | Test that old NDJSON logs are deleted to fit the budget"""
+
+        directory, now, handler, log = self.make_ndjson_handler(
+            max_size=100, budget=500, compress=False
+        )
+
+        try:
+            for i in xrange(10):
+                log.info("Message %s", i)  # One file each
+                now[0] += 1
+
+            handler.close()
+
+            rotated = handler.get_rotated_files()
+            paths = rotated + [handler.filename]
+
+            nosetools.assert_true(
+                sum(os.path.getsize(x) for x in paths) <= 500
+            )
+            nosetools.assert_true(len(rotated) >= 2)
+
+            messages = [self.read_ndjson(x)[0]["message"] for x in paths]
+            nosetools.eq_(messages[-1], "Message 9")
+            nosetools.eq_(messages, sorted(messages), "Oldest weren't deleted")
+        finally:
+            handler.close()
+            shutil.rmtree(directory)
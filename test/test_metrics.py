@@ -0,0 +1,128 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for exception reporting"""
+
+import sys
+import threading
+import time
+
+import nose.tools as nosetools
+
+from system.metrics import ExceptionReporter, get_signature
+
+
+def get_exc_info(func):
+    try:
+        func()
+    except Exception:
+        return sys.exc_info()
+
+
+def fail_one():
+    raise ValueError("One")
+
+
+def fail_two(value):
+    raise KeyError(value)
+
+
+class test_metrics:
+
+    def setup(self):
+        self.gate = threading.Event()
+        self.sending = threading.Event()
+        self.reports = []
+
+    def send(self, report):
+        # Stands in for the metrics service
+        self.sending.set()
+        self.gate.wait(10)
+        self.reports.append(report)
+
+    def wait_for(self, count):
+        deadline = time.time() + 10
+
+        while len(self.reports) < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_signatures(self):
+        """METRICS | Test that exceptions are grouped by where they happen"""
+
+        one, two = get_exc_info(fail_one), get_exc_info(fail_one)
+
+        # Different messages, same place
+        others = [get_exc_info(lambda: fail_two(x)) for x in ("a", "b")]
+
+        nosetools.eq_(get_signature(one), get_signature(two))
+        nosetools.eq_(get_signature(others[0]), get_signature(others[1]))
+
+        nosetools.assert_not_equal(get_signature(one),
+                                   get_signature(others[0]))
+
+    def test_reporter_deduplicates(self):
+        """METRICS | Test that queued exceptions are counted, not repeated"""
+
+        reporter = ExceptionReporter(self.send, size=2)
+
+        try:
+            reporter.submit(get_exc_info(fail_one))
+            nosetools.assert_true(self.sending.wait(10))  # Held up
+
+            for i in xrange(5):
+                nosetools.assert_true(
+                    reporter.submit(get_exc_info(fail_one))
+                )
+
+            for i in xrange(3):
+                reporter.submit(get_exc_info(lambda: fail_two(i)))
+
+            nosetools.eq_(reporter.pending, 2)
+
+            # A third kind of exception doesn't fit
+            nosetools.assert_false(
+                reporter.submit(get_exc_info(lambda: 1 / 0))
+            )
+            nosetools.eq_(reporter.dropped, 1)
+
+            self.gate.set()
+            self.wait_for(3)
+        finally:
+            reporter.stop(10)
+
+        nosetools.eq_(
+            [(r["type"], r["count"]) for r in self.reports],
+            [
+                ("<type 'exceptions.ValueError'>", 1),
+                ("<type 'exceptions.ValueError'>", 5),
+                ("<type 'exceptions.KeyError'>", 3)
+            ]
+        )
+
+        nosetools.eq_(self.reports[0]["value"], "One")
+        nosetools.assert_true("fail_one" in self.reports[0]["traceback"])
+        # The first of the three is the one that's sent
+        nosetools.eq_(self.reports[2]["scope"], {"value": "0"})
+
+    def test_reporter_rate_limit(self):
+        """METRICS | Test that exception reports are rate limited"""
+
+        self.gate.set()
+        reporter = ExceptionReporter(self.send, rate=2, period=60)
+
+        try:
+            reporter.submit(get_exc_info(fail_one))
+            reporter.submit(get_exc_info(lambda: fail_two(1)))
+            reporter.submit(get_exc_info(lambda: fail_two(2)))
+
+            self.wait_for(2)
+            time.sleep(0.1)
+
+            nosetools.eq_(len(self.reports), 2)
+            nosetools.eq_(reporter.pending, 1)
+        finally:
+            reporter.stop(10)
+
+        nosetools.eq_(reporter.dropped, 1, "Should be dropped when stopped")
+        nosetools.assert_false(reporter.submit(get_exc_info(fail_one)))
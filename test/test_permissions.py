@@ -14,9 +14,11 @@ import shutil
 import yaml
 
 import nose.tools as nosetools
+from mock import MagicMock as Mock
 
-from plugins.auth.permissions_handler import permissionsHandler
-from system.logging.logger import configure
+from plugins.auth.permissions_handler import permissionsHandler, \
+    PermissionMatcher
+from system.logging import logger
 from system.plugin import PluginObject
 from system.storage import formats
 from system.storage.manager import StorageManager
@@ -25,6 +27,10 @@ from system.logging.logger import getLogger
 
 tmpdir = tempfile.mkdtemp()
 
+# Put back once we're done, so that other tests aren't affected
+saved_file_config = logger.configuration["handlers"]["file"]
+saved_configured = logger.configuration["configured"]
+
 
 class TestPlugin(PluginObject):
     data = None
@@ -40,7 +46,13 @@ class TestPlugin(PluginObject):
         pass
 
     def __init__(self):
-        configure(None)
+        # Log to our temporary directory, rather than the real logs
+        file_config = list(logger.configuration["handlers"]["file"])
+        file_config[0] = os.path.join(tmpdir, "output.log")
+
+        logger.configuration["handlers"]["file"] = file_config
+        logger.configure(None)
+
         self.logger = getLogger("Permissions")
 
         self.confdir = tmpdir + "/config/"
@@ -71,6 +83,12 @@ class TestPlugin(PluginObject):
         del cls.storage
         del cls.handler
 
+        logger.configuration["handlers"]["file"] = saved_file_config
+        logger.configuration["configured"] = saved_configured
+
+        logger.redo_all_handlers()  # Closes the ones we made
+        logger.shutdown()
+
         shutil.rmtree(tmpdir)
 
     # Actual tests
@@ -80,6 +98,131 @@ class TestPlugin(PluginObject):
         PERMS | Test permissions handler addition functions\n
         """
 
+    def test_compiled(self):
+        """
+        PERMS | Test compiled permissions match like compare_permissions\n
+        """
+
+        nodes = ["nose.test", "Nose.Upper", "nose.wild.*", "nose.?ingle",
+                 "nose.[ab]racket", "/nose\\.re+gex/", "/NOSE\\.FLAGS/i",
+                 "^nose.wild.denied", "^/nose\\.reeegex/", "^nose.test"]
+
+        permissions = ["nose.test", "nose.upper", "nose.wild.card",
+                       "nose.wild.", "nose.wild.denied", "nose.single",
+                       "nose.ssingle", "nose.aracket", "nose.cracket",
+                       "nose.regex", "nose.reeegex", "nose.regexes",
+                       "nose.flags", "nose", "nose.wild\ncard", ""]
+
+        matcher = PermissionMatcher(nodes)
+
+        for permission in permissions:
+            nosetools.eq_(
+                matcher.matches(permission),
+                self.handler.compare_permissions(permission, nodes),
+                "Mismatch for %r" % permission
+            )
+
+        nosetools.eq_(PermissionMatcher([]).matches("nose.test"), False)
+
+    def test_invalidation(self):
+        """
+        PERMS | Test compiled permissions are rebuilt when data changes\n
+        """
+
+        self.handler.create_group("compiled")
+        nosetools.eq_(
+            self.handler.group_has_permission("compiled", "nose.compiled"),
+            False
+        )
+
+        self.handler.add_group_permission("compiled", "nose.compiled")
+        nosetools.eq_(
+            self.handler.group_has_permission("compiled", "nose.compiled"),
+            True
+        )
+
+        with self.data:
+            self.data["groups"]["compiled"]["permissions"] = []
+
+        self.data.reload()
+
+        nosetools.eq_(
+            self.handler.group_has_permission("compiled", "nose.compiled"),
+            False
+        )
+
+        self.handler.remove_group("compiled")
+
+    def test_decision_cache(self):
+        """
+        PERMS | Test check results are cached, and forgotten on changes\n
+        """
+
+        # Put back anything we change here, so other tests aren't affected
+        attributes = ["config", "factory_manager"]
+        saved = dict((x, self.__dict__[x]) for x in attributes
+                     if x in self.__dict__)
+        decisions_size = self.handler.decisions_size
+
+        try:
+            self.config = {"use-superuser": True}
+            self.factory_manager = Mock(name="factory_manager")
+
+            protocol = self.factory_manager.get_protocol.return_value
+            protocol.get_extra_groups.return_value = []
+
+            self.handler.create_user("cached")
+            self.handler.create_group("cached-rank")
+            self.handler.add_group_permission("default", "nose.cached")
+            self.handler.add_group_permission("cached-rank", "nose.ranked")
+
+            def check(permission):
+                return self.handler.check(permission, "cached", "#nose",
+                                          "nose-test")
+
+            nosetools.eq_(check("nose.cached"), True)
+            nosetools.eq_(check("nose.cached"), True)
+            nosetools.eq_(check("nose.ranked"), False)
+
+            stats = self.handler.get_cache_stats()
+            nosetools.eq_(stats["hits"], 1)
+            nosetools.eq_(stats["misses"], 2)
+
+            # Extra groups are always looked up, and are part of the key
+            protocol.get_extra_groups.return_value = ["cached-rank"]
+            nosetools.eq_(check("nose.ranked"), True)
+            protocol.get_extra_groups.return_value = []
+            nosetools.eq_(check("nose.ranked"), False)
+
+            self.handler.remove_group_permission("default", "nose.cached")
+            nosetools.eq_(self.handler.get_cache_stats()["size"], 0)
+            nosetools.eq_(check("nose.cached"), False)
+
+            self.handler.set_user_option("cached", "superadmin", True)
+            nosetools.eq_(check("nose.cached"), True)
+
+            self.handler.remove_user("cached")
+            self.handler.remove_group("cached-rank")
+
+            self.handler.decisions_size = 2
+
+            for permission in ["nose.a", "nose.b", "nose.a", "nose.c"]:
+                check(permission)
+
+            nosetools.eq_(self.handler.decisions.keys(), [
+                ("cached", "nose.a", "nose-test", "#nose", (), True),
+                ("cached", "nose.c", "nose-test", "#nose", (), True)
+            ])
+        finally:
+            for name in attributes:
+                if name in saved:
+                    setattr(self, name, saved[name])
+                else:
+                    self.__dict__.pop(name, None)
+
+            self.handler.decisions_size = decisions_size
+            self.handler.invalidate()
+
     def test_deletions(self):
         """
         PERMS | Test permissions handler deletion functions\n
@@ -0,0 +1,60 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for protocol input recordings"""
+
+import gzip
+import os
+import shutil
+import tempfile
+
+import nose.tools as nosetools
+from mock import Mock
+
+from profiling.recording import Recorder, Recording, RecordingError
+
+
+class test_recording:
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.rec")
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """RCRDS | Test recording and reading back protocol input"""
+        protocol = Mock(name="protocol")
+        protocol.name = "Esper"
+        protocol.TYPE = "irc"
+        original = protocol.dataReceived
+
+        recorder = Recorder(protocol, self.path)
+        recorder.start()
+
+        protocol.dataReceived("PING :one\r\n")
+        protocol.dataReceived("\x00\x01binary\xff")
+
+        recorder.stop()
+
+        # The protocol still got its data, and its method was put back
+        nosetools.assert_equals(original.call_count, 2)
+        nosetools.assert_true(protocol.dataReceived is original)
+
+        recording = Recording(self.path)
+
+        nosetools.assert_equals(recording.header["protocol"], "Esper")
+        nosetools.assert_equals(recording.header["protocol-type"], "irc")
+        nosetools.assert_equals(
+            [data for timestamp, data in recording],
+            ["PING :one\r\n", "\x00\x01binary\xff"]
+        )
+
+    def test_not_a_recording(self):
+        """RCRDS | Test reading something that isn't a recording"""
+        with gzip.open(self.path, "wb") as fh:
+            fh.write("Not a recording at all")
+
+        nosetools.assert_raises(RecordingError, Recording, self.path)
@@ -0,0 +1,360 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for the dict-like data objects"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import nose.tools as nosetools
+import yaml
+
+from system.storage.clients import ClientRegistry
+from system.storage.deferred import DeferredRedis
+from system.storage.data import JSONData, MemoryData, YamlData, \
+    FrozenDict, SQLiteData, MongoDBData, RedisData
+from system.storage.migrate import migrate, MigrationError
+from system.workers import WorkerPool
+
+from mock_reactor import InlineReactor
+from mock_redis import MockRedisServer
+
+
+def wait(d, timeout=10):
+    """
+    Wait for a Deferred fired from a worker pool, and get its result.
+    """
+
+    results = []
+    d.addBoth(results.append)
+
+    end = time.time() + timeout
+
+    while not results and time.time() < end:
+        time.sleep(0.01)
+
+    nosetools.assert_true(results, "Timed out waiting for the pool")
+    return results[0]
+
+
+class test_storage:
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def check_reading(self, data):
+        with data:
+            data["x"] = {"y": "z"}
+
+        with open(data.filename, "r") as fh:
+            saved = fh.read()
+
+        with data.reading():
+            nosetools.eq_(data["x"]["y"], "z")
+            data["x"]["y"] = "changed"  # Don't do this!
+
+        with open(data.filename, "r") as fh:
+            nosetools.eq_(fh.read(), saved, "Reading shouldn't save")
+
+    def test_reading_yaml(self):
+        """STORG | Test reading YAML data doesn't save it"""
+        self.check_reading(YamlData(self.path("data.yml")))
+
+    def test_reading_json(self):
+        """STORG | Test reading JSON data doesn't save it"""
+        self.check_reading(JSONData(self.path("data.json")))
+
+    def test_snapshot(self):
+        """STORG | Test data snapshots are frozen and replaced on save"""
+        data = YamlData(self.path("data.yml"))
+
+        with data:
+            data["x"] = {"y": ["z"]}
+
+        snapshot = data.snapshot()
+
+        nosetools.assert_true(isinstance(snapshot, FrozenDict))
+        nosetools.eq_(snapshot["x"]["y"], ("z",))
+        nosetools.assert_true(data.snapshot() is snapshot, "Not cached")
+
+        nosetools.assert_raises(TypeError, snapshot.__setitem__, "x", 1)
+        nosetools.assert_raises(TypeError, snapshot["x"].update, {})
+
+        with data:
+            data["x"]["y"].append("a")
+
+        nosetools.eq_(snapshot["x"]["y"], ("z",), "Old snapshot changed")
+        nosetools.eq_(data.snapshot()["x"]["y"], ("z", "a"))
+
+        data.reload()
+        nosetools.assert_false(data.snapshot() is snapshot)
+
+    def test_snapshot_memory(self):
+        """STORG | Test in-memory data snapshots are replaced on exit"""
+        data = MemoryData({"x": 1})
+
+        nosetools.eq_(data.snapshot(), {"x": 1})
+
+        with data:
+            data["x"] = 2
+
+        nosetools.eq_(data.snapshot(), {"x": 2})
+
+    def test_write_behind(self):
+        """STORG | Test saves are coalesced and written in the background"""
+        data = YamlData(self.path("data.yml"))
+
+        clock = InlineReactor()
+        pool = WorkerPool("Test", 1, 10, reactor=clock)
+
+        data.writer.clock = clock
+        data.writer.pool = pool
+
+        dumps = []
+        serialize = data.writer.serialize
+        data.writer.serialize = lambda: dumps.append(1) or serialize()
+
+        def read():
+            with open(data.filename, "r") as fh:
+                return yaml.load(fh)
+
+        try:
+            for i in xrange(5):
+                with data:
+                    data["x"] = i
+
+            nosetools.assert_true(data.writer.dirty)
+            nosetools.eq_(read(), None, "Written too soon")
+
+            clock.advance(data.writer.delay)
+
+            end = time.time() + 10
+
+            while (data.writer.dirty or data.writer._pending) \
+                    and time.time() < end:
+                time.sleep(0.01)
+
+            nosetools.eq_(read(), {"x": 4})
+            nosetools.eq_(len(dumps), 1, "Saves weren't coalesced")
+
+            with data:
+                data["x"] = 5
+
+            data.flush()
+            nosetools.eq_(read(), {"x": 5})
+            nosetools.assert_false(data.writer.dirty)
+            nosetools.eq_(clock.getDelayedCalls(), [])
+
+            nosetools.assert_false(os.path.exists(data.filename + ".tmp"))
+        finally:
+            pool.stop()
+
+    def test_reload_discards(self):
+        """STORG | Test reloading forgets about unwritten saves"""
+        data = YamlData(self.path("data.yml"))
+
+        data.writer.clock = InlineReactor()
+        data.writer.pool = WorkerPool("Test", 1, 10,
+                                      reactor=data.writer.clock)
+
+        try:
+            with data:
+                data["x"] = 1
+
+            data.reload()
+            data.flush()
+
+            nosetools.eq_(len(data), 0)
+
+            with open(data.filename, "r") as fh:
+                nosetools.eq_(fh.read(), "")
+        finally:
+            data.writer.pool.stop()
+
+    def test_write_retries(self):
+        """STORG | Test saves that fail to serialize are tried again"""
+        data = YamlData(self.path("data.yml"))
+
+        clock = InlineReactor()
+        pool = WorkerPool("Test", 1, 10, reactor=clock)
+
+        data.writer.clock = clock
+        data.writer.pool = pool
+
+        failures = [RuntimeError("dictionary changed size during iteration")]
+        serialize = data.writer.serialize
+
+        def _serialize():
+            if failures:
+                raise failures.pop()
+            return serialize()
+
+        data.writer.serialize = _serialize
+
+        try:
+            with data:
+                data["x"] = 1
+
+            clock.advance(data.writer.delay)
+            end = time.time() + 10
+
+            while not clock.getDelayedCalls() and time.time() < end:
+                time.sleep(0.01)
+
+            nosetools.assert_true(data.writer.dirty, "Changes were lost")
+
+            clock.advance(data.writer.delay)  # The retry
+            pool.stop()
+
+            with open(data.filename, "r") as fh:
+                nosetools.eq_(yaml.load(fh), {"x": 1})
+        finally:
+            pool.stop()
+
+    def test_sqlite(self):
+        """STORG | Test SQLite data writes only the keys that change"""
+        data = SQLiteData(self.path("data.sqlite"))
+
+        data["a"] = {"b": [1, 2]}
+        data["c"] = "d"
+
+        with data:
+            data["a"]["b"].append(3)
+            nosetools.eq_(data["c"], "d")
+
+        writes = []
+        upsert = data._upsert
+        data._upsert = lambda key, dumped: writes.append(key) or \
+            upsert(key, dumped)
+
+        with data:
+            data["a"]["e"] = True
+            data.get("c")
+
+        nosetools.eq_(writes, ["a"], "Unchanged keys shouldn't be written")
+
+        other = SQLiteData(self.path("data.sqlite"))
+        nosetools.eq_(other["a"], {"b": [1, 2, 3], "e": True})
+        nosetools.eq_(sorted(other.keys()), ["a", "c"])
+        nosetools.eq_(len(other), 2)
+
+        del data["c"]
+        nosetools.assert_false("c" in other)
+        nosetools.assert_raises(KeyError, data.__delitem__, "c")
+
+        data.set_path(["x", "y", "z"], 1)
+        nosetools.eq_(other.get_path(["x", "y", "z"]), 1)
+        nosetools.eq_(other.get_path(["x", "nope", "z"], 2), 2)
+
+        data.close()
+        other.close()
+
+    def test_sqlite_rollback(self):
+        """STORG | Test SQLite data throws away failed with blocks"""
+        data = SQLiteData(self.path("data.sqlite"))
+        data["a"] = 1
+
+        try:
+            with data:
+                data["a"] = 2
+                data["b"] = 3
+                raise ValueError()
+        except ValueError:
+            pass
+
+        nosetools.eq_(data.data, {"a": 1})
+        data.close()
+
+    def test_migrate(self):
+        """STORG | Test migrating YAML data to SQLite data"""
+        source = YamlData(self.path("data.yml"))
+
+        with source:
+            source["a"] = {"b": "c"}
+            source["d"] = [1, 2]
+
+        nosetools.eq_(migrate(source.filename), 2)
+
+        data = SQLiteData(self.path("data.sqlite"))
+        nosetools.eq_(data.data, {"a": {"b": "c"}, "d": [1, 2]})
+        data.close()
+
+        nosetools.assert_raises(MigrationError, migrate, source.filename)
+        nosetools.eq_(migrate(source.filename, overwrite=True), 2)
+
+    def test_shared_clients(self):
+        """STORG | Test Redis and MongoDB data objects share clients"""
+        registry = ClientRegistry()
+
+        first = RedisData("redis", host="localhost", db=1)
+        second = RedisData("redis", host="localhost", db=1)
+        other = RedisData("redis", host="localhost", db=2)
+
+        nosetools.assert_true(first.client is second.client)
+        nosetools.assert_false(first.client is other.client)
+        nosetools.eq_(first.client.connection_pool.max_connections,
+                      registry.pool_sizes["redis"])
+
+        stats = sorted(registry.get_stats(), key=lambda s: s["references"])
+        nosetools.eq_([s["references"] for s in stats], [1, 2])
+        nosetools.eq_(stats[1]["connections"], 0)
+
+        client = first.client
+        first.close()
+        nosetools.assert_true(first.client is None)
+        nosetools.assert_true(registry.clients[second.client_key][0]
+                              is client)
+
+        second.close()
+        other.close()
+        nosetools.eq_(registry.clients, {})
+
+        mongo = MongoDBData("mongo", connect=False, password="secret")
+        nosetools.eq_(mongo.client.max_pool_size,
+                      registry.pool_sizes["mongo"])
+        nosetools.assert_false("secret" in str(registry.get_stats()))
+
+        mongo.close()
+        nosetools.eq_(registry.clients, {})
+
+    def test_deferred_redis(self):
+        """STORG | Test the Deferred API for Redis data"""
+        server = MockRedisServer()
+        server.start()
+
+        pool = WorkerPool("Test", 2, 10, reactor=InlineReactor())
+        data = RedisData("redis", host="127.0.0.1", port=server.port)
+        facade = DeferredRedis(data, pool)
+
+        try:
+            nosetools.eq_(wait(facade.set("a", "1")), True)
+            nosetools.eq_(wait(facade.get("a")), "1")
+
+            del server.commands[:]
+
+            results = wait(facade.batch([
+                ("incr", "a"), ("set", "b", "x"), ("get", "b")
+            ]))
+            nosetools.eq_(results, [2, True, "x"])
+            nosetools.eq_(server.commands, ["INCRBY", "SET", "GET"])
+
+            nosetools.eq_(wait(facade.run(lambda client, key: client.get(key),
+                                          "a")), "2")
+
+            failure = wait(facade.get())
+            nosetools.assert_true(failure.check(TypeError))
+
+            nosetools.assert_true(isinstance(data.deferred, DeferredRedis))
+        finally:
+            pool.stop()
+            data.close()
+            server.stop()
@@ -11,17 +11,22 @@ html     - HTML utilities
 irc      - Utilities for the IRC protocol
 misc     - Uncategorised utilities
 password - Password generation utilities
+ratelimit - Token buckets
+rwlock   - Reader/writer locks
 strings  - String manipulation utilities
 """
 
 # Imports
 
+import threading
 import time
 import sys
 
 import nose.tools as nosetools
 
-from utils import irc, misc, password, strings, html, console
+from utils import irc, misc, password, strings, html, console, ratelimit, \
+    rwlock
+from mock_time import StoppedTime
 # config, data, html,
 
 
@@ -232,6 +237,150 @@ exception
 
         nosetools.eq_(0, len(duplicates), "1000 passwords")
 
+    # Ratelimit
+
+    def test_ratelimit_token_bucket(self):
+        """
+        UTILS | Test token bucket refills
+        """
+
+        clock = StoppedTime(0)
+        bucket = ratelimit.TokenBucket(2, 1, clock=clock.time)
+
+        nosetools.assert_true(bucket.consume())
+        nosetools.assert_true(bucket.consume())
+        nosetools.assert_false(bucket.consume(), "Bucket should be empty")
+
+        clock.stoppedtime_increment_time(0.5)
+        nosetools.assert_false(bucket.consume(), "Half a token isn't enough")
+
+        clock.stoppedtime_increment_time(0.5)
+        nosetools.assert_true(bucket.consume(), "Time passed is only "
+                                                "counted once")
+        nosetools.assert_false(bucket.full)
+
+        clock.stoppedtime_increment_time(10)
+        nosetools.assert_true(bucket.full)
+        nosetools.eq_(bucket.available_tokens, 2, "Capped at capacity")
+
+    def test_ratelimit_keyed_token_buckets(self):
+        """
+        UTILS | Test keyed token buckets and their expiry
+        """
+
+        clock = StoppedTime(0)
+        buckets = ratelimit.KeyedTokenBuckets(1, 0.1, clock=clock.time)
+
+        nosetools.assert_true(buckets.available("a"))
+        nosetools.eq_(len(buckets), 0, "Checking shouldn't create buckets")
+
+        nosetools.assert_true(buckets.consume("a"))
+        nosetools.assert_false(buckets.available("a"))
+        nosetools.assert_false(buckets.consume("a"))
+        nosetools.assert_true(buckets.consume("b"), "Keys are separate")
+
+        clock.stoppedtime_increment_time(5)
+        nosetools.assert_true(buckets.consume("c"))
+        nosetools.eq_(len(buckets), 3)
+
+        clock.stoppedtime_increment_time(5)
+        nosetools.assert_true(buckets.available("a"))
+        buckets.get_bucket("a")  # Expires the full buckets
+        nosetools.eq_(len(buckets), 2, "Only a is expired, and then "
+                                       "recreated")
+
+        clock.stoppedtime_increment_time(20)
+        buckets.expire()
+        nosetools.eq_(len(buckets), 0)
+
+    def test_ratelimit_keyed_token_buckets_max_keys(self):
+        """
+        UTILS | Test keyed token buckets drop the least recently used bucket
+        """
+
+        clock = StoppedTime(0)
+        buckets = ratelimit.KeyedTokenBuckets(1, 0.1, clock=clock.time,
+                                              max_keys=2)
+
+        nosetools.assert_true(buckets.consume("a"))
+        nosetools.assert_true(buckets.consume("b"))
+        nosetools.assert_false(buckets.consume("a"))  # a is now most recent
+
+        nosetools.assert_true(buckets.consume("c"))
+        nosetools.eq_(len(buckets), 2)
+        nosetools.assert_true(buckets.available("b"), "b should be dropped")
+        nosetools.assert_false(buckets.available("a"))
+
+        clock.stoppedtime_increment_time(10)
+        nosetools.assert_true(buckets.consume("d"))
+        nosetools.eq_(len(buckets), 1, "Full buckets go before used ones")
+
+    # RWLock
+
+    def test_rwlock_readers(self):
+        """
+        UTILS | Test reader/writer locks let readers in together
+        """
+
+        lock = rwlock.ReadWriteLock()
+        reading = threading.Event()
+        done = threading.Event()
+
+        def read():
+            with lock.reading():
+                reading.set()
+                done.wait(10)
+
+        thread = threading.Thread(target=read)
+        thread.start()
+
+        try:
+            nosetools.assert_true(reading.wait(10))
+
+            with lock.reading():
+                pass  # Doesn't wait for the other reader
+
+            nosetools.assert_raises(RuntimeError, self._write_while_reading,
+                                    lock)
+        finally:
+            done.set()
+            thread.join()
+
+    def _write_while_reading(self, lock):
+        with lock.reading():
+            with lock.writing():
+                pass
+
+    def test_rwlock_writers(self):
+        """
+        UTILS | Test reader/writer locks keep writers to themselves
+        """
+
+        lock = rwlock.ReadWriteLock()
+        events = []
+
+        def write():
+            with lock.writing():
+                events.append("write")
+
+        with lock.reading():
+            thread = threading.Thread(target=write)
+            thread.start()
+
+            thread.join(0.1)
+            nosetools.eq_(events, [], "Writer didn't wait for the reader")
+            events.append("read")
+
+        thread.join()
+        nosetools.eq_(events, ["read", "write"])
+
+        with lock.writing():
+            with lock.writing():
+                with lock.reading():
+                    pass  # Reentrant, and writers can read
+
+        nosetools.eq_(lock._writer, None)
+
     # Strings
 
     def test_strings_formatter_replacements(self):
@@ -0,0 +1,134 @@
+# coding=utf-8
+
+__author__ = 'Gareth Coles'
+
+"""Tests for the bounded worker pools"""
+
+import threading
+import time
+
+import nose.tools as nosetools
+
+from system.enums import OverflowPolicy
+from system.workers import WorkerPool, PoolOverflowError, \
+    get_overflow_policy
+
+from mock_reactor import InlineReactor
+
+
+class test_workers:
+
+    def setup(self):
+        self.gate = threading.Event()
+        self.results = []
+        self.failures = []
+
+    def make_pool(self, overflow):
+        return WorkerPool("Test", 1, 1, overflow, reactor=InlineReactor())
+
+    def wait(self, value):
+        self.gate.wait()
+        return value
+
+    def submit(self, pool, value):
+        d = pool.submit(self.wait, value)
+        d.addCallbacks(self.results.append,
+                       lambda f: self.failures.append(f.value))
+        return d
+
+    def test_policy_names(self):
+        """WORKS | Test getting overflow policies by name"""
+        nosetools.eq_(get_overflow_policy("drop-oldest"),
+                      OverflowPolicy.DropOldest)
+        nosetools.eq_(get_overflow_policy(OverflowPolicy.Block),
+                      OverflowPolicy.Block)
+        nosetools.assert_raises(ValueError, get_overflow_policy, "herp")
+
+    def test_submit(self):
+        """WORKS | Test submitting work to a pool"""
+        pool = self.make_pool(OverflowPolicy.Block)
+
+        self.gate.set()
+        for x in range(5):
+            self.submit(pool, x)
+
+        pool.stop()
+
+        nosetools.eq_(self.results, range(5))
+        nosetools.eq_(self.failures, [])
+        nosetools.assert_false(pool.started)
+
+    def test_errors(self):
+        """WORKS | Test errors in pooled work are passed to errbacks"""
+        pool = self.make_pool(OverflowPolicy.Block)
+
+        d = pool.submit(lambda: 1 / 0)
+        d.addErrback(lambda f: self.failures.append(f.value))
+
+        pool.stop()
+
+        nosetools.eq_(len(self.failures), 1)
+        nosetools.assert_true(
+            isinstance(self.failures[0], ZeroDivisionError)
+        )
+
+    def test_drop_oldest(self):
+        """WORKS | Test the drop-oldest overflow policy"""
+        pool = self.make_pool(OverflowPolicy.DropOldest)
+
+        self.submit(pool, 0)  # Taken by the worker, which is now blocked
+        while pool.pending:
+            pass
+
+        self.submit(pool, 1)  # Fills the queue
+        self.submit(pool, 2)  # Replaces 1
+
+        self.gate.set()
+        pool.stop()
+
+        nosetools.eq_(self.results, [0, 2])
+        nosetools.eq_(pool.dropped, 1)
+        nosetools.eq_(len(self.failures), 1)
+        nosetools.assert_true(isinstance(self.failures[0], PoolOverflowError))
+
+    def test_reject(self):
+        """WORKS | Test the reject overflow policy"""
+        pool = self.make_pool("reject")
+
+        self.submit(pool, 0)
+        end = time.time() + 10
+
+        while pool.pending and time.time() < end:
+            time.sleep(0.01)
+
+        self.submit(pool, 1)  # Fills the queue
+        self.submit(pool, 2)  # Fails right away
+
+        nosetools.eq_(len(self.failures), 1)
+        nosetools.assert_true(isinstance(self.failures[0], PoolOverflowError))
+
+        self.gate.set()
+        pool.stop()
+
+        nosetools.eq_(self.results, [0, 1])
+        nosetools.eq_(pool.dropped, 1)
+
+    def test_run_inline(self):
+        """WORKS | Test the run-inline overflow policy"""
+        pool = self.make_pool(OverflowPolicy.RunInline)
+
+        self.submit(pool, 0)
+        while pool.pending:
+            pass
+
+        self.submit(pool, 1)
+
+        d = pool.submit(threading.current_thread)
+        d.addCallback(self.results.append)
+
+        nosetools.eq_(self.results, [threading.current_thread()])
+
+        self.gate.set()
+        pool.stop()
+
+        nosetools.eq_(self.results[1:], [0, 1])
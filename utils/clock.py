@@ -0,0 +1,99 @@
+# coding=utf-8
+
+"""
+Monotonic time, for measuring how long things take.
+
+`time.time` can jump backwards or forwards whenever the system clock is
+changed, which makes it useless for timing and rate limiting. Python 2 has no
+monotonic clock in the standard library, so we ask the C library for one
+directly, falling back to `time.time` if we really can't get one. ::
+
+    from utils.clock import monotonic
+
+    start = monotonic()
+    do_something()
+    elapsed = monotonic() - start
+
+The values returned by `monotonic` only mean something relative to each
+other - they're not timestamps.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import sys
+import time
+
+__author__ = 'Gareth Coles'
+__all__ = ["monotonic", "is_monotonic"]
+
+#: Whether `monotonic` is actually monotonic on this platform
+is_monotonic = True
+
+
+def _get_monotonic():
+    if hasattr(time, "monotonic"):  # Python 3.3+
+        return time.monotonic
+
+    if sys.platform.startswith("linux") or "bsd" in sys.platform:
+        class timespec(ctypes.Structure):
+            _fields_ = [("tv_sec", ctypes.c_long),
+                        ("tv_nsec", ctypes.c_long)]
+
+        try:
+            librt = ctypes.CDLL(
+                ctypes.util.find_library("rt") or "librt.so.1",
+                use_errno=True
+            )
+        except OSError:
+            librt = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+        # CLOCK_MONOTONIC is 1 on Linux, 4 on the BSDs
+        clock_id = 1 if sys.platform.startswith("linux") else 4
+
+        def monotonic():
+            # A new one each call, as this is called from many threads
+            spec = timespec()
+
+            if clock_gettime(clock_id, ctypes.byref(spec)):
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno))
+            return spec.tv_sec + spec.tv_nsec / 1e9
+
+        monotonic()  # Make sure it actually works
+        return monotonic
+
+    if sys.platform == "darwin":
+        libc = ctypes.CDLL("/usr/lib/libc.dylib", use_errno=True)
+
+        class mach_timebase_info_data_t(ctypes.Structure):
+            _fields_ = [("numer", ctypes.c_uint32),
+                        ("denom", ctypes.c_uint32)]
+
+        mach_absolute_time = libc.mach_absolute_time
+        mach_absolute_time.restype = ctypes.c_uint64
+
+        info = mach_timebase_info_data_t()
+        libc.mach_timebase_info(ctypes.byref(info))
+        factor = float(info.numer) / info.denom / 1e9
+
+        def monotonic():
+            return mach_absolute_time() * factor
+
+        return monotonic
+
+    if sys.platform == "win32":
+        # time.clock is based on QueryPerformanceCounter on Windows
+        return time.clock
+
+    raise OSError("No monotonic clock available")
+
+
+try:
+    monotonic = _get_monotonic()
+except Exception:
+    is_monotonic = False
+    monotonic = time.time
@@ -1,11 +1,12 @@
 # coding=utf-8
 
-import time
+from collections import OrderedDict
+
+from utils.clock import monotonic
 
 __author__ = 'Sean'
 
 
-# TODO: Replace `time` with proper monotonic time
 class TokenBucket(object):
     """
     A token bucket. The bucket will be filled with new tokens at a set rate,
@@ -14,18 +15,22 @@ class TokenBucket(object):
     it was about to perform. This is a form of rate limiting.
     """
 
-    def __init__(self, capacity, fill_rate, initial_capacity=None):
+    def __init__(self, capacity, fill_rate, initial_capacity=None,
+                 clock=monotonic):
         """
         :param capacity: Max token count
         :param fill_rate: Token count increase per second
         :param initial_capacity: Initial token count
+        :param clock: Function returning the current time in seconds - this
+            should be monotonic, and you should only change it for tests
         """
         self.capacity = capacity
         self.fill_rate = fill_rate
         if initial_capacity is None:
             initial_capacity = capacity
+        self._clock = clock
         self._tokens = initial_capacity
-        self._last_fill = time.time()
+        self._last_fill = clock()
 
     def __repr__(self):
         return "%s(capacity=%r, fill_rate=%r, initial_capacity=%r)" % (
@@ -43,6 +48,15 @@ class TokenBucket(object):
         """
         return self._tokens
 
+    @property
+    def full(self):
+        """
+        Whether the bucket has filled back up to capacity. A full bucket is
+        no different from a brand new one.
+        """
+        self._update_tokens()
+        return self._tokens >= self.capacity
+
     def consume(self, tokens=1):
         """
         Consume tokens from the bucket.
@@ -61,6 +75,115 @@ class TokenBucket(object):
         Increase token count based on time passed since last fill, up to
         capacity.
         """
-        time_passed = time.time() - self._last_fill
+        now = self._clock()
+        time_passed = now - self._last_fill
+        self._last_fill = now
         new_tokens = time_passed * self.fill_rate
         self._tokens = min(self._tokens + new_tokens, self.capacity)
+
+
+class KeyedTokenBuckets(object):
+    """
+    A set of token buckets with the same capacity and fill rate, one per key
+    - for example, one per user.
+
+    Buckets are created the first time a key is used. Buckets that have
+    filled back up are forgotten about every so often, as they're no
+    different from new ones - so memory use only depends on how many keys
+    have been used recently.
+
+    If you give a max_keys, memory use is bounded no matter how many keys
+    are used - once there are that many buckets, the least recently used
+    one is dropped to make room for a new one.
+    """
+
+    def __init__(self, capacity, fill_rate, clock=monotonic, max_keys=None):
+        """
+        :param capacity: Max token count for each bucket
+        :param fill_rate: Token count increase per second, for each bucket
+        :param clock: Function returning the current time in seconds - this
+            should be monotonic, and you should only change it for tests
+        :param max_keys: Max number of buckets to keep, or None for no limit
+        """
+        self.capacity = capacity
+        self.fill_rate = fill_rate
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+
+        # How long an unused bucket takes to fill up completely
+        self._expiry = float(capacity) / fill_rate
+        self._last_expiry = clock()
+
+    def __repr__(self):
+        return "%s(capacity=%r, fill_rate=%r) with %s buckets" % (
+            self.__class__.__name__,
+            self.capacity,
+            self.fill_rate,
+            len(self._buckets)
+        )
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def get_bucket(self, key):
+        """
+        Get the bucket for a key, creating it if necessary.
+        :param key: The key - anything hashable
+        :return: The TokenBucket for that key
+        """
+        self._maybe_expire()
+
+        try:
+            # Move it to the end, so the least recently used is first
+            bucket = self._buckets.pop(key)
+        except KeyError:
+            if self.max_keys is not None \
+                    and len(self._buckets) >= self.max_keys:
+                self.expire()
+
+                while len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+
+            bucket = TokenBucket(self.capacity, self.fill_rate,
+                                 clock=self._clock)
+
+        self._buckets[key] = bucket
+        return bucket
+
+    def available(self, key, tokens=1):
+        """
+        Check whether there are enough tokens in a key's bucket, without
+        consuming them.
+        :param key: The key - anything hashable
+        :param tokens: Number of tokens to check for
+        :return: Whether or not there are enough tokens
+        """
+        if key not in self._buckets:
+            return tokens <= self.capacity
+        bucket = self._buckets[key]
+        bucket._update_tokens()
+        return tokens <= bucket.available_tokens
+
+    def consume(self, key, tokens=1):
+        """
+        Consume tokens from a key's bucket.
+        :param key: The key - anything hashable
+        :param tokens: Number of tokens to consume
+        :return: Whether or not there were enough tokens to consume
+        """
+        return self.get_bucket(key).consume(tokens)
+
+    def expire(self):
+        """
+        Forget about all of the buckets that have filled back up.
+        """
+        self._last_expiry = self._clock()
+
+        for key, bucket in self._buckets.items():
+            if bucket.full:
+                del self._buckets[key]
+
+    def _maybe_expire(self):
+        if self._clock() - self._last_expiry >= self._expiry:
+            self.expire()
@@ -0,0 +1,158 @@
+# coding=utf-8
+
+"""
+A reader/writer lock, for things that are read far more than they're
+written - like data files.
+
+Any number of threads may hold the lock for reading at once, but only one
+may hold it for writing, and nobody may read while it's held for writing.
+Waiting writers go before new readers, so a steady stream of readers can't
+starve them. ::
+
+    lock = ReadWriteLock()
+
+    with lock.reading():
+        value = thing["x"]
+
+    with lock.writing():
+        thing["x"] = value
+
+Both kinds of locking are reentrant, and a thread holding the lock for
+writing may also read. A thread holding the lock for reading may not start
+writing, though - that'd deadlock against any other reader doing the same,
+so it raises a RuntimeError instead.
+"""
+
+import threading
+
+from contextlib import contextmanager
+from thread import get_ident
+
+__author__ = 'Gareth Coles'
+
+
+class ReadWriteLock(object):
+    """
+    A reentrant, writer-preferring reader/writer lock.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+
+        self._readers = {}  # Thread ident: depth
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    def __repr__(self):
+        return "<%s: %s readers, %s>" % (
+            self.__class__.__name__, len(self._readers),
+            "writing" if self._writer is not None else "not writing"
+        )
+
+    def acquire_read(self):
+        """
+        Acquire the lock for reading, waiting until nobody is writing or
+        waiting to write.
+        """
+
+        me = get_ident()
+
+        with self._condition:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+
+            self._readers[me] = 1
+
+    def release_read(self):
+        """
+        Release the lock after reading.
+        """
+
+        me = get_ident()
+
+        with self._condition:
+            depth = self._readers[me] - 1
+
+            if depth:
+                self._readers[me] = depth
+                return
+
+            del self._readers[me]
+
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """
+        Acquire the lock for writing, waiting until nobody else is reading
+        or writing.
+        """
+
+        me = get_ident()
+
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+
+            if me in self._readers:
+                raise RuntimeError("Can't write while holding the lock for "
+                                   "reading")
+
+            self._writers_waiting += 1
+
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        """
+        Release the lock after writing.
+        """
+
+        with self._condition:
+            if self._writer != get_ident():
+                raise RuntimeError("Can't release a lock held by another "
+                                   "thread")
+
+            self._writer_depth -= 1
+
+            if not self._writer_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def reading(self):
+        """
+        Hold the lock for reading for the duration of a *with* block.
+        """
+
+        self.acquire_read()
+
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def writing(self):
+        """
+        Hold the lock for writing for the duration of a *with* block.
+        """
+
+        self.acquire_write()
+
+        try:
+            yield
+        finally:
+            self.release_write()